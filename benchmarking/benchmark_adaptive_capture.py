@@ -0,0 +1,183 @@
+import argparse
+import math
+import os
+import sys
+
+# Ajout du dossier rpi-cam pour accéder au GPS et au planificateur
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "rpi-cam")))
+from capture_scheduler import CaptureScheduler
+from gps_reader import KNOTS_TO_KMH, GpsReader, haversine
+
+# Tranches de vitesse du rapport (km/h)
+SPEED_BANDS = (("arrêt", 0, 3), ("ville", 3, 50), ("route", 50, 90), ("autoroute", 90, float("inf")))
+
+# Trajet synthétique : (durée en s, vitesse en km/h)
+SYNTHETIC_TRACK = ((60, 0), (120, 30), (20, 0), (120, 45), (30, 0), (180, 80), (300, 130), (60, 0))
+
+
+def nmea_sentence(body: str) -> str:
+    checksum = 0
+
+    for char in body:
+        checksum ^= ord(char)
+
+    return f"${body}*{checksum:02X}"
+
+
+def nmea_coordinate(value: float, positive: str, negative: str, width: int) -> tuple:
+    degrees = int(abs(value))
+    minutes = (abs(value) - degrees) * 60
+
+    return f"{degrees:0{width}d}{minutes:07.4f}", positive if value >= 0 else negative
+
+
+def generate_track(path: str, latitude: float = 43.6155, longitude: float = 7.0719) -> None:
+    """
+    Écrit un trajet synthétique (trames RMC à 1 Hz) : arrêts, ville, route et autoroute, vers l'est.
+
+    :param path: Le fichier NMEA
+    :param latitude: La latitude de départ
+    :param longitude: La longitude de départ
+    """
+
+    second = 0
+
+    with open(path, "w") as f:
+        for duration, speed in SYNTHETIC_TRACK:
+            for _ in range(duration):
+                utc = f"{second // 3600 % 24:02d}{second // 60 % 60:02d}{second % 60:02d}.00"
+                lat, lat_dir = nmea_coordinate(latitude, "N", "S", 2)
+                lon, lon_dir = nmea_coordinate(longitude, "E", "W", 3)
+                f.write(nmea_sentence(f"GPRMC,{utc},A,{lat},{lat_dir},{lon},{lon_dir},{speed / KNOTS_TO_KMH:.1f},90.0,010126,,") + "\n")
+
+                # Déplacement vers l'est pendant une seconde
+                longitude += speed / 3600 / (111.32 * math.cos(math.radians(latitude)))
+                second += 1
+
+
+def load_track(path: str) -> GpsReader:
+    """
+    Charge un trajet NMEA enregistré (ex. `cat /dev/serial0 > trajet.nmea`), daté par l'heure UTC des trames.
+
+    :param path: Le fichier NMEA
+
+    :return: Le lecteur GPS contenant toutes les positions du trajet
+    """
+
+    with open(path, "r", errors="ignore") as f:
+        lines = f.readlines()
+
+    reader = GpsReader(None, capacity=len(lines))
+    start = previous = None
+
+    for line in lines:
+        fields = line.split(",")
+
+        if len(fields) < 2 or fields[0][3:] not in ("GGA", "RMC") or len(fields[1]) < 6:
+            continue
+
+        try:
+            utc = int(fields[1][:2]) * 3600 + int(fields[1][2:4]) * 60 + float(fields[1][4:])
+        except ValueError:
+            continue
+
+        if start is None:
+            start = previous = utc
+
+        # Passage de minuit : l'heure UTC repart de 0
+        if utc < previous:
+            start -= 86400
+
+        previous = utc
+        reader.feed(line, received_at=utc - start)
+
+    return reader
+
+
+def simulate(reader: GpsReader, camera_rate: float, fixed_rate: float, scheduler: CaptureScheduler) -> dict:
+    """
+    Parcourt le trajet image par image à la cadence de la caméra, et compte les images envoyées
+    à cadence fixe et par le planificateur, par tranche de vitesse.
+
+    :param reader: Le lecteur GPS du trajet
+    :param camera_rate: La cadence de la caméra (images/s)
+    :param fixed_rate: La cadence fixe comparée (images/s)
+    :param scheduler: Le planificateur de la cadence adaptative
+
+    :return: Par tranche : durée (s), distance (km), images à cadence fixe et adaptative
+    """
+
+    bands = {name: {"duration": 0.0, "distance": 0.0, "fixed": 0, "adaptive": 0} for name, _, _ in SPEED_BANDS}
+    start, end = reader.fixes[0].timestamp, reader.fixes[-1].timestamp
+    step = 1 / camera_rate
+    next_fixed = start
+    previous = None
+
+    for index in range(int((end - start) * camera_rate) + 1):
+        t = start + index * step
+        fix = reader.fix_at(t)
+        speed = fix.speed_kmh or 0.0 if fix is not None else 0.0
+        band = bands[next(name for name, low, high in SPEED_BANDS if low <= speed < high)]
+        band["duration"] += step
+
+        if previous is not None and fix is not None:
+            band["distance"] += haversine(previous.latitude, previous.longitude, fix.latitude, fix.longitude)
+
+        previous = fix
+
+        if t >= next_fixed - 1e-9:
+            band["fixed"] += 1
+            next_fixed += 1 / fixed_rate
+
+        if scheduler.should_capture(fix, t):
+            band["adaptive"] += 1
+
+    return bands
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Images envoyées à cadence fixe contre cadence adaptative (distance et vitesse) sur un trajet NMEA rejoué")
+    parser.add_argument("track", help="Trajet NMEA enregistré (ou écrit avec --generate)")
+    parser.add_argument("--generate", action="store_true", help="Écrit d'abord un trajet synthétique dans le fichier")
+    parser.add_argument("--fixed-rate", type=float, default=5, help="Cadence fixe actuelle (images/s, delay = 0.2)")
+    parser.add_argument("--distance", type=float, default=5, help="Distance entre deux images (m)")
+    parser.add_argument("--min-rate", type=float, default=0.5)
+    parser.add_argument("--max-rate", type=float, default=10)
+    parser.add_argument("--stationary-speed", type=float, default=3, help="Vitesse d'arrêt (km/h)")
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_track(args.track)
+
+    reader = load_track(args.track)
+
+    if len(reader.fixes) < 2:
+        sys.exit(f"Pas assez de positions dans {args.track}")
+
+    scheduler = CaptureScheduler(args.distance, args.min_rate, args.max_rate, args.stationary_speed, args.fixed_rate)
+    bands = simulate(reader, args.max_rate, args.fixed_rate, scheduler)
+
+    print("| Vitesse | Durée (s) | Distance (km) | Images fixes | Images adaptatives | Écart | m/image fixe | m/image adaptative |")
+    print("|---------|-----------|---------------|--------------|--------------------|-------|--------------|--------------------|")
+
+    total = {"duration": 0.0, "distance": 0.0, "fixed": 0, "adaptive": 0}
+
+    for name, band in list(bands.items()) + [("total", total)]:
+        if name != "total":
+            for key in total:
+                total[key] += band[key]
+
+        if not band["duration"]:
+            continue
+
+        change = band["adaptive"] / band["fixed"] - 1 if band["fixed"] else float("nan")
+        fixed_spacing = band["distance"] * 1000 / band["fixed"] if band["fixed"] else float("nan")
+        adaptive_spacing = band["distance"] * 1000 / band["adaptive"] if band["adaptive"] else float("nan")
+        print(
+            f"| {name} | {band['duration']:.0f} | {band['distance']:.2f} | {band['fixed']} | {band['adaptive']} "
+            f"| {change:+.0%} | {fixed_spacing:.1f} | {adaptive_spacing:.1f} |"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+# Ajout du dossier rpi-cam pour accéder à la capture
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "rpi-cam")))
+from fake_camera import FakeCamera
+from video_capture import FrameRing, VideoCaptureThread
+
+
+def still_mode(camera, delay: float, duration: float, publish_delay: float) -> list:
+    """
+    Ancienne boucle : capture par le port photo, envoi puis attente, dans le même thread.
+
+    :param camera: La caméra
+    :param delay: L'attente entre deux captures (s)
+    :param duration: La durée de la mesure (s)
+    :param publish_delay: Le temps d'envoi simulé d'une image (s)
+
+    :return: Les instants de capture
+    """
+
+    timestamps = []
+    end = time.perf_counter() + duration
+
+    while time.perf_counter() < end:
+        stream = io.BytesIO()
+        camera.capture(stream, format="jpeg")
+        timestamps.append(time.perf_counter())
+        time.sleep(publish_delay)
+        time.sleep(delay)
+
+    return timestamps
+
+
+def video_mode(camera, duration: float, publish_delay: float, ring_size: int) -> tuple:
+    """
+    Capture continue par le port vidéo dans un thread, envoi dans un autre.
+
+    :param camera: La caméra
+    :param duration: La durée de la mesure (s)
+    :param publish_delay: Le temps d'envoi simulé d'une image (s)
+    :param ring_size: Le nombre de tampons de l'anneau
+
+    :return: Les instants de capture, les instants d'envoi et les statistiques de l'anneau
+    """
+
+    ring = FrameRing(ring_size)
+    captured = []
+    commit = ring.commit
+
+    def timed_commit(buffer, timestamp):
+        captured.append(time.perf_counter())
+        commit(buffer, timestamp)
+
+    ring.commit = timed_commit
+    capture = VideoCaptureThread(camera, ring)
+    published = []
+    end = time.perf_counter() + duration
+    capture.start()
+
+    while time.perf_counter() < end:
+        frame = ring.acquire_read(timeout=1)
+
+        if frame is None:
+            break
+
+        published.append(time.perf_counter())
+        time.sleep(publish_delay)
+        ring.release(frame)
+
+    capture.stop(timeout=2)
+
+    return captured, published, ring.stats()
+
+
+def describe(timestamps: list, expected: float) -> tuple:
+    """
+    :param timestamps: Les instants des images
+    :param expected: L'intervalle attendu entre deux images (s)
+
+    :return: Les images par seconde, l'écart type des intervalles et l'écart maximal à l'intervalle attendu (ms)
+    """
+
+    intervals = [b - a for a, b in zip(timestamps, timestamps[1:])]
+
+    if not intervals:
+        return 0.0, float("nan"), float("nan")
+
+    fps = len(intervals) / (timestamps[-1] - timestamps[0])
+    jitter = statistics.pstdev(intervals) * 1000
+    worst = max(abs(interval - expected) for interval in intervals) * 1000
+
+    return fps, jitter, worst
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Images par seconde et gigue de la capture (port photo + attente contre port vidéo en continu)")
+    parser.add_argument("--picamera", action="store_true", help="Caméra réelle (sur la raspberry) au lieu de la caméra simulée")
+    parser.add_argument("--fps", type=float, default=5)
+    parser.add_argument("--duration", type=float, default=10, help="Durée de chaque mesure (s)")
+    parser.add_argument("--still-latency", type=float, default=0.15, help="Durée d'une capture photo de la caméra simulée (s)")
+    parser.add_argument("--publish-delay-ms", type=float, nargs='+', default=[5, 400], help="Temps d'envoi simulé (broker lent)")
+    parser.add_argument("--ring-size", type=int, default=4)
+    args = parser.parse_args()
+
+    def open_camera():
+        if args.picamera:
+            from picamera import PiCamera
+
+            camera = PiCamera()
+            camera.resolution = (640, 640)
+            camera.framerate = args.fps
+            return camera
+
+        return FakeCamera((640, 640), args.fps, args.still_latency)
+
+    expected = 1 / args.fps
+
+    print("| Mode | Envoi (ms) | Images/s capturées | Gigue (ms) | Écart max (ms) | Images/s envoyées | Images remplacées |")
+    print("|------|------------|--------------------|------------|----------------|-------------------|-------------------|")
+
+    for publish_delay in args.publish_delay_ms:
+        camera = open_camera()
+        timestamps = still_mode(camera, expected, args.duration, publish_delay / 1000)
+        camera.close()
+        fps, jitter, worst = describe(timestamps, expected)
+        print(f"| photo + attente | {publish_delay:.0f} | {fps:.2f} | {jitter:.1f} | {worst:.1f} | {fps:.2f} | 0 |")
+
+        camera = open_camera()
+        captured, published, stats = video_mode(camera, args.duration, publish_delay / 1000, args.ring_size)
+        camera.close()
+        fps, jitter, worst = describe(captured, expected)
+        published_fps = describe(published, expected)[0]
+        print(f"| port vidéo | {publish_delay:.0f} | {fps:.2f} | {jitter:.1f} | {worst:.1f} | {published_fps:.2f} | {stats['dropped']} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import io
+import os
+import sys
+import time
+
+from PIL import Image
+
+# Ajout du dossier rpi-cam pour accéder au contrôle de congestion
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "rpi-cam")))
+from congestion import CongestionController
+from fake_camera import FakeCamera
+
+
+def parse_phases(values: list) -> list:
+    """
+    :param values: Les phases du lien, "durée:débit" (s, ko/s)
+
+    :return: La liste des phases (début, fin, débit en octets/s)
+    """
+
+    phases = []
+    start = 0.0
+
+    for value in values:
+        duration, rate = value.split(":")
+        phases.append((start, start + float(duration), float(rate) * 1000))
+        start += float(duration)
+
+    return phases
+
+
+def load_image(path: str, quality: int, size: int) -> bytes:
+    """
+    :param path: Une photo (JPEG ou PNG), sinon une image synthétique de la caméra simulée
+    :param quality: La qualité JPEG de la caméra
+    :param size: Le côté de l'image
+
+    :return: L'image de la caméra, JPEG à la qualité `quality`
+    """
+
+    if path:
+        image = Image.open(path).convert("RGB").resize((size, size), Image.BILINEAR)
+    else:
+        image = Image.open(io.BytesIO(FakeCamera((size, size), frames=1).next_image()))
+
+    stream = io.BytesIO()
+    image.save(stream, format="jpeg", quality=quality)
+
+    return stream.getvalue()
+
+
+def simulate(image: bytes, phases: list, args: argparse.Namespace, controller: CongestionController = None) -> list:
+    """
+    Simule l'envoi des images sur un lien à débit limité (file FIFO), puis l'inférence sur le serveur.
+    L'horloge est simulée, seul le réencodage des images est réellement exécuté.
+
+    :param image: L'image de la caméra
+    :param phases: Les phases du lien
+    :param args: Les arguments de la commande
+    :param controller: Le contrôle de congestion (None : toutes les images à pleine qualité)
+
+    :return: Par image envoyée : instant de capture, latence (ms), taille (octets), qualité, côté, durée du réencodage (ms)
+    """
+
+    end = phases[-1][1]
+    link_free = server_free = 0.0
+    pending = []  # (instant du résultat, latence) dans l'ordre d'arrivée
+    sent = []
+
+    def bandwidth(t):
+        return next((rate for start, stop, rate in phases if start <= t < stop), phases[-1][2])
+
+    for index in range(int(end * args.fps)):
+        t = index / args.fps
+
+        # Résultats reçus avant cette image
+        while pending and pending[0][0] <= t:
+            received, latency = pending.pop(0)
+
+            if controller is not None:
+                controller.on_result(latency, received)
+
+        if controller is not None:
+            if not controller.allows(t):
+                continue
+
+            start = time.perf_counter()
+            data, quality, size = controller.encode(image, args.quality, (args.size, args.size))
+            encode_ms = (time.perf_counter() - start) * 1000
+            controller.on_sent(t)
+        else:
+            data, quality, size, encode_ms = image, args.quality, (args.size, args.size), 0.0
+
+        # Envoi sur le lien, puis inférence et retour du résultat
+        link_free = max(t, link_free) + len(data) / bandwidth(max(t, link_free))
+        server_free = max(link_free, server_free) + args.inference_ms / 1000
+        received = server_free + args.rtt_ms / 1000
+        latency = (received - t) * 1000
+        pending.append((received, latency))
+        sent.append((t, latency, len(data), quality, size[0], encode_ms))
+
+    return sent
+
+
+def percentile(values: list, p: float) -> float:
+    return values[min(len(values) - 1, int(p * len(values)))] if values else float("nan")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latence capture → résultat sur un lien limité, avec et sans contrôle de congestion (AIMD)")
+    parser.add_argument("-i", "--image", help="Photo utilisée comme image de la caméra (sinon image synthétique)")
+    parser.add_argument("--phases", nargs="+", default=["20:600", "40:60", "20:600"], help="Phases du lien durée:débit (s:ko/s)")
+    parser.add_argument("--fps", type=float, default=5, help="Cadence de la caméra")
+    parser.add_argument("--size", type=int, default=640)
+    parser.add_argument("--quality", type=int, default=85, help="Qualité JPEG de la caméra")
+    parser.add_argument("--inference-ms", type=float, default=60, help="Durée de l'inférence sur le serveur")
+    parser.add_argument("--rtt-ms", type=float, default=20, help="Aller-retour réseau hors transfert de l'image")
+    parser.add_argument("--target-ms", type=float, default=800, help="Latence visée par le contrôle de congestion")
+    parser.add_argument("--settle", type=float, default=10, help="Durée (s) après un changement de débit exclue de la colonne « p90 établi »")
+    args = parser.parse_args()
+
+    phases = parse_phases(args.phases)
+    image = load_image(args.image, args.quality, args.size)
+    controller = CongestionController(args.target_ms, (40, args.quality), (320, args.size), (1.0, args.fps))
+
+    print(f"Image de la caméra : {len(image) / 1000:.1f} ko")
+    print("| Mode | Phase | Débit (ko/s) | Images/s | p50 (ms) | p90 (ms) | max (ms) | p90 établi (ms) | Taille (ko) | Qualité | Côté | Réencodage (ms) |")
+    print("|------|-------|--------------|----------|----------|----------|----------|-----------------|-------------|---------|------|-----------------|")
+
+    for name, mode_controller in (("fixe", None), ("AIMD", controller)):
+        sent = simulate(image, phases, args, mode_controller)
+
+        for number, (start, stop, rate) in enumerate(phases, 1):
+            frames = [frame for frame in sent if start <= frame[0] < stop]
+            latencies = sorted(frame[1] for frame in frames)
+            settled = sorted(frame[1] for frame in frames if frame[0] >= start + args.settle)
+
+            if not frames:
+                continue
+
+            def mean(column):
+                return sum(frame[column] for frame in frames) / len(frames)
+
+            print(
+                f"| {name} | {number} | {rate / 1000:.0f} | {len(frames) / (stop - start):.2f} | {percentile(latencies, 0.5):.0f} "
+                f"| {percentile(latencies, 0.9):.0f} | {latencies[-1]:.0f} | {percentile(settled, 0.9):.0f} | {mean(2) / 1000:.1f} | {mean(3):.0f} | {mean(4):.0f} | {mean(5):.1f} |"
+            )
+
+    print(f"Contrôle de congestion : {controller.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import os
+import sys
+import time
+
+# Ajout du dossier yolo pour accéder au module dedup
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "yolo")))
+from dedup import FrameDeduplicator
+
+
+def replay(frames: list, fps: float, threshold: float, max_age_ms: float) -> tuple:
+    """
+    Rejoue un trajet : chaque image non dupliquée devient la référence, comme dans le service.
+
+    :param frames: Les octets JPEG des images, dans l'ordre de capture
+    :param fps: La fréquence de capture du trajet
+    :param threshold: Le seuil de différence absolue moyenne
+    :param max_age_ms: La durée maximale de réutilisation des détections
+
+    :return: Les statistiques du dédoublonnage et le temps moyen de signature (ms)
+    """
+
+    deduplicator = FrameDeduplicator(threshold, max_age_ms)
+    elapsed = 0
+
+    for i, data in enumerate(frames):
+        timestamp = i / fps
+
+        start = time.perf_counter()
+        signature = deduplicator.signature(data)
+        detections = deduplicator.lookup(0, signature, timestamp)
+        elapsed += time.perf_counter() - start
+
+        if detections is None:
+            deduplicator.store(0, signature, timestamp, [])
+
+    return deduplicator.stats(), elapsed / len(frames) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Taux d'inférences évitées sur un trajet rejoué (images quasi identiques)")
+    parser.add_argument("-d", "--directory", required=True, help="Dossier des images JPEG du trajet (ordre alphabétique = ordre de capture)")
+    parser.add_argument("--fps", type=float, default=5, help="Fréquence de capture du trajet")
+    parser.add_argument("-t", "--thresholds", type=float, nargs='+', default=[2, 4, 8])
+    parser.add_argument("--max-age-ms", type=float, default=1000)
+    args = parser.parse_args()
+
+    frames = []
+
+    for name in sorted(os.listdir(args.directory)):
+        if name.lower().endswith((".jpg", ".jpeg")):
+            with open(os.path.join(args.directory, name), "rb") as f:
+                frames.append(f.read())
+
+    if not frames:
+        sys.exit(f"Aucune image JPEG dans {args.directory}")
+
+    print(f"{len(frames)} images à {args.fps} images/s, réutilisation pendant {args.max_age_ms} ms au plus")
+    print("| Seuil | Inférences évitées | Taux | Signature (ms/image) |")
+    print("|-------|--------------------|------|----------------------|")
+
+    for threshold in args.thresholds:
+        stats, signature_time = replay(frames, args.fps, threshold, args.max_age_ms)
+        print(f"| {threshold:>5} | {stats['skipped']:>18} | {stats['skip_ratio']:>4.0%} | {signature_time:>20.2f} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import time
+
+# Ajout du dossier parent pour accéder au module common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.frame_protocol import decode_frame, encode_frame, encode_legacy_frame
+
+
+def measure(function, iterations: int) -> float:
+    """
+    Mesure le temps moyen d'exécution d'une fonction.
+
+    :param function: La fonction à mesurer (sans argument)
+    :param iterations: Le nombre d'exécutions
+
+    :return: Le temps moyen en microsecondes
+    """
+
+    start = time.perf_counter()
+
+    for _ in range(iterations):
+        function()
+
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmark du format des trames images (binaire vs JSON/base64)")
+    parser.add_argument("-i", "--image", help="Image JPEG à utiliser (sinon des octets aléatoires)")
+    parser.add_argument("-s", "--size", type=int, default=60_000, help="Taille des octets aléatoires si pas d'image")
+    parser.add_argument("-n", "--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            data = f.read()
+    else:
+        data = os.urandom(args.size)
+
+    binary = encode_frame(data, 1)
+    legacy = encode_legacy_frame(data)
+
+    print(f"Image : {len(data)} octets")
+    print("| Format | Octets envoyés | Surcoût | Encodage (µs) | Décodage (µs) |")
+    print("|--------|----------------|---------|---------------|---------------|")
+
+    for name, payload, encode in (
+        ("binary", binary, lambda: encode_frame(data, 1)),
+        ("json", legacy, lambda: encode_legacy_frame(data)),
+    ):
+        # bytes() force la copie pour comparer à coût égal avec le décodage base64
+        encode_time = measure(encode, args.iterations)
+        decode_time = measure(lambda: bytes(decode_frame(payload).data), args.iterations)
+        overhead = (len(payload) - len(data)) / len(data) * 100
+
+        print(f"| {name:<6} | {len(payload):>14} | {overhead:>6.1f}% | {encode_time:>13.1f} | {decode_time:>13.1f} |")
+
+
+if __name__ == "__main__":
+    main()
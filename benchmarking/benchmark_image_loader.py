@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HAILO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "hailo"))
+COMMON_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Ajout du dossier rpi-cam pour accéder à la caméra simulée
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "rpi-cam")))
+from fake_camera import FakeCamera
+
+
+def create_dataset(directory: str, count: int, width: int, height: int) -> str:
+    """
+    Crée un jeu de données COCO : `count` copies d'une image de la caméra simulée et le fichier result.json.
+
+    :param directory: Le dossier du jeu de données
+    :param count: Le nombre d'images
+    :param width: La largeur des images
+    :param height: La hauteur des images
+
+    :return: Le dossier des images (argument -i de hailo/object_detection.py)
+    """
+
+    images_path = os.path.join(directory, "images")
+    os.makedirs(images_path)
+    source = os.path.join(directory, "source.jpg")
+
+    with open(source, "wb") as f:
+        f.write(FakeCamera((width, height), frames=1).next_image())
+
+    images = []
+
+    for image_id in range(count):
+        file_name = f"images/{image_id:06d}.jpg"
+        shutil.copyfile(source, os.path.join(directory, file_name))
+        images.append({"id": image_id, "file_name": file_name, "width": width, "height": height})
+
+    with open(os.path.join(directory, "result.json"), "w") as f:
+        json.dump({"images": images, "annotations": [], "categories": []}, f)
+
+    return images_path
+
+
+def child(mode: str, images_path: str, size: int, workers: int, prefetch: int) -> None:
+    """
+    Parcours mesuré dans un processus neuf : chargement des images puis prétraitement, comme hailo/object_detection.py.
+
+    :param mode: "liste" (ancien chargement de toutes les images) ou "flux" (chargement paresseux)
+    :param images_path: Le dossier des images
+    :param size: La taille de l'entrée du modèle
+    :param workers: Le nombre de threads de décodage
+    :param prefetch: Le nombre maximal d'images lues d'avance
+    """
+
+    import resource
+    from pathlib import Path
+    import numpy as np
+    from PIL import Image
+
+    sys.path.append(COMMON_PATH)
+    sys.path.append(HAILO_PATH)
+    from common.preprocessing import letterbox_into
+    from image_loader import list_input_images, load_input_images
+
+    start = time.perf_counter()
+
+    if mode == "liste":
+        # Ancien chargement : toutes les images ouvertes avant l'inférence, gardées par la liste une fois décodées
+        path = Path(images_path)
+
+        with open(f"{path.parent}/result.json", "r") as f:
+            entries = json.load(f)["images"]
+
+        images = [(image["id"], Image.open(f"{path.parent}/{image['file_name']}")) for image in entries]
+    else:
+        images = load_input_images(list_input_images(images_path), workers, prefetch)
+
+    first = None
+    out = np.empty((size, size, 3), dtype=np.uint8)
+
+    for _, image in images:
+        letterbox_into(image.convert("RGB"), out, (114, 114, 114), Image.Resampling.BICUBIC)
+
+        if first is None:
+            first = time.perf_counter() - start
+
+    print(json.dumps({
+        "first": first,
+        "total": time.perf_counter() - start,
+        "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Chargement des images de hailo/object_detection.py : délai avant la première image et RSS maximal selon la taille du jeu de données")
+    parser.add_argument("-c", "--counts", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--size", type=int, default=640, help="Taille de l'entrée du modèle")
+    parser.add_argument("-w", "--workers", type=int, default=4)
+    parser.add_argument("-p", "--prefetch", type=int, default=8)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "IMAGES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], args.size, args.workers, args.prefetch)
+        return
+
+    print(f"{os.cpu_count()} cœur(s), {args.workers} threads de décodage, {args.prefetch} images lues d'avance")
+    print("| Images | Chargement | Première image (ms) | Total (s) | Images/s | RSS max (Mo) |")
+    print("|--------|------------|---------------------|-----------|----------|--------------|")
+
+    for count in args.counts:
+        with tempfile.TemporaryDirectory() as directory:
+            images_path = create_dataset(directory, count, args.width, args.height)
+
+            for mode in ("liste", "flux"):
+                output = subprocess.run(
+                    [sys.executable, __file__, "--child", mode, images_path, "--size", str(args.size),
+                     "-w", str(args.workers), "-p", str(args.prefetch)],
+                    check=True, capture_output=True, text=True
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+
+                print(
+                    f"| {count} | {mode} | {result['first'] * 1000:.0f} | {result['total']:.2f} "
+                    f"| {count / result['total']:.0f} | {result['rss']:.0f} |"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import io
+import os
+import sys
+import time
+import numpy as np
+from PIL import Image
+
+# Ajout du dossier parent pour accéder au module common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.metrics import MetricsRegistry
+from common.preprocessing import decode_jpeg, letterbox_into
+
+STAGES = ("decode", "preprocess", "inference", "postprocess", "publish")
+
+
+def instrument(registry: MetricsRegistry):
+    """
+    Reproduit les mises à jour faites par le service MQTT pour une image.
+
+    :param registry: Le registre de métriques
+
+    :return: La fonction de mise à jour (sans argument)
+    """
+
+    received = registry.counter("frames_received")
+    published = registry.counter("results_published")
+    batch_size = registry.histogram("batch_size", buckets=(1, 2, 4, 8, 16, 32))
+    latency = registry.histogram("frame_latency_ms")
+    stages = {stage: registry.histogram("stage_duration_ms", labels={"stage": stage}) for stage in STAGES}
+
+    def update():
+        received.inc()
+
+        for histogram in stages.values():
+            histogram.observe(3.2)
+
+        batch_size.observe(4)
+        latency.observe(42.0)
+        published.inc()
+
+    return update
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Surcoût des métriques par image par rapport au temps de traitement d'une image")
+    parser.add_argument("-i", "--image", help="Image JPEG (sinon une image synthétique 1920x1080)")
+    parser.add_argument("--frame-ms", type=float, help="Temps de traitement d'une image (sinon décodage + letterbox seuls, cas le plus défavorable)")
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            data = f.read()
+    else:
+        stream = io.BytesIO()
+        noise = np.random.default_rng(0).integers(0, 255, (1080, 1920, 3), dtype=np.uint8)
+        Image.fromarray(noise).save(stream, format="jpeg")
+        data = stream.getvalue()
+
+    out = np.empty((640, 640, 3), dtype=np.uint8)
+
+    def process():
+        image, _ = decode_jpeg(data, 640)
+        letterbox_into(image, out)
+
+    registry = MetricsRegistry("inference_")
+    update = instrument(registry)
+
+    def run(function, iterations):
+        function()
+        start = time.perf_counter()
+
+        for _ in range(iterations):
+            function()
+
+        return (time.perf_counter() - start) / iterations * 1000
+
+    frame_ms = args.frame_ms or run(process, args.iterations)
+    metrics_ms = run(update, args.iterations * 100)
+    render_ms = run(registry.render, 100)
+    overhead = metrics_ms / frame_ms
+
+    print("| Temps par image (ms) | Métriques par image (µs) | Surcoût | Export /metrics (ms) |")
+    print("|----------------------|--------------------------|---------|----------------------|")
+    print(f"| {frame_ms:>20.2f} | {metrics_ms * 1000:>24.2f} | {overhead:>7.3%} | {render_ms:>20.3f} |")
+
+    sys.exit(0 if overhead < 0.01 else 1)
+
+
+if __name__ == "__main__":
+    main()
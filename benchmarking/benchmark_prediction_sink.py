@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Ajout du dossier parent pour accéder au module common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.prediction_sink import PredictionSink
+
+
+def image_predictions(image_id: int, detections: int, rng: random.Random) -> list:
+    """
+    :return: Des prédictions COCO aléatoires pour une image
+    """
+
+    return [{
+        "image_id": image_id,
+        "category_id": rng.randrange(7),
+        "bbox": [rng.uniform(0, 600), rng.uniform(0, 600), rng.uniform(5, 100), rng.uniform(5, 100)],
+        "score": rng.random()
+    } for _ in range(detections)]
+
+
+def previous_write(path: str, images: int, detections: int) -> None:
+    """
+    Ancienne écriture de hailo/object_detection.py : relecture et réécriture complète du fichier à chaque image.
+
+    :param path: Le fichier des prédictions
+    :param images: Le nombre d'images
+    :param detections: Le nombre de détections par image
+    """
+
+    rng = random.Random(0)
+
+    for image_id in range(images):
+        predictions = image_predictions(image_id, detections, rng)
+
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                existing_predictions = json.load(f)
+            predictions = existing_predictions + predictions
+        with open(path, 'w') as f:
+            json.dump(predictions, f, indent=4)
+
+
+def sink_write(path: str, images: int, detections: int) -> None:
+    rng = random.Random(0)
+
+    with PredictionSink(path) as sink:
+        for image_id in range(images):
+            sink.extend(image_predictions(image_id, detections, rng))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Écriture des prédictions : réécriture du fichier à chaque image et PredictionSink (JSON Lines)")
+    parser.add_argument("-c", "--counts", type=int, nargs="+", default=[100, 500, 1000, 10000], help="Nombres d'images")
+    parser.add_argument("-d", "--detections", type=int, default=10, help="Détections par image")
+    parser.add_argument("--max-previous", type=int, default=1000, help="Nombre d'images au-delà duquel l'ancienne écriture n'est pas mesurée")
+    args = parser.parse_args()
+
+    print("| Images | Écriture | Durée (s) | ms / image | Taille (ko) |")
+    print("|--------|----------|-----------|------------|-------------|")
+
+    for count in args.counts:
+        with tempfile.TemporaryDirectory() as directory:
+            results = {}
+
+            for name, write in (("réécriture", previous_write), ("sink", sink_write)):
+                if write is previous_write and count > args.max_previous:
+                    continue
+
+                path = os.path.join(directory, f"{write.__name__}.json")
+                start = time.perf_counter()
+                write(path, count, args.detections)
+                elapsed = time.perf_counter() - start
+
+                with open(path) as f:
+                    results[name] = json.load(f)
+
+                print(f"| {count} | {name} | {elapsed:.2f} | {elapsed / count * 1000:.2f} | {os.path.getsize(path) / 1000:.0f} |")
+
+            if len(results) == 2:
+                assert results["réécriture"] == results["sink"], "Prédictions différentes"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+# Ajout du dossier parent pour accéder au module common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.preprocessing import decode_jpeg, letterbox_into
+
+
+def previous_preprocessing(data: bytes, size: int) -> np.ndarray:
+    """
+    Ancien chemin : décodage complet, image PIL complétée allouée à chaque image puis conversion numpy.
+
+    :param data: Les octets JPEG
+    :param size: La taille de l'entrée du modèle
+
+    :return: L'entrée du modèle
+    """
+
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    width, height = image.size
+    scale = min(size / width, size / height)
+    new_width, new_height = int(width * scale), int(height * scale)
+    image = image.resize((new_width, new_height), Image.BILINEAR)
+
+    padded_image = Image.new("RGB", (size, size), (114, 114, 114))
+    padded_image.paste(image, ((size - new_width) // 2, (size - new_height) // 2))
+
+    return np.array(padded_image)
+
+
+def measure(function, iterations: int) -> tuple:
+    """
+    Mesure la latence et les allocations mémoire par image.
+
+    :param function: La fonction de prétraitement (sans argument)
+    :param iterations: Le nombre d'images
+
+    :return: La latence moyenne (ms), le nombre de blocs alloués et le pic mémoire (Mo) par image
+             (allocations Python et numpy, les tampons internes de PIL ne sont pas vus par tracemalloc)
+    """
+
+    function()
+
+    start = time.perf_counter()
+
+    for _ in range(iterations):
+        function()
+
+    latency = (time.perf_counter() - start) / iterations * 1000
+
+    # Allocations mesurées à part : tracemalloc ralentit fortement l'exécution
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    function()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    return latency, blocks, peak / 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latence et allocations du prétraitement par image (décodage JPEG + letterbox)")
+    parser.add_argument("-i", "--image", help="Image JPEG (sinon une image synthétique)")
+    parser.add_argument("--width", type=int, default=1920, help="Largeur de l'image synthétique")
+    parser.add_argument("--height", type=int, default=1080, help="Hauteur de l'image synthétique")
+    parser.add_argument("-s", "--size", type=int, default=640, help="Taille de l'entrée du modèle")
+    parser.add_argument("-n", "--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            data = f.read()
+    else:
+        stream = io.BytesIO()
+        noise = np.random.default_rng(0).integers(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+        Image.fromarray(noise).save(stream, format="jpeg")
+        data = stream.getvalue()
+
+    out = np.empty((args.size, args.size, 3), dtype=np.uint8)
+
+    def new_preprocessing():
+        image, _ = decode_jpeg(data, args.size)
+        letterbox_into(image, out)
+
+    print("| Prétraitement | Latence (ms) | Blocs alloués | Pic mémoire (Mo) |")
+    print("|---------------|--------------|---------------|------------------|")
+
+    for name, function in (("précédent", lambda: previous_preprocessing(data, args.size)), ("partagé", new_preprocessing)):
+        latency, blocks, peak = measure(function, args.iterations)
+        print(f"| {name:<13} | {latency:>12.2f} | {blocks:>13} | {peak:>16.2f} |")
+
+
+if __name__ == "__main__":
+    main()
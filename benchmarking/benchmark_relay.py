@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import io
+import os
+import subprocess
+import sys
+import time
+
+from PIL import Image
+
+# Ajout du dossier rpi-cam pour accéder à la caméra simulée
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "rpi-cam")))
+from fake_camera import FakeCamera
+
+RELAY = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "relay", "relay.py"))
+
+
+def cpu_seconds(pid: int) -> float:
+    """
+    :param pid: Le processus (Linux, /proc)
+
+    :return: Le temps CPU (utilisateur + système) consommé par le processus (s)
+    """
+
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def mjpeg_client(port: int, duration: float, delay: float, counts: list) -> None:
+    """
+    Lit le flux MJPEG et compte les images reçues.
+
+    :param port: Le port du relais
+    :param duration: La durée de la lecture (s)
+    :param delay: L'attente après chaque image (client lent), 0 pour un client rapide
+    :param counts: La liste où ajouter le nombre d'images reçues
+    """
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /stream.mjpg HTTP/1.1\r\nHost: relay\r\n\r\n")
+    await writer.drain()
+    frames = 0
+    end = time.monotonic() + duration
+
+    # En-têtes de la réponse
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+
+    try:
+        while time.monotonic() < end:
+            line = await asyncio.wait_for(reader.readline(), end - time.monotonic())
+
+            if line.lower().startswith(b"content-length:"):
+                size = int(line.split(b":")[1])
+                await reader.readline()
+                await reader.readexactly(size + 2)
+                frames += 1
+
+                if delay:
+                    await asyncio.sleep(delay)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        writer.close()
+
+    counts.append(frames)
+
+
+async def measure(pid: int, port: int, clients: int, slow: int, duration: float) -> tuple:
+    """
+    :return: Le CPU du relais (% d'un cœur), les images/s reçues par un client rapide et par un client lent
+    """
+
+    fast_counts, slow_counts = [], []
+    tasks = [mjpeg_client(port, duration + 1, 0, fast_counts) for _ in range(clients)]
+    tasks += [mjpeg_client(port, duration + 1, 1.0, slow_counts) for _ in range(slow)]
+    gathered = asyncio.gather(*tasks)
+
+    # Mesure après l'établissement des connexions
+    await asyncio.sleep(0.5)
+    start_cpu, start = cpu_seconds(pid), time.monotonic()
+    await asyncio.sleep(duration)
+    cpu = (cpu_seconds(pid) - start_cpu) / (time.monotonic() - start) * 100
+    await gathered
+
+    def fps(counts):
+        return sum(counts) / len(counts) / (duration + 1) if counts else float("nan")
+
+    return cpu, fps(fast_counts), fps(slow_counts)
+
+
+def reencode_ms(size: int, quality: int = 80, iterations: int = 20) -> float:
+    """
+    :return: La durée (ms) du décodage puis réencodage d'une image, ce que coûterait chaque client à un serveur qui réencode
+    """
+
+    data = FakeCamera((size, size), frames=1).next_image()
+    start = time.perf_counter()
+
+    for _ in range(iterations):
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        image.save(io.BytesIO(), format="jpeg", quality=quality)
+
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CPU du relais MJPEG selon le nombre de clients connectés (images synthétiques)")
+    parser.add_argument("-c", "--clients", type=int, nargs="+", default=[0, 1, 5, 10, 25, 50])
+    parser.add_argument("--slow", type=int, default=2, help="Clients lents (une image par seconde) ajoutés à chaque mesure")
+    parser.add_argument("--fps", type=float, default=10)
+    parser.add_argument("--size", type=int, default=640)
+    parser.add_argument("--duration", type=float, default=5, help="Durée de chaque mesure (s)")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+
+    relay = subprocess.Popen(
+        [sys.executable, RELAY, "--test-pattern", "--fps", str(args.fps), "--size", str(args.size), "--http-port", str(args.port)],
+        stdout=subprocess.DEVNULL
+    )
+    time.sleep(2)
+
+    encode = reencode_ms(args.size)
+
+    print(f"Réencodage d'une image : {encode:.1f} ms")
+    print("| Clients rapides | Clients lents | CPU relais (%) | Images/s client rapide | Images/s client lent | CPU avec réencodage par client (estimé, %) |")
+    print("|-----------------|---------------|----------------|------------------------|----------------------|--------------------------------------------|")
+
+    try:
+        for clients in args.clients:
+            cpu, fast_fps, slow_fps = asyncio.run(measure(relay.pid, args.port, clients, args.slow, args.duration))
+            estimated = encode / 1000 * args.fps * (clients + args.slow) * 100
+            print(f"| {clients} | {args.slow} | {cpu:.1f} | {fast_fps:.2f} | {slow_fps:.2f} | {estimated:.0f} |")
+    finally:
+        relay.terminate()
+        relay.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+YOLO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "yolo"))
+
+
+def child(backend_name: str, model_path: str, cache_dir: str, warmup: int, image_path: str) -> None:
+    """
+    Démarrage mesuré dans un processus neuf : import du moteur, chargement, préchauffage et première prédiction.
+
+    :param backend_name: Le nom du moteur
+    :param model_path: Le chemin du modèle
+    :param cache_dir: Le dossier du cache ("" pour le désactiver)
+    :param warmup: Le nombre d'inférences de préchauffage
+    :param image_path: L'image de la première prédiction
+    """
+
+    start = time.perf_counter()
+    stages = {}
+
+    sys.path.append(YOLO_PATH)
+    from backends import create_backend
+    from PIL import Image
+
+    stages["import"] = time.perf_counter() - start
+
+    backend = create_backend(backend_name, model_path, cache_dir=cache_dir or None)
+    backend.load()
+    stages["load"] = time.perf_counter() - start
+
+    if warmup:
+        backend.warmup(warmup)
+
+    stages["warmup"] = time.perf_counter() - start
+
+    image = Image.open(image_path).convert("RGB") if image_path else Image.new("RGB", (640, 640))
+    backend.predict([image])
+    stages["first_result"] = time.perf_counter() - start
+
+    print(json.dumps(stages))
+
+
+def run(args: argparse.Namespace, spec: str, cache_dir: str, warmup: int) -> dict:
+    """
+    Lance une mesure de démarrage dans un nouveau processus.
+
+    :param args: Les arguments du benchmark
+    :param spec: Le moteur au format <moteur>:<modèle>
+    :param cache_dir: Le dossier du cache ("" pour le désactiver)
+    :param warmup: Le nombre d'inférences de préchauffage
+
+    :return: Le temps (s) écoulé à la fin de chaque étape
+    """
+
+    backend_name, model_path = spec.split(':', 1)
+    command = [
+        sys.executable, __file__, "--child", backend_name, os.path.abspath(model_path),
+        cache_dir, str(warmup), args.image or ""
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]), sys.argv[6])
+        return
+
+    parser = argparse.ArgumentParser(description="Temps de démarrage du service d'inférence jusqu'au premier résultat")
+    parser.add_argument(
+        "-b", "--backend", action="append", required=True,
+        help="Moteur au format <moteur>:<modèle>, ex. onnxruntime:../yolo/saved/yolo11n_trained.onnx"
+    )
+    parser.add_argument("-i", "--image", help="Image de la première prédiction")
+    parser.add_argument("-w", "--warmup", type=int, default=2)
+    args = parser.parse_args()
+
+    print("| Moteur | Cas | Import (s) | Chargement (s) | Préchauffage (s) | Premier résultat (s) |")
+    print("|--------|-----|------------|----------------|------------------|----------------------|")
+
+    for spec in args.backend:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cases = (
+                ("sans cache ni préchauffage", "", 0),
+                ("cache vide", cache_dir, args.warmup),
+                ("cache rempli", cache_dir, args.warmup),
+            )
+
+            for name, cache, warmup in cases:
+                stages = run(args, spec, cache, warmup)
+                print(
+                    f"| {spec} | {name} | {stages['import']:.2f} | {stages['load']:.2f} | "
+                    f"{stages['warmup']:.2f} | {stages['first_result']:.2f} |"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from PIL import Image
+from pycocotools.coco import COCO
+from utils import evaluate_predictions
+
+# Ajout du dossier yolo pour accéder aux moteurs d'inférence
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "yolo")))
+from backends import create_backend
+from tiling import MERGE_NMS, MERGE_WBF, TiledPredictor
+
+
+def run(predictor, coco: COCO, dataset: str) -> tuple:
+    """
+    Prédit toutes les images du jeu de test.
+
+    :param predictor: Le moteur ou le mode tuilé (méthode predict)
+    :param coco: Les annotations COCO du jeu de test
+    :param dataset: Le dossier des images
+
+    :return: Les prédictions au format COCO et la latence moyenne (ms/image)
+    """
+
+    predictions = []
+    elapsed = 0
+
+    for image_meta in coco.loadImgs(coco.getImgIds()):
+        image = Image.open(os.path.join(dataset, image_meta["file_name"])).convert("RGB")
+
+        start = time.perf_counter()
+        detections = predictor.predict([image])[0][0]
+        elapsed += time.perf_counter() - start
+
+        predictions.extend({"image_id": image_meta["id"], **detection} for detection in detections)
+
+    return predictions, elapsed / len(coco.getImgIds()) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Précision et latence du mode tuilé par rapport à l'image entière")
+    parser.add_argument("-d", "--dataset", default="../data/dataset4/test", help="Dossier des images de test (avec result.json)")
+    parser.add_argument("-b", "--backend", default="onnxruntime:../yolo/saved/yolo11n_trained.onnx", help="Moteur au format <moteur>:<modèle>")
+    parser.add_argument("-t", "--tile-size", type=int, nargs='+', default=[640], help="Côtés de tuile à comparer")
+    parser.add_argument("-o", "--overlap", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        coco = COCO(os.path.join(args.dataset, "result.json"))
+
+    name, model_path = args.backend.split(':', 1)
+    backend = create_backend(name, model_path)
+    backend.load()
+    backend.warmup(2)
+
+    modes = [("image entière", backend)]
+
+    for tile_size in args.tile_size:
+        modes += [
+            (f"tuiles {tile_size} + image, nms", TiledPredictor(backend, tile_size, args.overlap, True, MERGE_NMS)),
+            (f"tuiles {tile_size} + image, wbf", TiledPredictor(backend, tile_size, args.overlap, True, MERGE_WBF)),
+            (f"tuiles {tile_size}, nms", TiledPredictor(backend, tile_size, args.overlap, False, MERGE_NMS)),
+        ]
+
+    print("| Mode | mAP@[.50:.95] | Recall@[.50:.95] | AP petits objets | Latence (ms/image) |")
+    print("|------|---------------|------------------|------------------|--------------------|")
+
+    for mode, predictor in modes:
+        predictions, latency = run(predictor, coco, args.dataset)
+        metrics = evaluate_predictions(coco, predictions)
+        print(f"| {mode} | {metrics['mAP_50_95']:.3f} | {metrics['recall_50_95']:.3f} | {metrics['AP_small']:.3f} | {latency:.1f} |")
+
+
+if __name__ == "__main__":
+    main()
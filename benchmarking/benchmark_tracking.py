@@ -0,0 +1,93 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from PIL import Image
+from pycocotools.coco import COCO
+from utils import evaluate_predictions
+
+# Ajout du dossier yolo pour accéder aux moteurs d'inférence
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "yolo")))
+from backends import create_backend
+from tracking import FrameTracker
+
+
+def replay(backend, tracker, images: list, fps: float) -> tuple:
+    """
+    Rejoue une séquence : le détecteur ne tourne que quand le suivi le demande.
+
+    :param backend: Le moteur d'inférence
+    :param tracker: Le suivi (FrameTracker), ou None pour détecter toutes les images
+    :param images: Les images (métadonnées COCO, image RGB) dans l'ordre de capture
+    :param fps: La fréquence de capture de la séquence
+
+    :return: Les prédictions au format COCO, le nombre de passages du détecteur et la latence moyenne (ms/image)
+    """
+
+    predictions = []
+    detector_calls = 0
+    elapsed = 0
+
+    for i, (image_meta, image) in enumerate(images):
+        timestamp = i / fps
+        start = time.perf_counter()
+
+        if tracker is None or tracker.should_detect(0):
+            detections = backend.predict([image])[0][0]
+            detector_calls += 1
+
+            if tracker is not None:
+                tracker.update(0, detections, timestamp)
+        else:
+            detections = tracker.propagate(0, timestamp)
+
+        elapsed += time.perf_counter() - start
+        predictions.extend({"image_id": image_meta["id"], **detection} for detection in detections)
+
+    return predictions, detector_calls, elapsed / len(images) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Passages du détecteur évités et impact sur la mAP du suivi entre deux détections")
+    parser.add_argument("-d", "--dataset", required=True, help="Dossier d'une séquence annotée (avec result.json), images dans l'ordre alphabétique")
+    parser.add_argument("-b", "--backend", default="onnxruntime:../yolo/saved/yolo11n_trained.onnx", help="Moteur au format <moteur>:<modèle>")
+    parser.add_argument("-k", "--detect-every", type=int, nargs='+', default=[2, 5, 10])
+    parser.add_argument("--min-confidence", type=float, default=0.3)
+    parser.add_argument("--fps", type=float, default=5, help="Fréquence de capture de la séquence")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        coco = COCO(os.path.join(args.dataset, "result.json"))
+
+    images = [
+        (image_meta, Image.open(os.path.join(args.dataset, image_meta["file_name"])).convert("RGB"))
+        for image_meta in sorted(coco.loadImgs(coco.getImgIds()), key=lambda image_meta: image_meta["file_name"])
+    ]
+    duration = len(images) / args.fps
+
+    name, model_path = args.backend.split(':', 1)
+    backend = create_backend(name, model_path)
+    backend.load()
+    backend.warmup(2)
+
+    modes = [("toutes les images", None)] + [
+        (f"k = {k}", FrameTracker(k, args.min_confidence)) for k in args.detect_every
+    ]
+
+    print(f"{len(images)} images à {args.fps} images/s")
+    print("| Mode | Détections/s | Détections/s évitées | mAP@[.50:.95] | Recall@[.50:.95] | Latence (ms/image) |")
+    print("|------|--------------|----------------------|---------------|------------------|--------------------|")
+
+    for mode, tracker in modes:
+        predictions, detector_calls, latency = replay(backend, tracker, images, args.fps)
+        metrics = evaluate_predictions(coco, predictions)
+        print(
+            f"| {mode} | {detector_calls / duration:.2f} | {(len(images) - detector_calls) / duration:.2f} | "
+            f"{metrics['mAP_50_95']:.3f} | {metrics['recall_50_95']:.3f} | {latency:.1f} |"
+        )
+
+
+if __name__ == "__main__":
+    main()
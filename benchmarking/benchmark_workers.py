@@ -0,0 +1,97 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import paho.mqtt.client as mqtt
+
+# Ajout du dossier parent pour accéder au module common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.frame_protocol import encode_frame
+from common.result_protocol import decode_result
+
+YOLO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "yolo"))
+
+
+def run(args: argparse.Namespace, workers: int, image: bytes) -> float:
+    """
+    Mesure le débit du service d'inférence avec un nombre de workers donné.
+
+    :param args: Les arguments du benchmark
+    :param workers: Le nombre de workers
+    :param image: L'image JPEG envoyée
+
+    :return: Le débit en images par seconde
+    """
+
+    command = [
+        sys.executable, "launcher.py", "--workers", str(workers), "--broker", args.broker, "--port", str(args.port),
+        "--model", args.model, "--backend", args.backend
+    ]
+
+    if args.dispatcher:
+        command.append("--dispatcher")
+
+    launcher = subprocess.Popen(command, cwd=YOLO_PATH)
+    received = set()
+    last_result = [0.0]
+
+    def on_message(client, userdata, msg):
+        received.add(decode_result(msg.payload)["image_id"])
+        last_result[0] = time.perf_counter()
+
+    client = mqtt.Client()
+    client.on_message = on_message
+    client.connect(args.broker, args.port, 60)
+    client.subscribe("inference/results", qos=1)
+    client.loop_start()
+
+    try:
+        time.sleep(args.startup)
+
+        start = time.perf_counter()
+
+        for sequence in range(args.frames):
+            client.publish("inference/images", encode_frame(image, sequence), qos=1)
+
+        # Les images rejetées par la file d'entrée n'auront pas de résultat : on s'arrête après `idle` s sans résultat
+        while len(received) < args.frames and time.perf_counter() - max(start, last_result[0]) < args.idle:
+            time.sleep(0.1)
+
+        elapsed = max(last_result[0], start + 1e-9) - start
+    finally:
+        client.loop_stop()
+        client.disconnect()
+        launcher.send_signal(signal.SIGTERM)
+        launcher.wait()
+
+    return len(received) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Débit du service d'inférence en fonction du nombre de workers (broker local, ex. mosquitto)")
+    parser.add_argument("-i", "--image", required=True, help="Image JPEG envoyée en boucle")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("-n", "--frames", type=int, default=500)
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--model", default="yolo11n_trained.onnx")
+    parser.add_argument("--backend", default="onnxruntime")
+    parser.add_argument("--dispatcher", action="store_true")
+    parser.add_argument("--startup", type=float, default=10, help="Temps laissé aux workers pour charger le modèle (s)")
+    parser.add_argument("--idle", type=float, default=5, help="Arrêt après ce temps sans nouveau résultat (s)")
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        image = f.read()
+
+    print("| Workers | Images/s |")
+    print("|---------|----------|")
+
+    for workers in args.workers:
+        print(f"| {workers:>7} | {run(args, workers, image):>8.1f} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import sys
+import numpy as np
+from PIL import Image
+
+# Ajout du dossier yolo pour accéder aux moteurs d'inférence
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "yolo")))
+from backends import create_backend
+from boxes import iou_matrix
+
+
+def to_xyxy(detections: list) -> np.ndarray:
+    """
+    Convertit les boîtes COCO d'une liste de détections au format [x1, y1, x2, y2].
+
+    :param detections: Les détections
+
+    :return: Le tableau (N, 4) des boîtes
+    """
+
+    boxes = np.array([detection["bbox"] for detection in detections], dtype=np.float32).reshape(-1, 4)
+    boxes[:, 2:] += boxes[:, :2]
+
+    return boxes
+
+
+def match_detections(reference: list, candidate: list, min_iou: float) -> int:
+    """
+    Associe les détections de même classe entre deux moteurs.
+
+    :param reference: Les détections du moteur de référence
+    :param candidate: Les détections du moteur testé
+    :param min_iou: L'IoU minimal pour considérer deux boîtes identiques
+
+    :return: Le nombre de détections de référence retrouvées
+    """
+
+    if not reference or not candidate:
+        return 0
+
+    ious = iou_matrix(to_xyxy(reference), to_xyxy(candidate))
+    same_class = np.array([[r["category_id"] == c["category_id"] for c in candidate] for r in reference])
+    ious[~same_class] = 0
+
+    matched = 0
+    used = set()
+
+    for i in np.argsort([-r["score"] for r in reference]):
+        j = int(np.argmax(ious[i]))
+
+        if ious[i, j] >= min_iou and j not in used:
+            used.add(j)
+            matched += 1
+
+    return matched
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vérifie que les moteurs d'inférence donnent les mêmes prédictions que le modèle .pt")
+    parser.add_argument("-d", "--dataset", default="../data/dataset4/test", help="Dossier des images de test (avec result.json)")
+    parser.add_argument("-r", "--reference", default="../yolo/saved/yolo11n_trained.pt", help="Modèle de référence (moteur ultralytics)")
+    parser.add_argument(
+        "-c", "--candidate", action="append", required=True,
+        help="Moteur à tester au format <moteur>:<modèle>, ex. onnxruntime:../yolo/saved/yolo11n_trained.onnx"
+    )
+    parser.add_argument("--min-iou", type=float, default=0.9)
+    parser.add_argument("--min-match", type=float, default=0.95, help="Taux minimal de détections retrouvées")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.dataset, "result.json"), 'r') as f:
+        coco_data = json.load(f)
+
+    reference = create_backend("ultralytics", args.reference)
+    reference.load()
+
+    candidates = {}
+
+    for candidate in args.candidate:
+        name, model_path = candidate.split(':', 1)
+        candidates[candidate] = create_backend(name, model_path)
+        candidates[candidate].load()
+
+    totals = {candidate: [0, 0, 0] for candidate in candidates}  # retrouvées, référence, testé
+
+    for image_meta in coco_data["images"]:
+        image = Image.open(os.path.join(args.dataset, image_meta["file_name"])).convert("RGB")
+        expected = reference.predict([image])[0][0]
+
+        for candidate, backend in candidates.items():
+            detections = backend.predict([image])[0][0]
+            totals[candidate][0] += match_detections(expected, detections, args.min_iou)
+            totals[candidate][1] += len(expected)
+            totals[candidate][2] += len(detections)
+
+    failed = False
+
+    for candidate, (matched, expected, found) in totals.items():
+        rate = matched / expected if expected else 1.0
+        failed |= rate < args.min_match
+        print(f"{candidate} : {matched}/{expected} détections retrouvées ({rate:.1%}), {found} détections au total")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
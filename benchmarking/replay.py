@@ -0,0 +1,264 @@
+import argparse
+import os
+import struct
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+import paho.mqtt.client as mqtt
+
+# Ajout du dossier parent pour accéder au module common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.frame_protocol import (
+    ENCODING_JPEG, ENCODING_PNG, FORMAT_BINARY, FORMAT_JSON, decode_frame, encode_frame, encode_legacy_frame, frame_id
+)
+from common.result_protocol import decode_result
+
+# Enregistrement d'une capture MQTT : instant relatif (s) et taille, suivis du message brut
+RECORD = struct.Struct(">dI")
+
+IMAGE_EXTENSIONS = {".jpg": ENCODING_JPEG, ".jpeg": ENCODING_JPEG, ".png": ENCODING_PNG}
+
+
+def load_directory(directory: str) -> list:
+    """
+    Charge les images d'un dossier (ordre alphabétique).
+
+    :param directory: Le dossier des images (ex. data/dataset4/test ou les images de streetview)
+
+    :return: La liste des images (octets, encodage)
+    """
+
+    images = []
+
+    for name in sorted(os.listdir(directory)):
+        encoding = IMAGE_EXTENSIONS.get(os.path.splitext(name)[1].lower())
+
+        if encoding is not None:
+            with open(os.path.join(directory, name), "rb") as f:
+                images.append((f.read(), encoding))
+
+    return images
+
+
+def load_capture(path: str) -> list:
+    """
+    Charge une capture MQTT enregistrée par `replay.py record`.
+
+    :param path: Le fichier de capture
+
+    :return: La liste des messages (instant relatif en s, message brut)
+    """
+
+    messages = []
+
+    with open(path, "rb") as f:
+        while header := f.read(RECORD.size):
+            offset, size = RECORD.unpack(header)
+            messages.append((offset, f.read(size)))
+
+    return messages
+
+
+def record(args: argparse.Namespace) -> None:
+    """
+    Enregistre les images publiées sur le topic des images (ex. pendant un trajet réel).
+
+    :param args: Les arguments de la commande
+    """
+
+    start = time.perf_counter()
+    lock = threading.Lock()
+    count = [0]
+
+    with open(args.output, "wb") as f:
+        def on_message(client, userdata, msg):
+            with lock:
+                f.write(RECORD.pack(time.perf_counter() - start, len(msg.payload)) + msg.payload)
+                count[0] += 1
+
+        client = mqtt.Client()
+        client.on_message = on_message
+        client.connect(args.broker, args.port, 60)
+        client.subscribe(args.images_topic, qos=1)
+        client.loop_start()
+
+        try:
+            if args.duration:
+                time.sleep(args.duration)
+            else:
+                threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            client.loop_stop()
+            client.disconnect()
+
+    print(f"{count[0]} messages enregistrés dans {args.output}")
+
+
+class ResultCollector:
+    """
+    Réception des résultats : instant du premier résultat de chaque image et validité des messages.
+    """
+
+    def __init__(self):
+        self.received = {}  # image_id -> instant de réception (perf_counter)
+        self.messages = 0
+        self.malformed = 0
+        self.last_result = 0.0
+        self.lock = threading.Lock()
+
+    def on_message(self, client, userdata, msg):
+        now = time.perf_counter()
+
+        try:
+            result = decode_result(msg.payload)
+            complete = len(result["boxes"]) == 4 * len(result["classes"]) == 4 * len(result["scores"])
+        except (ValueError, KeyError, TypeError):
+            result, complete = None, False
+
+        with self.lock:
+            self.messages += 1
+            self.last_result = now
+
+            if not complete:
+                self.malformed += 1
+                return
+
+            # Ancien format : plusieurs messages par image, seul le premier compte pour la latence
+            self.received.setdefault(result["image_id"], now)
+
+
+def percentile(values: list, p: float) -> float:
+    return values[min(len(values) - 1, int(p * len(values)))] if values else float("nan")
+
+
+def play(args: argparse.Namespace) -> None:
+    """
+    Rejoue des images sur le topic des images et mesure les résultats du service d'inférence.
+
+    :param args: Les arguments de la commande
+    """
+
+    collector = ResultCollector()
+    client = mqtt.Client()
+    client.on_message = collector.on_message
+    client.connect(args.broker, args.port, 60)
+    client.subscribe(args.results_topic, qos=1)
+    client.loop_start()
+
+    sent = {}  # image_id -> instant d'envoi (perf_counter)
+    sequences = defaultdict(int)  # camera_id -> prochain numéro de séquence
+
+    def publish(camera_id, data, encoding):
+        timestamp = time.time()
+
+        if args.format == FORMAT_BINARY:
+            image_id = frame_id(camera_id, sequences[camera_id])
+            payload = encode_frame(data, sequences[camera_id], camera_id, timestamp, encoding)
+        else:
+            image_id = datetime.fromtimestamp(timestamp).isoformat()
+            payload = encode_legacy_frame(data, timestamp)
+
+        sequences[camera_id] += 1
+        sent[image_id] = time.perf_counter()
+        client.publish(args.images_topic, payload, qos=args.qos)
+
+    time.sleep(1)  # Abonnement aux résultats avant le premier envoi
+    start = time.perf_counter()
+
+    try:
+        if args.capture:
+            # Rythme d'origine de la capture, timestamps remplacés par l'instant d'envoi
+            for offset, payload in load_capture(args.capture):
+                delay = start + offset / args.speed - time.perf_counter()
+
+                if delay > 0:
+                    time.sleep(delay)
+
+                frame = decode_frame(payload)
+                publish(frame.camera_id, bytes(frame.data), frame.encoding)
+        else:
+            images = load_directory(args.directory)
+
+            if not images:
+                sys.exit(f"Aucune image dans {args.directory}")
+
+            total = args.frames or len(images)
+
+            # Chaque caméra envoie `fps` images par seconde, décalées d'une fraction de période
+            for index in range(total):
+                for camera_id in range(args.cameras):
+                    due = start + (index + camera_id / args.cameras) / args.fps
+                    delay = due - time.perf_counter()
+
+                    if delay > 0:
+                        time.sleep(delay)
+
+                    publish(camera_id, *images[(index + camera_id) % len(images)])
+    except KeyboardInterrupt:
+        pass
+
+    published = time.perf_counter()
+
+    # Les images rejetées par le service n'auront jamais de résultat : arrêt après `idle` s sans résultat
+    while len(collector.received) < len(sent) and time.perf_counter() - max(published, collector.last_result) < args.idle:
+        time.sleep(0.1)
+
+    client.loop_stop()
+    client.disconnect()
+
+    with collector.lock:
+        matched = {image_id: received - sent[image_id] for image_id, received in collector.received.items() if image_id in sent}
+        last_result = collector.last_result
+        messages, malformed = collector.messages, collector.malformed
+
+    latencies = sorted(latency * 1000 for latency in matched.values())
+    frames = len(sent)
+
+    print("| Images envoyées | Images/s envoyées | Résultats/s | Pertes | Complétude | p50 (ms) | p90 (ms) | p99 (ms) | max (ms) |")
+    print("|-----------------|-------------------|-------------|--------|------------|----------|----------|----------|----------|")
+    print(
+        f"| {frames:>15} | {frames / (published - start):>17.1f} | {len(matched) / max(last_result - start, 1e-9):>11.1f} "
+        f"| {1 - len(matched) / max(frames, 1):>6.1%} | {(messages - malformed) / max(messages, 1):>10.1%} "
+        f"| {percentile(latencies, 0.5):>8.1f} | {percentile(latencies, 0.9):>8.1f} | {percentile(latencies, 0.99):>8.1f} "
+        f"| {(latencies[-1] if latencies else float('nan')):>8.1f} |"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Générateur de charge du service d'inférence MQTT (broker local, ex. mosquitto)")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--images-topic", default="inference/images")
+    parser.add_argument("--results-topic", default="inference/results")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    play_parser = commands.add_parser("play", help="Rejoue un dossier d'images ou une capture et mesure les résultats")
+    source = play_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-d", "--directory", help="Dossier d'images, ex. ../data/dataset4/test")
+    source.add_argument("-c", "--capture", help="Capture enregistrée par la commande record")
+    play_parser.add_argument("--fps", type=float, default=5, help="Images par seconde et par caméra (dossier)")
+    play_parser.add_argument("--cameras", type=int, default=1, help="Nombre de caméras simulées (dossier)")
+    play_parser.add_argument("-n", "--frames", type=int, help="Images envoyées par caméra (dossier, par défaut une fois chaque image)")
+    play_parser.add_argument("--speed", type=float, default=1, help="Vitesse de relecture d'une capture")
+    play_parser.add_argument("--format", choices=(FORMAT_BINARY, FORMAT_JSON), default=FORMAT_BINARY)
+    play_parser.add_argument("--qos", type=int, default=1)
+    play_parser.add_argument("--idle", type=float, default=5, help="Arrêt après ce temps sans nouveau résultat (s)")
+
+    record_parser = commands.add_parser("record", help="Enregistre les images publiées (trajet réel)")
+    record_parser.add_argument("-o", "--output", required=True)
+    record_parser.add_argument("--duration", type=float, help="Durée de l'enregistrement (s), sinon jusqu'à Ctrl+C")
+
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args)
+    else:
+        play(args)
+
+
+if __name__ == "__main__":
+    main()
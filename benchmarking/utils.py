@@ -1,4 +1,6 @@
 from collections import defaultdict
+import contextlib
+import io
 import json
 import matplotlib.pyplot as plt
 import numpy as np
@@ -161,6 +163,33 @@ def extract_metrics(precision, recall) -> dict:
     return metrics
     
 
+def evaluate_predictions(coco: COCO, predictions: list) -> dict:
+    """
+    Évalue des prédictions avec COCOeval.
+
+    :param coco: L'objet COCO des annotations
+    :param predictions: La liste des prédictions au format COCO
+
+    :return: Les métriques globales et l'AP des petits objets
+    """
+
+    if not predictions:
+        return {"mAP_50_95": 0.0, "recall_50_95": 0.0, "AP_small": 0.0}
+
+    # Résumé de COCOeval masqué : seul le tableau comparatif est affiché
+    with contextlib.redirect_stdout(io.StringIO()):
+        coco_eval = COCOeval(coco, coco.loadRes(predictions), "bbox")
+        coco_eval.evaluate()
+        coco_eval.accumulate()
+        coco_eval.summarize()
+
+    precision, recall, _, _ = evaluate_metrics(coco_eval)
+    metrics = extract_metrics(precision, recall)
+    metrics["AP_small"] = max(coco_eval.stats[3], 0.0)
+
+    return metrics
+
+
 def display_metrics(precision, recall, iou_lookup, class_name) -> None:
     """
     Affiche les métriques de détection d'objets.
@@ -0,0 +1,135 @@
+import base64
+import json
+import struct
+import time
+from datetime import datetime
+from typing import NamedTuple, Optional, Tuple, Union
+
+# En-tête binaire : magic, version, encodage, timestamp (s depuis epoch), numéro de séquence, identifiant caméra,
+# puis depuis la version 2 : qualité JPEG, largeur et hauteur de l'image (0 : inconnue)
+MAGIC = b"IF"
+VERSION = 2
+HEADER_V1 = struct.Struct(">2sBBdIH")
+HEADER = struct.Struct(">2sBBdIHBHH")
+HEADERS = {1: HEADER_V1, 2: HEADER}
+
+ENCODING_JPEG = 0
+ENCODING_PNG = 1
+ENCODINGS = {ENCODING_JPEG: "jpeg", ENCODING_PNG: "png"}
+
+FORMAT_BINARY = "binary"
+FORMAT_JSON = "json"
+
+
+class Frame(NamedTuple):
+    image_id: str
+    timestamp: float
+    sequence: int
+    camera_id: int
+    encoding: int
+    data: Union[bytes, memoryview]
+    version: int
+    quality: Optional[int] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+def frame_id(camera_id: int, sequence: int) -> str:
+    """
+    Identifiant d'image utilisé dans les résultats d'inférence pour une trame binaire.
+
+    :param camera_id : Identifiant de la caméra.
+    :param sequence : Numéro de séquence de la trame.
+
+    :return: L'identifiant de l'image.
+    """
+
+    return f"{camera_id}-{sequence}"
+
+
+def encode_frame(data: bytes, sequence: int, camera_id: int = 0, timestamp: Optional[float] = None, encoding: int = ENCODING_JPEG,
+                 quality: Optional[int] = None, size: Optional[Tuple[int, int]] = None) -> bytes:
+    """
+    Encode une image dans l'enveloppe binaire (en-tête fixe suivi des octets bruts de l'image).
+
+    :param data : Octets de l'image encodée (JPEG par défaut).
+    :param sequence : Numéro de séquence de la trame.
+    :param camera_id : Identifiant de la caméra.
+    :param timestamp : Instant de capture (s depuis epoch), maintenant par défaut.
+    :param encoding : Encodage de l'image (ENCODING_JPEG ou ENCODING_PNG).
+    :param quality : Qualité JPEG choisie par la caméra (inconnue si None).
+    :param size : Taille de l'image (largeur, hauteur), inconnue si None.
+
+    :return: La trame prête à être publiée.
+    """
+
+    if timestamp is None:
+        timestamp = time.time()
+
+    width, height = size or (0, 0)
+
+    return HEADER.pack(MAGIC, VERSION, encoding, timestamp, sequence & 0xFFFFFFFF, camera_id, quality or 0, width, height) + data
+
+
+def encode_legacy_frame(data: bytes, timestamp: Optional[float] = None) -> bytes:
+    """
+    Encode une image dans l'ancien format JSON (image en base64).
+
+    :param data : Octets de l'image JPEG.
+    :param timestamp : Instant de capture (s depuis epoch), maintenant par défaut.
+
+    :return: La trame prête à être publiée.
+    """
+
+    if timestamp is None:
+        timestamp = time.time()
+
+    payload = {
+        "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+        "image": base64.b64encode(data).decode("utf-8")
+    }
+
+    return json.dumps(payload).encode("utf-8")
+
+
+def decode_frame(payload: bytes) -> Frame:
+    """
+    Décode une trame reçue, au format binaire ou dans l'ancien format JSON (détection automatique).
+
+    Pour le format binaire les octets de l'image ne sont pas copiés (memoryview sur le message).
+
+    :param payload : Contenu du message MQTT.
+
+    :return: La trame décodée.
+
+    :raises ValueError: Si le format n'est pas reconnu.
+    """
+
+    if payload[:len(MAGIC)] == MAGIC:
+        version = payload[len(MAGIC)] if len(payload) > len(MAGIC) else None
+        header = HEADERS.get(version)
+
+        if header is None:
+            raise ValueError(f"Version de trame non supportée : {version}")
+
+        if len(payload) < header.size:
+            raise ValueError("Trame binaire tronquée")
+
+        _, version, encoding, timestamp, sequence, camera_id, *settings = header.unpack_from(payload)
+        quality, width, height = (value or None for value in settings) if settings else (None, None, None)
+
+        return Frame(
+            frame_id(camera_id, sequence), timestamp, sequence, camera_id,
+            encoding, memoryview(payload)[header.size:], version, quality, width, height
+        )
+
+    if payload[:1] == b"{":
+        message = json.loads(payload)
+        image_id = message["timestamp"]
+
+        return Frame(
+            image_id, datetime.fromisoformat(image_id).timestamp(), 0, 0,
+            ENCODING_JPEG, base64.b64decode(message["image"]), 0
+        )
+
+    raise ValueError("Format de trame inconnu")
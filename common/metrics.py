@@ -0,0 +1,230 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Sequence
+
+# Bornes (en ms) des histogrammes de latence
+LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    """
+    Formate les labels d'une série au format texte de Prometheus.
+
+    :param labels : Labels de la série.
+
+    :return: Les labels entre accolades, ou une chaîne vide.
+    """
+
+    if not labels:
+        return ""
+
+    values = []
+
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        values.append(f'{name}="{value}"')
+
+    return "{" + ",".join(values) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Compteur croissant, incrémenté par `inc` ou lu au moment de l'export avec `function`.
+    """
+
+    kind = "counter"
+
+    def __init__(self, labels: Dict[str, str], function: Optional[Callable[[], float]] = None):
+        self.labels = labels
+        self.value = 0
+        self.function = function
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self.lock:
+            self.value += amount
+
+    def samples(self, name: str):
+        yield name + "_total", self.labels, self.function() if self.function is not None else self.value
+
+
+class Gauge:
+    """
+    Valeur instantanée, fixée par `set` ou lue au moment de l'export avec `function`.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, labels: Dict[str, str], function: Optional[Callable[[], float]] = None):
+        self.labels = labels
+        self.value = 0
+        self.function = function
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def samples(self, name: str):
+        yield name, self.labels, self.function() if self.function is not None else self.value
+
+
+class Histogram:
+    """
+    Histogramme à bornes fixes (compteurs par intervalle, somme et nombre d'observations).
+    """
+
+    kind = "histogram"
+
+    def __init__(self, labels: Dict[str, str], buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> "Timer":
+        """
+        :return: Un gestionnaire de contexte qui observe la durée (en ms) de son bloc.
+        """
+
+        return Timer(self)
+
+    def samples(self, name: str):
+        with self.lock:
+            counts = list(self.counts)
+            total = self.sum
+
+        cumulative = 0
+
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            yield name + "_bucket", {**self.labels, "le": format_value(bound)}, cumulative
+
+        yield name + "_sum", self.labels, total
+        yield name + "_count", self.labels, cumulative
+
+
+class Timer:
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.histogram.observe((time.perf_counter() - self.start) * 1000)
+
+
+class MetricsRegistry:
+    """
+    Registre de métriques (compteurs, jauges, histogrammes) exporté au format texte de Prometheus.
+
+    Une métrique est identifiée par son nom et ses labels : demander deux fois la même renvoie le même objet,
+    ce qui permet de la récupérer une fois à l'initialisation puis de la mettre à jour sans recherche.
+    """
+
+    def __init__(self, prefix: str = ""):
+        """
+        :param prefix : Préfixe ajouté au nom de chaque métrique.
+        """
+
+        self.prefix = prefix
+        self.families = {}  # nom -> (type, aide, {labels: métrique})
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, labels: Optional[Dict[str, str]], **kwargs):
+        name = self.prefix + name
+        key = tuple(sorted((labels or {}).items()))
+
+        with self.lock:
+            kind, _, metrics = self.families.setdefault(name, (cls.kind, help, {}))
+
+            if kind != cls.kind:
+                raise ValueError(f"La métrique {name} est déjà de type {kind}")
+
+            if key not in metrics:
+                metrics[key] = cls(dict(key), **kwargs)
+
+            return metrics[key]
+
+    def counter(self, name: str, help: str = "", labels: Optional[Dict[str, str]] = None, function: Optional[Callable[[], float]] = None) -> Counter:
+        return self._get(Counter, name, help, labels, function=function)
+
+    def gauge(self, name: str, help: str = "", labels: Optional[Dict[str, str]] = None, function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._get(Gauge, name, help, labels, function=function)
+
+    def histogram(self, name: str, help: str = "", labels: Optional[Dict[str, str]] = None, buckets: Sequence[float] = LATENCY_BUCKETS_MS) -> Histogram:
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self) -> str:
+        """
+        :return: Toutes les métriques au format texte de Prometheus.
+        """
+
+        with self.lock:
+            families = [(name, kind, help, list(metrics.values())) for name, (kind, help, metrics) in self.families.items()]
+
+        lines = []
+
+        for name, kind, help, metrics in families:
+            if help:
+                lines.append(f"# HELP {name} {help}")
+
+            lines.append(f"# TYPE {name} {kind}")
+
+            for metric in metrics:
+                for sample_name, labels, value in metric.samples(name):
+                    lines.append(f"{sample_name}{format_labels(labels)} {format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(registry: MetricsRegistry, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Sert `GET /metrics` dans un thread en arrière-plan (pour les programmes sans boucle asyncio).
+
+    :param registry : Le registre exporté.
+    :param port : Port HTTP.
+    :param host : Adresse d'écoute.
+
+    :return: Le serveur HTTP (`shutdown()` pour l'arrêter).
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+
+    return server
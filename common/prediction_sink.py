@@ -0,0 +1,127 @@
+import json
+import os
+import time
+from typing import Iterable
+
+
+def to_json(value):
+    """Scalaires numpy (np.float32, np.int64...) convertis en nombres Python."""
+    if hasattr(value, "item"):
+        return value.item()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def jsonl_to_coco(jsonl_path: str, output_path: str) -> int:
+    """
+    Écrit les prédictions d'un fichier JSON Lines dans un tableau JSON au format des résultats COCO
+    (lu par benchmarking/utils.py et COCO.loadRes), une prédiction par ligne.
+
+    Le fichier est lu ligne par ligne et remplacé atomiquement : la mémoire ne dépend pas du nombre
+    de prédictions, et un fichier interrompu n'est jamais lu à moitié écrit.
+
+    :param jsonl_path : Fichier JSON Lines, une prédiction par ligne.
+    :param output_path : Fichier JSON des résultats COCO.
+
+    :return: Le nombre de prédictions.
+    """
+
+    temporary_path = f"{output_path}.tmp"
+    count = 0
+
+    with open(jsonl_path, "r") as source, open(temporary_path, "w") as output:
+        output.write("[")
+
+        for line in source:
+            line = line.strip()
+
+            if not line:
+                continue
+
+            output.write(",\n" if count else "\n")
+            output.write(line)
+            count += 1
+
+        output.write("\n]\n")
+
+    os.replace(temporary_path, output_path)
+
+    return count
+
+
+class PredictionSink:
+    """
+    Écriture des prédictions au fil de l'inférence : ajouts JSON Lines bufferisés dans `<path>.jsonl`,
+    puis, à la fermeture, tableau JSON des résultats COCO dans `path`.
+
+    Chaque prédiction n'est écrite qu'une fois (coût linéaire en nombre de prédictions), et les
+    prédictions déjà écrites restent dans le fichier JSON Lines si le programme s'arrête avant la fin
+    (`jsonl_to_coco` produit alors le tableau). À utiliser depuis un seul thread.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, buffer_size: int = 1000, keep_jsonl: bool = False):
+        """
+        :param path : Fichier JSON des résultats COCO écrit à la fermeture.
+        :param flush_interval : Durée maximale (en s) pendant laquelle une prédiction reste en mémoire.
+        :param buffer_size : Nombre de prédictions en mémoire au-delà duquel elles sont écrites.
+        :param keep_jsonl : Garde le fichier JSON Lines après la fermeture.
+        """
+
+        self.path = str(path)
+        self.jsonl_path = f"{self.path}.jsonl"
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.keep_jsonl = keep_jsonl
+        self.buffer = []
+        self.count = 0
+        self.last_flush = time.monotonic()
+        self.file = open(self.jsonl_path, "w")
+
+    def add(self, prediction: dict) -> None:
+        """
+        :param prediction : Prédiction au format COCO (image_id, category_id, bbox, score...).
+        """
+
+        self.buffer.append(json.dumps(prediction, default=to_json))
+        self.count += 1
+
+        if len(self.buffer) >= self.buffer_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def extend(self, predictions: Iterable[dict]) -> None:
+        for prediction in predictions:
+            self.add(prediction)
+
+    def flush(self) -> None:
+        """Écrit les prédictions en mémoire à la fin du fichier JSON Lines."""
+        if self.buffer:
+            self.file.write("\n".join(self.buffer) + "\n")
+            self.buffer.clear()
+
+        self.file.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self) -> int:
+        """
+        Écrit les dernières prédictions puis le tableau JSON des résultats COCO.
+
+        :return: Le nombre de prédictions.
+        """
+
+        if self.file.closed:
+            return self.count
+
+        self.flush()
+        self.file.close()
+        jsonl_to_coco(self.jsonl_path, self.path)
+
+        if not self.keep_jsonl:
+            os.remove(self.jsonl_path)
+
+        return self.count
+
+    def __enter__(self) -> "PredictionSink":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
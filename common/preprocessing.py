@@ -0,0 +1,99 @@
+import io
+import math
+from typing import NamedTuple, Optional, Tuple
+import numpy as np
+from PIL import Image
+
+PADDING_COLOR = (114, 114, 114)
+
+
+class LetterboxMeta(NamedTuple):
+    scale: float
+    pad_x: int
+    pad_y: int
+    width: int
+    height: int
+
+
+def decode_jpeg(data, target_size: Optional[int] = None) -> Tuple[Image.Image, float]:
+    """
+    Décode une image RGB.
+
+    Si l'image est plus grande que l'entrée du modèle, le JPEG est décodé directement à une taille
+    réduite (1/2, 1/4 ou 1/8 dans le domaine DCT) au moins aussi grande que nécessaire.
+
+    Le décodage alloue une nouvelle image à chaque appel : ni PIL ni OpenCV ne décodent un JPEG dans
+    un tableau fourni par l'appelant. `letterbox_into` la copie ensuite dans le tampon réutilisé de
+    l'entrée du modèle. La réduction dans le domaine DCT limite la taille de cette allocation.
+
+    :param data : Octets de l'image (bytes ou memoryview).
+    :param target_size : Taille de l'entrée du modèle.
+
+    :return: L'image et son échelle par rapport à l'image d'origine (1 si pas de réduction).
+    """
+
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size
+
+    if target_size is not None:
+        scale = min(target_size / width, target_size / height)
+
+        if scale < 1:
+            image.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    image.load()
+
+    return image, image.size[0] / width
+
+
+def letterbox_into(image: Image.Image, out: np.ndarray, padding_color: tuple = PADDING_COLOR, resample: int = Image.BILINEAR) -> LetterboxMeta:
+    """
+    Redimensionne l'image en conservant ses proportions et l'écrit, centrée et complétée avec
+    `padding_color`, dans un tableau existant (réutilisable d'une image à l'autre).
+
+    :param image : Image RGB.
+    :param out : Tableau (H, W, 3) uint8 de l'entrée du modèle, modifié en place.
+    :param padding_color : Couleur des bandes ajoutées.
+    :param resample : Filtre de redimensionnement.
+
+    :return: L'échelle et les décalages pour revenir au repère de l'image.
+    """
+
+    out_height, out_width = out.shape[:2]
+    width, height = image.size
+    scale = min(out_width / width, out_height / height)
+    new_width, new_height = round(width * scale), round(height * scale)
+    pad_x = round((out_width - new_width) / 2 - 0.1)
+    pad_y = round((out_height - new_height) / 2 - 0.1)
+
+    if (new_width, new_height) != (width, height):
+        image = image.resize((new_width, new_height), resample)
+
+    out[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = np.asarray(image)
+
+    # Seules les bandes sont remplies, le reste du tableau vient d'être écrit
+    out[:pad_y] = padding_color
+    out[pad_y + new_height:] = padding_color
+    out[pad_y:pad_y + new_height, :pad_x] = padding_color
+    out[pad_y:pad_y + new_height, pad_x + new_width:] = padding_color
+
+    return LetterboxMeta(scale, pad_x, pad_y, width, height)
+
+
+def unletterbox_boxes(boxes: np.ndarray, meta: LetterboxMeta) -> np.ndarray:
+    """
+    Ramène des boîtes [x1, y1, x2, y2] de l'entrée du modèle au repère de l'image (en place).
+
+    :param boxes : Boîtes (N, 4).
+    :param meta : Informations renvoyées par `letterbox_into`.
+
+    :return: Les boîtes.
+    """
+
+    boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - meta.pad_x) / meta.scale).clip(0, meta.width)
+    boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - meta.pad_y) / meta.scale).clip(0, meta.height)
+
+    return boxes
@@ -0,0 +1,123 @@
+import json
+from typing import Iterator, List, Optional, Union
+
+# "frame" : un message par image avec toutes les détections, "box" : ancien format, un message par boîte
+RESULT_FORMAT_FRAME = "frame"
+RESULT_FORMAT_BOX = "box"
+
+
+def encode_result(image_id, classes: List[int], scores: List[float], boxes: List[List[float]], timings: Optional[dict] = None,
+                  track_ids: Optional[List[int]] = None, **extra) -> str:
+    """
+    Encode les détections d'une image dans un unique message.
+
+    Les détections sont stockées sous forme de tableaux : `classes[i]`, `scores[i]` et
+    `boxes[4 * i:4 * i + 4]` (x, y, largeur, hauteur) décrivent la i-ème détection.
+
+    :param image_id : Identifiant de l'image.
+    :param classes : Classes des détections.
+    :param scores : Scores des détections.
+    :param boxes : Boîtes des détections au format COCO [x, y, largeur, hauteur].
+    :param timings : Temps (en ms) de chaque étape du traitement.
+    :param track_ids : Identifiants de suivi des détections (mode suivi uniquement).
+    :param extra : Champs supplémentaires ajoutés au message.
+
+    :return: Le message JSON.
+    """
+
+    message = {
+        "image_id": image_id,
+        "classes": [int(cls) for cls in classes],
+        "scores": [round(float(score), 4) for score in scores],
+        "boxes": [round(float(coord), 2) for box in boxes for coord in box],
+        "timings": timings or {},
+        **extra
+    }
+
+    if track_ids is not None:
+        message["track_ids"] = [int(track_id) for track_id in track_ids]
+
+    return json.dumps(message, separators=(',', ':'))
+
+
+def encode_box_result(image_id, category_id: int, bbox: List[float], score: float, inference_time: float, **extra) -> str:
+    """
+    Encode une détection dans l'ancien format (un message par boîte).
+
+    :param image_id : Identifiant de l'image.
+    :param category_id : Classe de la détection.
+    :param bbox : Boîte au format COCO [x, y, largeur, hauteur].
+    :param score : Score de la détection.
+    :param inference_time : Temps d'inférence (en ms).
+    :param extra : Champs supplémentaires ajoutés au message.
+
+    :return: Le message JSON.
+    """
+
+    prediction = {
+        "image_id": image_id,
+        "category_id": int(category_id),
+        "bbox": bbox,
+        "score": score,
+        "inference_time": inference_time,
+        **extra
+    }
+
+    return json.dumps(prediction)
+
+
+def decode_result(payload: Union[bytes, str]) -> dict:
+    """
+    Décode un message de résultats, quel que soit son format.
+
+    Un message de l'ancien format (une boîte) est converti au format par image.
+
+    :param payload : Contenu du message MQTT.
+
+    :return: Le résultat au format par image.
+    """
+
+    message = json.loads(payload)
+
+    if "classes" in message:
+        return message
+
+    result = {
+        "image_id": message["image_id"],
+        "classes": [message["category_id"]],
+        "scores": [message["score"]],
+        "boxes": list(message["bbox"]),
+        "timings": {"inference": message.get("inference_time")},
+        **{key: value for key, value in message.items() if key not in ("image_id", "category_id", "bbox", "score", "inference_time", "track_id")}
+    }
+
+    if "track_id" in message:
+        result["track_ids"] = [message["track_id"]]
+
+    return result
+
+
+def iter_detections(result: dict) -> Iterator[dict]:
+    """
+    Parcourt les détections d'un résultat au format par image.
+
+    :param result : Résultat décodé par `decode_result`.
+
+    :return: Un itérateur de détections au format des prédictions COCO.
+    """
+
+    boxes = result["boxes"]
+    track_ids = result.get("track_ids")
+
+    for i, (cls, score) in enumerate(zip(result["classes"], result["scores"])):
+        detection = {
+            "image_id": result["image_id"],
+            "category_id": cls,
+            "bbox": boxes[4 * i:4 * i + 4],
+            "score": score
+        }
+
+        if track_ids is not None:
+            detection["track_id"] = track_ids[i]
+
+        yield detection
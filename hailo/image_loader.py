@@ -0,0 +1,109 @@
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Generator, List, Tuple
+from loguru import logger
+from PIL import Image
+
+IMAGE_EXTENSIONS: Tuple[str, ...] = (".jpg", ".png", ".bmp", ".jpeg")
+
+
+def list_input_images(images_path: str) -> List[Tuple[int, Path]]:
+    """
+    List the images to process without opening them.
+
+    A single image gets the id 0. A directory is described by the COCO `result.json`
+    next to it, whose "images" entries give the file names and ids.
+
+    Args:
+        images_path (str): Path to the input image or directory of images.
+
+    Returns:
+        List[Tuple[int, Path]]: (image id, image path) pairs, empty if the path is not an image or a directory.
+    """
+
+    path = Path(images_path)
+
+    if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS:
+        return [(0, path)]
+
+    if path.is_dir():
+        with open(path.parent / "result.json", 'r') as f:
+            images = json.load(f)["images"]
+
+        return [(image["id"], path.parent / image["file_name"]) for image in images]
+
+    return []
+
+
+def decode_image(path: Path) -> Image.Image:
+    """
+    Open and fully decode an image, closing its file.
+
+    Args:
+        path (Path): Path to the image.
+
+    Returns:
+        Image.Image: The decoded image.
+    """
+
+    with Image.open(path) as image:
+        image.load()
+
+    return image
+
+
+def load_input_images(
+    entries: List[Tuple[int, Path]], workers: int = 4, prefetch: int = 8
+) -> Generator[Tuple[int, Image.Image], None, None]:
+    """
+    Decode images on a thread pool while they are consumed, in the order of `entries`.
+
+    At most `prefetch` images are read ahead of the consumer, so memory and the time to
+    the first image do not depend on the number of images. An image that cannot be read or
+    decoded is logged and skipped.
+
+    Args:
+        entries (List[Tuple[int, Path]]): (image id, image path) pairs, from list_input_images.
+        workers (int): Number of decoding threads.
+        prefetch (int): Maximum number of images decoded or being decoded ahead of the consumer.
+
+    Returns:
+        Generator[Tuple[int, Image.Image], None, None]: Generator yielding (image id, image) pairs.
+    """
+
+    entries = iter(entries)
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image_loader") as executor:
+        def submit() -> bool:
+            entry = next(entries, None)
+
+            if entry is None:
+                return False
+
+            image_id, path = entry
+            pending.append((image_id, executor.submit(decode_image, path)))
+
+            return True
+
+        while len(pending) < max(1, prefetch) and submit():
+            pass
+
+        try:
+            while pending:
+                image_id, future = pending.popleft()
+                submit()
+
+                try:
+                    image = future.result()
+                except Exception as e:
+                    logger.error(f"Skipping image {image_id}: {e}")
+                    continue
+
+                yield image_id, image
+        finally:
+            # Consumer stopped early: drop the images read ahead
+            for _, future in pending:
+                future.cancel()
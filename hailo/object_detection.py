@@ -2,20 +2,22 @@
 
 import argparse
 import os
-import json
 import sys
 from pathlib import Path
-import numpy as np
 from loguru import logger
 import queue
 import threading
+import time
 from PIL import Image
-from typing import List
+from typing import Iterable, List, Tuple
 from object_detection_utils import ObjectDetectionUtils
 
 # Add the parent directory to the system path to access utils module
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from utils import HailoAsyncInference, load_input_images, validate_images, divide_list_to_batches
+from utils import HailoAsyncInference, validate_images, divide_list_to_batches
+from image_loader import list_input_images, load_input_images
+from common.metrics import MetricsRegistry, serve_metrics
+from common.prediction_sink import PredictionSink
 
 
 def parse_args() -> argparse.Namespace:
@@ -49,6 +51,24 @@ def parse_args() -> argparse.Namespace:
         default="coco.txt",
         help="Path to a text file containing labels. If no labels file is provided, coco2017 will be used."
     )
+    parser.add_argument(
+        "-m", "--metrics-port",
+        default=8082,
+        type=int,
+        help="Port of the Prometheus metrics endpoint (GET /metrics), 0 to disable."
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        default=4,
+        type=int,
+        help="Number of threads decoding the input images."
+    )
+    parser.add_argument(
+        "-p", "--prefetch",
+        default=8,
+        type=int,
+        help="Maximum number of input images decoded ahead of the preprocessing."
+    )
 
     args = parser.parse_args()
 
@@ -64,36 +84,46 @@ def parse_args() -> argparse.Namespace:
 
 
 def enqueue_images(
-    images: List[Image.Image],
+    images: Iterable[Tuple[int, Image.Image]],
     batch_size: int,
     input_queue: queue.Queue,
     width: int,
     height: int,
-    utils: ObjectDetectionUtils
+    utils: ObjectDetectionUtils,
+    images_id: List[int],
+    metrics: MetricsRegistry
 ) -> None:
     """
     Preprocess and enqueue images into the input queue as they are ready.
+    Blocks while the input queue is full, so images are only loaded as fast as the device consumes them.
 
     Args:
-        images (List[Image.Image]): List of PIL.Image.Image objects.
+        images (Iterable[Tuple[int, Image.Image]]): (image id, PIL.Image.Image) pairs, loaded lazily.
+        batch_size (int): Number of images per batch.
         input_queue (queue.Queue): Queue for input images.
         width (int): Model input width.
         height (int): Model input height.
         utils (ObjectDetectionUtils): Utility class for object detection preprocessing.
+        images_id (List[int]): Filled with the id of each enqueued image, in order.
+        metrics (MetricsRegistry): Registry receiving the preprocessing time.
     """
 
-    for batch in divide_list_to_batches(images, batch_size):
-        processed_batch = []
-        batch_array = []
+    preprocess_time = metrics.histogram("stage_duration_ms", "Duration of each stage per frame (ms)", {"stage": "preprocess"})
 
-        for image in batch:
-            processed_image = utils.preprocess(image, width, height)
-            processed_batch.append(processed_image)
-            batch_array.append(np.array(processed_image))
+    try:
+        for batch in divide_list_to_batches(images, batch_size):
+            processed_batch = []
+
+            for image_id, image in batch:
+                # Each frame gets its own array: it stays in flight on the device until its output is processed
+                with preprocess_time.time():
+                    processed_batch.append(utils.preprocess(image, width, height))
 
-        input_queue.put(processed_batch)
+                images_id.append(image_id)
 
-    input_queue.put(None)  # Add sentinel value to signal end of input
+            input_queue.put(processed_batch)
+    finally:
+        input_queue.put(None)  # Add sentinel value to signal end of input, even after an error
 
 
 def process_output(
@@ -102,10 +132,12 @@ def process_output(
     width: int,
     height: int,
     utils: ObjectDetectionUtils,
-    images_id: List[int]
+    images_id: List[int],
+    metrics: MetricsRegistry
 ) -> None:
     """
     Process and visualize the output results.
+    Predictions are appended to a JSON Lines file as they come, then written to predictions.json at the end.
 
     Args:
         output_queue (queue.Queue): Queue for output results.
@@ -113,9 +145,17 @@ def process_output(
         width (int): Image width.
         height (int): Image height.
         utils (ObjectDetectionUtils): Utility class for object detection visualization.
-        images_id (List[int]): List of images id.
+        images_id (List[int]): Ids of the enqueued images, in order.
+        metrics (MetricsRegistry): Registry receiving the postprocessing, visualization and write times.
     """
 
+    stage_time = {
+        stage: metrics.histogram("stage_duration_ms", "Duration of each stage per frame (ms)", {"stage": stage})
+        for stage in ("postprocess", "visualize", "write")
+    }
+    processed = metrics.counter("frames_processed", "Frames whose results were written")
+    sink = PredictionSink(output_path.parent / "predictions.json")
+
     image_id = 0
 
     while True:
@@ -125,17 +165,20 @@ def process_output(
             break  # Exit the loop if sentinel value is received
 
         processed_image, infer_results = result
-        detections = utils.extract_detections(infer_results)
+        start = time.perf_counter()
 
         # Deals with the expanded results from hailort versions < 4.19.0
         if len(infer_results) == 1:
             infer_results = infer_results[0]
 
         detections = utils.extract_detections(infer_results)
+        postprocessed = time.perf_counter()
+
         utils.visualize(
-            detections, processed_image, images_id[image_id],
+            detections, Image.fromarray(processed_image), images_id[image_id],
             output_path, width, height
         )
+        visualized = time.perf_counter()
 
         predictions = []
 
@@ -151,58 +194,70 @@ def process_output(
                 # "infer_time": float(detections["infer_time"])
             })
 
-        output_file = output_path.parent / f"predictions.json"
-        
-        if output_file.exists():
-            with open(output_file, 'r') as f:
-                existing_predictions = json.load(f)
-            predictions = existing_predictions + predictions
-        with open(output_file, 'w') as f:
-            json.dump(predictions, f, indent=4)
+        sink.extend(predictions)
+
+        stage_time["postprocess"].observe((postprocessed - start) * 1000)
+        stage_time["visualize"].observe((visualized - postprocessed) * 1000)
+        stage_time["write"].observe((time.perf_counter() - visualized) * 1000)
+        processed.inc()
 
         image_id += 1
 
+    sink.close()
     output_queue.task_done()
 
 
 
 def infer(
-    images: List[Image.Image],
-    images_id: List[int],
+    entries: List[Tuple[int, Path]],
     net_path: str,
     labels_path: str,
     batch_size: int,
-    output_path: Path
+    output_path: Path,
+    metrics_port: int = 0,
+    workers: int = 4,
+    prefetch: int = 8
 ) -> None:
     """
     Initialize queues, HailoAsyncInference instance, and run the inference.
 
     Args:
-        images (List[Image.Image]): List of images to process.
-        images_id (List[int]): List of images id.
+        entries (List[Tuple[int, Path]]): (image id, image path) pairs to process.
         net_path (str): Path to the HEF model file.
         labels_path (str): Path to a text file containing labels.
         batch_size (int): Number of images per batch.
         output_path (Path): Path to save the output images.
+        metrics_port (int): Port of the Prometheus metrics endpoint, 0 to disable.
+        workers (int): Number of threads decoding the input images.
+        prefetch (int): Maximum number of input images decoded ahead of the preprocessing.
     """
 
     utils = ObjectDetectionUtils(labels_path)
+    images = load_input_images(entries, workers, prefetch)
+    images_id = []  # Filled by enqueue_images: images that failed to load are left out
 
-    input_queue = queue.Queue()
+    # Bounded: preprocessed batches wait for the device instead of piling up in memory
+    input_queue = queue.Queue(maxsize=2)
     output_queue = queue.Queue()
 
+    # Queue depths are read when the metrics are scraped, at no cost per frame
+    metrics = MetricsRegistry("hailo_")
+    metrics.gauge("input_queue_depth", "Batches waiting for the device", function=input_queue.qsize)
+    metrics.gauge("output_queue_depth", "Frames waiting for postprocessing", function=output_queue.qsize)
+    metrics_server = serve_metrics(metrics, metrics_port) if metrics_port else None
+
     hailo_inference = HailoAsyncInference(
-        net_path, input_queue, output_queue, batch_size
+        net_path, input_queue, output_queue, batch_size, metrics=metrics
     )
     height, width, _ = hailo_inference.get_input_shape()
 
     enqueue_thread = threading.Thread(
         target=enqueue_images, 
-        args=(images, batch_size, input_queue, width, height, utils)
+        args=(images, batch_size, input_queue, width, height, utils, images_id, metrics)
     )
     process_thread = threading.Thread(
         target=process_output, 
-        args=(output_queue, output_path, width, height, utils, images_id)
+        args=(output_queue, output_path, width, height, utils, images_id, metrics)
     )
 
     enqueue_thread.start()
@@ -214,6 +269,9 @@ def infer(
     output_queue.put(None)  # Signal process thread to exit
     process_thread.join()
 
+    if metrics_server is not None:
+        metrics_server.shutdown()
+
     logger.info(
         f"Inference was successful! Results have been saved in {output_path}"
     )
@@ -227,12 +285,12 @@ def main() -> None:
     # Parse command line arguments
     args = parse_args()
 
-    # Load input images
-    images, images_id = load_input_images(args.input)
+    # List input images, they are loaded while the inference runs
+    entries = list_input_images(args.input)
 
     # Validate images
     try:
-        validate_images(images, args.batch_size)
+        validate_images(entries, args.batch_size)
     except ValueError as e:
         logger.error(e)
         return
@@ -242,7 +300,10 @@ def main() -> None:
     output_path.mkdir(exist_ok=True)
 
     # Start the inference
-    infer(images, images_id, args.net, args.labels, args.batch_size, output_path)
+    infer(
+        entries, args.net, args.labels, args.batch_size, output_path,
+        args.metrics_port, args.workers, args.prefetch
+    )
 
 
 if __name__ == "__main__":
@@ -1,6 +1,13 @@
+import os
+import sys
+from typing import Optional
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 
+# Add the parent directory to the system path to access the common module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.preprocessing import letterbox_into
+
 
 def generate_color(class_id: int) -> tuple:
     """
@@ -49,28 +56,27 @@ class ObjectDetectionUtils:
 
         return class_names
 
-    def preprocess(self, image: Image.Image, model_w: int, model_h: int) -> Image.Image:
+    def preprocess(self, image: Image.Image, model_w: int, model_h: int, out: Optional[np.ndarray] = None) -> np.ndarray:
         """
-        Resize image with unchanged aspect ratio using padding.
+        Resize image with unchanged aspect ratio using padding, directly into the model input array.
 
         Args:
             image (PIL.Image.Image): Input image.
             model_w (int): Model input width.
             model_h (int): Model input height.
+            out (Optional[np.ndarray]): (model_h, model_w, 3) uint8 array to write into.
+                                        A new one is allocated if None.
 
         Returns:
-            PIL.Image.Image: Preprocessed and padded image.
+            np.ndarray: Preprocessed and padded image.
         """
 
-        img_w, img_h = image.size
-        scale = min(model_w / img_w, model_h / img_h)
-        new_img_w, new_img_h = int(img_w * scale), int(img_h * scale)
-        image = image.resize((new_img_w, new_img_h), Image.Resampling.BICUBIC)
+        if out is None:
+            out = np.empty((model_h, model_w, 3), dtype=np.uint8)
 
-        padded_image = Image.new("RGB", (model_w, model_h), self.padding_color)
-        padded_image.paste(image, ((model_w - new_img_w) // 2, (model_h - new_img_h) // 2))
-        
-        return padded_image
+        letterbox_into(image.convert("RGB"), out, self.padding_color, Image.Resampling.BICUBIC)
+
+        return out
 
     def draw_detection(self, draw: ImageDraw.Draw, box: list, cls: int, score: float, color: tuple, scale_factor: float):
         """
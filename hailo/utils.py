@@ -1,15 +1,12 @@
-from typing import List, Generator, Optional, Tuple, Dict
-from pathlib import Path
+from typing import Generator, Iterable, Optional, Tuple, Dict
 from functools import partial
+from itertools import islice
 import queue
+import time
 from loguru import logger
 import numpy as np
-from PIL import Image
 from hailo_platform import (HEF, VDevice,
                             FormatType, HailoSchedulingAlgorithm)
-import json
-
-IMAGE_EXTENSIONS: Tuple[str, ...] = (".jpg", ".png", ".bmp", ".jpeg")
 
 
 class HailoAsyncInference:
@@ -17,7 +14,7 @@ class HailoAsyncInference:
         self, hef_path: str, input_queue: queue.Queue,
         output_queue: queue.Queue, batch_size: int = 1,
         input_type: Optional[str] = None, output_type: Optional[Dict[str, str]] = None,
-        send_original_frame: bool = False) -> None:
+        send_original_frame: bool = False, metrics=None) -> None:
         """
         Initialize the HailoAsyncInference class with the provided HEF model 
         file path and input/output queues.
@@ -32,6 +29,7 @@ class HailoAsyncInference:
                                         Possible values: 'UINT8', 'UINT16'.
             output_type Optional[dict[str, str]] : Format type of the output stream. 
                                          Possible values: 'UINT8', 'UINT16', 'FLOAT32'.
+            metrics (Optional[MetricsRegistry]): Registry receiving the device inference time per frame.
         """
 
         self.input_queue = input_queue
@@ -52,6 +50,12 @@ class HailoAsyncInference:
 
         self.output_type = output_type
         self.send_original_frame = send_original_frame
+        self.inference_time = None
+
+        if metrics is not None:
+            self.inference_time = metrics.histogram(
+                "stage_duration_ms", "Duration of each stage per frame (ms)", {"stage": "inference"}
+            )
 
     def _set_input_type(self, input_type: Optional[str] = None) -> None:
         """
@@ -79,7 +83,7 @@ class HailoAsyncInference:
             )
 
     def callback(
-        self, completion_info, bindings_list: list, input_batch: list,
+        self, completion_info, bindings_list: list, input_batch: list, started: Optional[float] = None
     ) -> None:
         """
         Callback function for handling inference results.
@@ -90,11 +94,19 @@ class HailoAsyncInference:
             bindings_list (list): List of binding objects containing input 
                                   and output buffers.
             processed_batch (list): The processed batch of images.
+            started (Optional[float]): perf_counter() value when the batch was submitted.
         """
 
         if completion_info.exception:
             logger.error(f'Inference error: {completion_info.exception}')
         else:
+            if self.inference_time is not None and started is not None:
+                # Batch latency on the device, reported per frame like the other stages
+                elapsed = (time.perf_counter() - started) * 1000 / max(1, len(bindings_list))
+
+                for _ in bindings_list:
+                    self.inference_time.observe(elapsed)
+
             for i, bindings in enumerate(bindings_list):
                 # If the model has a single output, return the output buffer. 
                 # Else, return a dictionary of output buffers, where the keys are the output names.
@@ -160,7 +172,7 @@ class HailoAsyncInference:
 
                 for frame in preprocessed_batch:
                     bindings = self._create_bindings(configured_infer_model)
-                    bindings.input().set_buffer(np.array(frame))
+                    bindings.input().set_buffer(np.asarray(frame))
                     bindings_list.append(bindings)
 
                 configured_infer_model.wait_for_async_ready(timeout_ms=10000)
@@ -168,7 +180,8 @@ class HailoAsyncInference:
                     bindings_list, partial(
                         self.callback,
                         input_batch=original_batch if self.send_original_frame else preprocessed_batch,
-                        bindings_list=bindings_list
+                        bindings_list=bindings_list,
+                        started=time.perf_counter()
                     )
                 )
 
@@ -215,42 +228,12 @@ class HailoAsyncInference:
         )
 
 
-def load_input_images(images_path: str) -> List[Image.Image]:
-    """
-    Load images from the specified path.
-
-    Args:
-        images_path (str): Path to the input image or directory of images.
-
-    Returns:
-        List[Image.Image]: List of PIL.Image.Image objects.
-    """
-
-    path = Path(images_path)
-
-    if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS:
-        return [Image.open(path)], [0]
-    
-    if path.is_dir():
-        with open(f"{path.parent}/result.json", 'r') as f:
-            coco_data = json.load(f)
-
-        images = coco_data["images"]
-
-        images_path = [f"{path.parent}/{image['file_name']}" for image in images]
-        images_id = [image["id"] for image in images]
-
-        return [Image.open(image) for image in images_path], images_id
-    
-    return []
-
-
-def validate_images(images: List[Image.Image], batch_size: int) -> None:
+def validate_images(images: list, batch_size: int) -> None:
     """
     Validate that images exist and are properly divisible by the batch size.
 
     Args:
-        images (List[Image.Image]): List of images.
+        images (list): List of images, or of (image id, image path) entries.
         batch_size (int): Number of images per batch.
 
     Raises:
@@ -270,19 +253,20 @@ def validate_images(images: List[Image.Image], batch_size: int) -> None:
 
 
 def divide_list_to_batches(
-    images_list: List[Image.Image], batch_size: int
-) -> Generator[List[Image.Image], None, None]:
+    images_list: Iterable, batch_size: int
+) -> Generator[list, None, None]:
     """
-    Divide the list of images into batches.
+    Divide the images into batches, consuming them lazily.
 
     Args:
-        images_list (List[Image.Image]): List of images.
+        images_list (Iterable): List or generator of images.
         batch_size (int): Number of images in each batch.
 
     Returns:
-        Generator[List[Image.Image], None, None]: Generator yielding batches 
-                                                  of images.
+        Generator[list, None, None]: Generator yielding batches of images.
     """
 
-    for i in range(0, len(images_list), batch_size):
-        yield images_list[i: i + batch_size]
\ No newline at end of file
+    images = iter(images_list)
+
+    while batch := list(islice(images, batch_size)):
+        yield batch
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+
+class JoinedFrame(NamedTuple):
+    frame: object  # common.frame_protocol.Frame
+    result: Optional[dict]  # résultat décodé par common.result_protocol.decode_result, None si aucun résultat à temps
+    result_received_at: Optional[float]
+
+
+class FrameJoiner:
+    """
+    Association des images et des résultats d'inférence reçus sur MQTT, par identifiant d'image.
+
+    Seule l'image associée la plus récente est gardée pour l'affichage : une image plus ancienne que la
+    dernière affichée, ou remplacée avant d'être affichée, est ignorée (et comptée). Une image sans résultat
+    après `result_timeout` secondes est affichée sans détection.
+    """
+
+    def __init__(self, result_timeout: float = 1.0, capacity: int = 64):
+        """
+        :param result_timeout : Attente maximale (en s) du résultat d'une image.
+        :param capacity : Nombre maximal d'images (et de résultats) en attente d'association.
+        """
+
+        self.result_timeout = result_timeout
+        self.capacity = capacity
+        self.frames = OrderedDict()  # image_id -> (image, instant de réception)
+        self.results = OrderedDict()  # image_id -> (résultat, instant de réception)
+        self.ready = None  # JoinedFrame à afficher
+        self.last_taken = float("-inf")  # instant de capture de la dernière image affichée
+        self.counts = {"frames": 0, "results": 0, "joined": 0, "no_result": 0, "skipped": 0, "evicted": 0}
+        self.condition = threading.Condition()
+
+    def add_frame(self, frame, received_at: float = None) -> None:
+        received_at = time.time() if received_at is None else received_at
+
+        with self.condition:
+            self.counts["frames"] += 1
+
+            if frame.image_id in self.results:
+                self._join(frame, *self.results.pop(frame.image_id))
+                return
+
+            self.frames[frame.image_id] = (frame, received_at)
+            self._bound(self.frames)
+
+            if self.result_timeout <= 0:
+                self._expire(received_at)
+
+    def add_result(self, result: dict, received_at: float = None) -> None:
+        received_at = time.time() if received_at is None else received_at
+
+        with self.condition:
+            self.counts["results"] += 1
+            entry = self.frames.pop(result["image_id"], None)
+
+            if entry is None:
+                # Résultat arrivé avant son image (ou image déjà affichée sans résultat)
+                self.results[result["image_id"]] = (result, received_at)
+                self._bound(self.results)
+                return
+
+            self._join(entry[0], result, received_at)
+
+    def _bound(self, entries: OrderedDict) -> None:
+        while len(entries) > self.capacity:
+            entries.popitem(last=False)
+            self.counts["evicted"] += 1
+
+    def _offer(self, joined: JoinedFrame) -> None:
+        if joined.frame.timestamp <= self.last_taken:
+            # Plus ancienne que l'image déjà affichée
+            self.counts["skipped"] += 1
+            return
+
+        if self.ready is not None:
+            if self.ready.frame.timestamp > joined.frame.timestamp:
+                self.counts["skipped"] += 1
+                return
+
+            # Remplacée avant d'être affichée
+            self.counts["skipped"] += 1
+
+        self.ready = joined
+        self.condition.notify()
+
+    def _join(self, frame, result: dict, received_at: float) -> None:
+        self.counts["joined"] += 1
+        self._offer(JoinedFrame(frame, result, received_at))
+
+    def _expire(self, now: float) -> None:
+        # Les images sont dans l'ordre de réception : seules les premières peuvent avoir expiré
+        while self.frames:
+            frame, received_at = next(iter(self.frames.values()))
+
+            if now - received_at < self.result_timeout:
+                break
+
+            self.frames.popitem(last=False)
+            self.counts["no_result"] += 1
+            self._offer(JoinedFrame(frame, None, None))
+
+    def take(self, timeout: float = None) -> Optional[JoinedFrame]:
+        """
+        Attend la prochaine image à afficher.
+
+        :param timeout : Attente maximale (en s).
+
+        :return: L'image la plus récente avec son résultat, ou None après `timeout`.
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self.condition:
+            while True:
+                self._expire(time.time())
+
+                if self.ready is not None:
+                    joined, self.ready = self.ready, None
+                    self.last_taken = joined.frame.timestamp
+
+                    return joined
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+
+                if remaining is not None and remaining <= 0:
+                    return None
+
+                # Réveil régulier pour afficher les images dont le résultat n'arrive pas
+                self.condition.wait(min(remaining or self.result_timeout, self.result_timeout) if self.result_timeout > 0 else remaining)
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {"pending_frames": len(self.frames), "pending_results": len(self.results), **self.counts}
@@ -1,54 +1,250 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
 import paho.mqtt.client as mqtt
-import base64
 import cv2
 import numpy as np
-import json
+
+# Ajout du dossier parent pour accéder au module common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.frame_protocol import decode_frame, encode_frame
+from common.result_protocol import decode_result, iter_detections
+from frame_joiner import FrameJoiner
 
 # Configuration MQTT
 BROKER_ADDRESS = "192.168.137.58"
 BROKER_PORT = 1883
 MQTT_TOPIC = "inference/images"
+MQTT_TOPIC_RESULTS = "inference/results"
+MQTT_TOPIC_ANNOTATED = "inference/annotated"  # Images annotées pour le relais (relay/relay.py)
+
+WINDOW_NAME = "Flux d'images MQTT"
+
+# Couleurs (BGR) des boîtes, par classe
+COLORS = [(0, 200, 255), (255, 120, 0), (0, 220, 0), (220, 0, 220), (0, 0, 255), (255, 255, 0)]
+
+
+def load_labels(path):
+    """
+    Charge les noms des classes : annotations COCO (catégories) ou fichier texte (un nom par ligne).
+
+    :param path : Chemin du fichier, ou None.
+
+    :return: Les noms des classes par identifiant.
+    """
+    if not path:
+        return {}
+
+    with open(path) as f:
+        if path.endswith(".json"):
+            return {category["id"]: category["name"] for category in json.load(f)["categories"]}
+
+        return dict(enumerate(line.strip() for line in f))
+
+
+class Annotator(threading.Thread):
+    """
+    Décodage JPEG et dessin des détections dans un thread, hors de la boucle réseau de paho.
+
+    Chaque image annotée remplace la précédente non encore affichée : l'affichage montre toujours
+    la plus récente, sans retard qui s'accumule. Avec `publish`, l'image annotée est aussi encodée
+    une fois en JPEG et publiée pour le relais MJPEG / WebSocket.
+    """
+
+    def __init__(self, joiner, labels, publish=None, quality=80):
+        """
+        :param joiner : Association des images et des résultats.
+        :param labels : Noms des classes par identifiant.
+        :param publish : Fonction appelée avec chaque image annotée encodée (enveloppe binaire), ou None.
+        :param quality : Qualité JPEG des images publiées.
+        """
+        super().__init__(name="annotator", daemon=True)
+        self.joiner = joiner
+        self.labels = labels
+        self.publish = publish
+        self.quality = quality
+        self.rendered = deque()  # instants des images annotées pendant la dernière seconde
+        self.output = None  # (identifiant de l'image, image annotée)
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            joined = self.joiner.take(timeout=0.5)
+
+            if joined is None:
+                continue
+
+            try:
+                image = cv2.imdecode(np.frombuffer(joined.frame.data, np.uint8), cv2.IMREAD_COLOR)
+            except Exception as e:
+                print("Erreur lors du décodage de l'image:", e)
+                continue
+
+            if image is None:
+                continue
+
+            if joined.result is not None:
+                self.draw_detections(image, joined.result)
+
+            self.draw_counters(image, joined)
+
+            if self.publish is not None:
+                frame = joined.frame
+                _, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                self.publish(encode_frame(
+                    jpeg.tobytes(), frame.sequence, frame.camera_id, frame.timestamp,
+                    quality=self.quality, size=(image.shape[1], image.shape[0])
+                ))
+
+            with self.condition:
+                self.output = (joined.frame.image_id, image)
+                self.condition.notify()
+
+    def draw_detections(self, image, result):
+        for detection in iter_detections(result):
+            x, y, w, h = (int(round(value)) for value in detection["bbox"])
+            color = COLORS[detection["category_id"] % len(COLORS)]
+            label = f"{self.labels.get(detection['category_id'], detection['category_id'])} {detection['score']:.2f}"
+
+            if "track_id" in detection:
+                label += f" #{detection['track_id']}"
+
+            cv2.rectangle(image, (x, y), (x + w, y + h), color, 2)
+            (text_width, text_height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+            cv2.rectangle(image, (x, y - text_height - 6), (x + text_width + 4, y), color, -1)
+            cv2.putText(image, label, (x + 2, y - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
+
+    def draw_counters(self, image, joined):
+        # Latences depuis l'instant de capture (horloge de la caméra, à synchroniser par NTP)
+        now = time.time()
+        self.rendered.append(now)
+
+        while self.rendered and now - self.rendered[0] > 1:
+            self.rendered.popleft()
+
+        lines = [f"{len(self.rendered)} img/s", f"affichage {(now - joined.frame.timestamp) * 1000:.0f} ms"]
+
+        if joined.result is not None:
+            lines.append(f"resultat {(joined.result_received_at - joined.frame.timestamp) * 1000:.0f} ms")
+        else:
+            lines.append("sans resultat")
+
+        lines.append(f"ignorees {self.joiner.stats()['skipped']}")
+
+        for i, line in enumerate(lines):
+            position = (8, 20 + 20 * i)
+            cv2.putText(image, line, position, cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 0, 0), 3, cv2.LINE_AA)
+            cv2.putText(image, line, position, cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 255, 255), 1, cv2.LINE_AA)
+
+    def latest(self, timeout):
+        """
+        :param timeout : Attente maximale (en s) d'une nouvelle image annotée.
+
+        :return: (identifiant, image annotée), ou None après `timeout`.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.output is not None, timeout):
+                return None
+
+            output, self.output = self.output, None
+            return output
+
+
+def create_client(args, joiner):
+    """Client MQTT : les callbacks ne font que décoder les en-têtes et les résultats, le JPEG est décodé par l'Annotator."""
+
+    # Callback lors de la connexion au broker
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            print("Connecté au broker MQTT")
+            client.subscribe(args.images_topic)
+
+            if not args.raw:
+                client.subscribe(args.results_topic)
+        else:
+            print("Échec de la connexion, code de retour:", rc)
+
+    # Callback lors de la réception d'un message
+    def on_message(client, userdata, msg):
+        try:
+            if msg.topic == args.images_topic:
+                # En-tête de la trame seulement (format binaire ou ancien format JSON), sans copie de l'image
+                joiner.add_frame(decode_frame(msg.payload))
+            else:
+                joiner.add_result(decode_result(msg.payload))
+        except Exception as e:
+            print(f"Message invalide sur le topic {msg.topic}:", e)
+
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_message = on_message
+
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Affichage des images MQTT annotées avec les résultats d'inférence")
+    parser.add_argument("--broker", default=BROKER_ADDRESS)
+    parser.add_argument("--port", type=int, default=BROKER_PORT)
+    parser.add_argument("--images-topic", default=MQTT_TOPIC)
+    parser.add_argument("--results-topic", default=MQTT_TOPIC_RESULTS)
+    parser.add_argument("--raw", action="store_true", help="Images seules, sans attendre les résultats")
+    parser.add_argument("--result-timeout", type=float, default=1.0, help="Attente maximale du résultat d'une image (s)")
+    parser.add_argument("--labels", help="Noms des classes : annotations COCO (.json) ou un nom par ligne")
+    parser.add_argument("--headless", metavar="DOSSIER", help="Écrit les images annotées dans ce dossier au lieu de les afficher")
+    parser.add_argument("--publish", nargs="?", const=MQTT_TOPIC_ANNOTATED, metavar="TOPIC", help=f"Publie les images annotées (par défaut sur {MQTT_TOPIC_ANNOTATED})")
+    parser.add_argument("--publish-quality", type=int, default=80, help="Qualité JPEG des images publiées")
+    parser.add_argument("--no-window", action="store_true", help="Ni affichage ni écriture (avec --publish)")
+    args = parser.parse_args()
+
+    # Initialisation du client MQTT
+    joiner = FrameJoiner(0 if args.raw else args.result_timeout)
+    client = create_client(args, joiner)
+    publish = (lambda payload: client.publish(args.publish, payload)) if args.publish else None
+    annotator = Annotator(joiner, load_labels(args.labels), publish, args.publish_quality)
+    annotator.start()
+    display = not args.headless and not args.no_window
+
+    if args.headless:
+        os.makedirs(args.headless, exist_ok=True)
 
-# Callback lors de la connexion au broker
-def on_connect(client, userdata, flags, rc):
-    if rc == 0:
-        print("Connecté au broker MQTT")
-        client.subscribe(MQTT_TOPIC)
-    else:
-        print("Échec de la connexion, code de retour:", rc)
-
-# Callback lors de la réception d'un message
-def on_message(client, userdata, msg):
-    print("Message reçu sur le topic", msg.topic)
     try:
-        # Décoder le message reçu (base64 -> image)
-        image_data = base64.b64decode(json.loads(msg.payload)["image"])
-        np_arr = np.frombuffer(image_data, np.uint8)
-        image = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-
-        # Afficher l'image
-        if image is not None:
-            cv2.imshow("Flux d'images MQTT", image)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                client.disconnect()
-                cv2.destroyAllWindows()
+        # Connexion au broker MQTT, boucle réseau dans son propre thread
+        client.connect(args.broker, args.port, 60)
+        client.loop_start()
+
+        # Affichage dans le thread principal (nécessaire pour les fenêtres OpenCV)
+        while True:
+            output = annotator.latest(timeout=0.05)
+
+            if output is not None:
+                image_id, image = output
+
+                if args.headless:
+                    cv2.imwrite(os.path.join(args.headless, f"{image_id}.jpg".replace(":", "-")), image)
+                elif display:
+                    cv2.imshow(WINDOW_NAME, image)
+
+            if display and cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    except KeyboardInterrupt:
+        print("Interruption par l'utilisateur")
     except Exception as e:
-        print("Erreur lors du traitement de l'image:", e)
-
-# Initialisation du client MQTT
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
-
-try:
-    # Connexion au broker MQTT
-    client.connect(BROKER_ADDRESS, BROKER_PORT, 60)
-
-    # Boucle principale du client MQTT
-    client.loop_forever()
-except KeyboardInterrupt:
-    print("Interruption par l'utilisateur")
-    client.disconnect()
-    cv2.destroyAllWindows()
-except Exception as e:
-    print("Erreur:", e)
+        print("Erreur:", e)
+    finally:
+        annotator.stopped.set()
+        client.loop_stop()
+        client.disconnect()
+        print(f"Images : {joiner.stats()}")
+
+        if display:
+            cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+import paho.mqtt.client as mqtt
+
+# Ajout du dossier parent pour accéder au module common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.frame_protocol import decode_frame
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+BOUNDARY = "frame"
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Caméra</title></head>
+<body style="margin:0;background:#000">
+<img id="live" src="stream.mjpg" style="max-width:100%;display:block;margin:auto">
+<script>
+// WebSocket si disponible (pas de décodage multipart par le navigateur), sinon MJPEG
+if (window.WebSocket) {
+    const img = document.getElementById("live");
+    const ws = new WebSocket((location.protocol === "https:" ? "wss://" : "ws://") + location.host + "/ws");
+    ws.binaryType = "blob";
+    ws.onopen = () => { img.src = ""; };
+    ws.onmessage = (event) => {
+        const url = URL.createObjectURL(event.data);
+        img.onload = () => URL.revokeObjectURL(url);
+        img.src = url;
+    };
+}
+</script>
+</body>
+</html>
+"""
+
+
+def websocket_header(size: int, opcode: int = 0x2) -> bytes:
+    """En-tête d'une trame WebSocket du serveur (non masquée, binaire par défaut)."""
+    if size < 126:
+        return struct.pack(">BB", 0x80 | opcode, size)
+
+    if size < 1 << 16:
+        return struct.pack(">BBH", 0x80 | opcode, 126, size)
+
+    return struct.pack(">BBQ", 0x80 | opcode, 127, size)
+
+
+class EncodedFrame:
+    """
+    Une image JPEG et ses enveloppes MJPEG et WebSocket, construites une seule fois pour tous les clients.
+    """
+
+    def __init__(self, jpeg: bytes):
+        self.jpeg = jpeg
+        self._mjpeg = None
+        self._websocket = None
+
+    @property
+    def mjpeg(self) -> bytes:
+        if self._mjpeg is None:
+            self._mjpeg = (
+                f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(self.jpeg)}\r\n\r\n".encode()
+                + self.jpeg + b"\r\n"
+            )
+
+        return self._mjpeg
+
+    @property
+    def websocket(self) -> bytes:
+        if self._websocket is None:
+            self._websocket = websocket_header(len(self.jpeg)) + self.jpeg
+
+        return self._websocket
+
+
+class RelayClient:
+    """
+    Un client connecté : file bornée des dernières images, vidée par sa propre coroutine d'écriture.
+
+    Si le client lit moins vite que les images arrivent, les plus anciennes de sa file sont supprimées :
+    un client lent perd des images sans ralentir les autres.
+    """
+
+    def __init__(self, kind: str, address, queue_size: int):
+        """
+        :param kind : "mjpeg" ou "websocket".
+        :param address : Adresse du client.
+        :param queue_size : Nombre maximal d'images en attente d'envoi.
+        """
+
+        self.kind = kind
+        self.address = address
+        self.queue = asyncio.Queue(queue_size)
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, frame: EncodedFrame) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+
+        self.queue.put_nowait(frame)
+
+    async def write(self, writer: asyncio.StreamWriter) -> None:
+        while True:
+            frame = await self.queue.get()
+            writer.write(frame.mjpeg if self.kind == "mjpeg" else frame.websocket)
+            await writer.drain()
+            self.sent += 1
+
+    def stats(self) -> dict:
+        return {"kind": self.kind, "address": str(self.address), "sent": self.sent, "dropped": self.dropped, "queued": self.queue.qsize()}
+
+
+class FrameRelay:
+    """
+    Relais des images annotées vers des navigateurs : flux MJPEG (GET /stream.mjpg) et WebSocket (GET /ws).
+
+    Chaque image reçue est mise en forme une seule fois puis partagée entre tous les clients, sans réencodage :
+    le coût par client se limite à l'écriture sur son socket.
+    """
+
+    def __init__(self, queue_size: int = 2, write_buffer: int = 256 * 1024):
+        """
+        :param queue_size : Images en attente par client.
+        :param write_buffer : Octets en attente d'écriture par socket au-delà desquels l'écriture attend le client.
+        """
+
+        self.queue_size = queue_size
+        self.write_buffer = write_buffer
+        self.clients = set()
+        self.latest = None
+        self.frames = 0
+        self.started = time.monotonic()
+
+    def broadcast(self, jpeg: bytes) -> None:
+        """Envoie une image JPEG à tous les clients (à appeler dans la boucle asyncio)."""
+        self.latest = EncodedFrame(jpeg)
+        self.frames += 1
+
+        for client in self.clients:
+            client.offer(self.latest)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = (await reader.readline()).split()
+            path = request[1].decode() if len(request) > 1 else "/"
+            headers = {}
+
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if path == "/stream.mjpg":
+                writer.write(
+                    f"HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary={BOUNDARY}\r\n"
+                    f"Cache-Control: no-cache\r\nConnection: close\r\n\r\n".encode()
+                )
+                await self.stream(RelayClient("mjpeg", writer.get_extra_info("peername"), self.queue_size), reader, writer)
+            elif path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + WEBSOCKET_GUID).encode()).digest()).decode()
+                writer.write(
+                    f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                    f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+                )
+                await self.stream(RelayClient("websocket", writer.get_extra_info("peername"), self.queue_size), reader, writer)
+            else:
+                if path == "/":
+                    status, content_type, body = "200 OK", "text/html; charset=utf-8", PAGE.encode()
+                elif path == "/stats":
+                    status, content_type, body = "200 OK", "application/json", json.dumps(self.stats()).encode()
+                else:
+                    status, content_type, body = "404 Not Found", "text/plain", b"Not Found"
+
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+        except (ConnectionError, KeyError, UnicodeDecodeError):
+            pass
+        finally:
+            writer.close()
+
+    async def stream(self, client: RelayClient, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Peu d'octets en attente par socket : un client lent bloque sa coroutine d'écriture, et sa file déborde
+        writer.transport.set_write_buffer_limits(high=self.write_buffer)
+
+        if self.latest is not None:
+            # Première image sans attendre la suivante
+            client.offer(self.latest)
+
+        self.clients.add(client)
+        tasks = [asyncio.create_task(client.write(writer)), asyncio.create_task(self.wait_closed(client, reader, writer))]
+
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.clients.discard(client)
+
+            for task in tasks:
+                task.cancel()
+
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def wait_closed(self, client: RelayClient, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Lit le client jusqu'à sa déconnexion (ou une trame WebSocket de fermeture)."""
+        while True:
+            if client.kind == "mjpeg":
+                if not await reader.read(4096):
+                    return
+                continue
+
+            first, second = await reader.readexactly(2)
+            size = second & 0x7F
+
+            if size == 126:
+                size = struct.unpack(">H", await reader.readexactly(2))[0]
+            elif size == 127:
+                size = struct.unpack(">Q", await reader.readexactly(8))[0]
+
+            # Les trames du navigateur sont masquées (4 octets de masque), leur contenu est ignoré
+            await reader.readexactly(size + (4 if second & 0x80 else 0))
+
+            if first & 0x0F == 0x8:
+                writer.write(websocket_header(0, 0x8))
+                return
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "fps": round(self.frames / max(time.monotonic() - self.started, 1e-9), 2),
+            "clients": [client.stats() for client in self.clients]
+        }
+
+
+def subscribe_mqtt(relay: FrameRelay, loop: asyncio.AbstractEventLoop, args: argparse.Namespace) -> mqtt.Client:
+    """Reçoit les images (enveloppe binaire de common.frame_protocol) dans le thread de paho, puis les relaie dans la boucle asyncio."""
+
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            print("Connecté au broker MQTT")
+            client.subscribe(args.topic)
+        else:
+            print("Échec de la connexion, code de retour:", rc)
+
+    def on_message(client, userdata, msg):
+        try:
+            # Les octets JPEG sont relayés tels quels, sans décodage
+            jpeg = bytes(decode_frame(msg.payload).data)
+        except ValueError as e:
+            print("Image invalide:", e)
+            return
+
+        loop.call_soon_threadsafe(relay.broadcast, jpeg)
+
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect_async(args.broker, args.port, 60)
+    client.loop_start()
+
+    return client
+
+
+async def test_pattern(relay: FrameRelay, fps: float, size: int) -> None:
+    """Images synthétiques de la caméra simulée, pour tester le relais sans broker."""
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "rpi-cam")))
+    from fake_camera import FakeCamera
+
+    camera = FakeCamera((size, size), fps)
+
+    while True:
+        relay.broadcast(camera.next_image())
+        await asyncio.sleep(1 / fps)
+
+
+async def run(args: argparse.Namespace) -> None:
+    relay = FrameRelay(args.queue_size)
+    server = await asyncio.start_server(relay.handle, args.host, args.http_port)
+    print(f"Relais sur le port {args.http_port} : / (page), /stream.mjpg, /ws, /stats")
+
+    if args.test_pattern:
+        source = asyncio.create_task(test_pattern(relay, args.fps, args.size))
+        client = None
+    else:
+        source = None
+        client = subscribe_mqtt(relay, asyncio.get_running_loop(), args)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if source is not None:
+            source.cancel()
+
+        if client is not None:
+            client.loop_stop()
+            client.disconnect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Relais MJPEG / WebSocket des images annotées (une mise en forme par image, partagée par tous les clients)")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--topic", default="inference/annotated", help="Topic des images (publiées par mqttviewer/viewer.py --publish)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--http-port", type=int, default=8080, help="Port HTTP (redirigé par nginx depuis le port 544)")
+    parser.add_argument("--queue-size", type=int, default=2, help="Images en attente par client, les plus anciennes sont supprimées au-delà")
+    parser.add_argument("--test-pattern", action="store_true", help="Images synthétiques au lieu du broker MQTT")
+    parser.add_argument("--fps", type=float, default=10, help="Cadence des images synthétiques")
+    parser.add_argument("--size", type=int, default=640, help="Taille des images synthétiques")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,205 +1,401 @@
 import time
 import io
-import base64
-import serial
-import json
-from math import radians, cos, sin, sqrt, atan2
-from picamera import PiCamera
+import os
+import signal
+import sys
+import threading
 from datetime import datetime
 import paho.mqtt.client as mqtt
 
+# Ajout du dossier parent pour accéder au module common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.frame_protocol import FORMAT_BINARY, encode_frame, encode_legacy_frame, frame_id
+from common.result_protocol import decode_result, encode_result, iter_detections
+from capture_scheduler import CaptureScheduler
+from congestion import CongestionController
+from correlation_store import CorrelationStore, SpooledCorrelations
+from gps_reader import GpsReader, NmeaReplay, open_serial
+from spool import SequenceOffset, Spool, SpoolPublisher
+from video_capture import FrameRing, VideoCaptureThread
+
 # Configuration MQTT
 mqtt_broker = "localhost"
 mqtt_port = 1883
 mqtt_topic_images = "inference/images"
 mqtt_topic_results = "inference/results"
-gps_buffer = {}  # Buffer pour stocker les données GPS temporairement
+mqtt_topic_samples = "inference/samples"  # Images échantillonnées en mode d'inférence local
+# QoS et retain par topic (retain sur les images garderait la dernière image JPEG sur le broker)
+topic_settings = {
+    mqtt_topic_images: {"qos": 1, "retain": False},
+    mqtt_topic_results: {"qos": 1},
+    mqtt_topic_samples: {"qos": 0, "retain": False}
+}
+# File sur disque des images quand le broker est injoignable, vidée après la reconnexion
+spool_directory = "spool"
+spool_max_size = 256 * 2 ** 20  # Taille maximale (en octets), les images les plus anciennes sont supprimées au-delà
+drain_rate = 200_000  # Débit maximal du vidage de la file (en octets/s), les images en direct restent prioritaires
+publisher = None
+# Données GPS des images en attente de leur résultat (bornées en nombre et en durée)
+correlation_store = CorrelationStore(capacity=256, ttl=10.0)
+# Données GPS des images gardées dans la file, sur disque : leurs résultats arrivent après la reconnexion
+spooled_correlations = None
+# Numéros de séquence uniques d'un démarrage à l'autre (identifiants des images de la file)
+sequence_offset = None
+stats_interval = 60  # Intervalle entre deux logs des latences capture → résultat (en secondes)
+stats_requested = threading.Event()  # Levé par SIGUSR1, les statistiques sont affichées par la boucle de capture
+payload_format = FORMAT_BINARY  # "binary" ou "json" (ancien format, base64 dans du JSON)
+camera_id = 0
+
+# Inférence : "remote" (images envoyées au service MQTT) ou "local" (modèle exécuté sur la raspberry,
+# seuls les résultats sont publiés, au même format que ceux du service)
+inference_mode = "remote"
+local_backend = "onnxruntime"  # onnxruntime, openvino ou ultralytics (modèles NCNN)
+local_model = "../yolo/saved/yolo11n_trained.onnx"
+sample_every = 50  # En mode local, une image sur sample_every est publiée sur mqtt_topic_samples (0 : aucune)
+local_inference = None
 
 # Configuration caméra
-delay = 0.2  # Intervalle entre chaque capture (en secondes)
+delay = 0.2  # Intervalle entre chaque capture (en secondes), sans cadence adaptative ou sans position GPS
 image_width = 640
+capture_mode = "video"  # "video" : capture continue par le port vidéo, "still" : une photo puis une attente
+ring_size = 4  # Tampons JPEG partagés entre la capture et l'envoi (mode vidéo)
+use_fake_camera = False  # Caméra simulée pour tester hors de la raspberry
+frame_ring = None
+
+# Cadence adaptative : une image tous les `capture_distance` mètres, aucune à l'arrêt
+adaptive_capture = True
+capture_distance = 5.0  # Distance entre deux images (en mètres)
+min_rate = 0.5  # Images/s minimum quand la voiture roule
+max_rate = 10.0  # Images/s maximum (cadence de la caméra en mode vidéo)
+stationary_speed = 3.0  # Vitesse (en km/h) sous laquelle la voiture est à l'arrêt
+scheduler = None
+
+# Contrôle de congestion (mode remote) : qualité JPEG, résolution puis cadence réduites quand la latence
+# capture → résultat dépasse target_latency_ms, rétablies progressivement ensuite
+congestion_control = True
+target_latency_ms = 800
+camera_quality = 85  # Qualité JPEG de la caméra (valeur par défaut de picamera)
+min_quality = 40
+min_image_width = 320
+min_send_rate = 1.0  # Images/s minimum envoyées en cas de congestion
+controller = None
 
 # MQTT Setup
 client = mqtt.Client()
 
 # Configuration position
-last_longitude = None
-last_latitude = None
-last_timestamp = None
-default_gps_port = "/dev/serial0"
+default_gps_port = "/dev/serial0"  # Port série du GPS, ou un pty pour les tests
 gps_baudrate = 9600
+gps_replay = None  # Fichier NMEA enregistré à rejouer à la place du GPS (tests hors de la voiture)
+gps_reader = None
 
 
 def connect_mqtt():
-    """Connecte le client MQTT au broker."""
-    try:
-        client.connect(mqtt_broker, mqtt_port, 60)
-        print("Connecté au broker MQTT.")
-    except Exception as e:
-        print(f"Erreur de connexion MQTT : {e}")
+    """Connecte le client MQTT au broker, en arrière-plan : la boucle MQTT réessaie tant qu'il est injoignable."""
+    client.reconnect_delay_set(min_delay=1, max_delay=30)
+    client.connect_async(mqtt_broker, mqtt_port, 60)
+
+def on_connect(client, userdata, flags, rc):
+    """Callback de connexion (et de reconnexion) au broker."""
+    if rc != 0:
+        print(f"Erreur de connexion MQTT : {mqtt.connack_string(rc)}")
+        return
+
+    print("Connecté au broker MQTT.")
+    # S'abonner au topic des résultats (à chaque connexion, la session n'est pas conservée)
+    if inference_mode == "remote":
+        client.subscribe(mqtt_topic_results, qos=topic_settings[mqtt_topic_results]["qos"])
+    publisher.on_connect(client, userdata, flags, rc)
+
+def on_disconnect(client, userdata, rc):
+    """Callback de déconnexion : les images sont gardées sur disque jusqu'à la reconnexion."""
+    print("Déconnecté du broker MQTT, images gardées sur disque.")
+    publisher.on_disconnect(client, userdata, rc)
 
 def setup_camera():
-    """Initialise la caméra."""
+    """Initialise la caméra (simulée avec use_fake_camera, pour tester hors de la raspberry)."""
+    if use_fake_camera:
+        from fake_camera import FakeCamera
+
+        return FakeCamera((image_width, image_width), camera_rate())
+
+    from picamera import PiCamera
+
     camera = PiCamera()
     camera.resolution = (image_width, image_width)
     return camera
 
 def on_message(client, userdata, msg):
     """Callback pour recevoir les résultats d'inférence."""
-    global gps_buffer
     try:
-        # Charger les résultats en tant que dictionnaire
-        inference_result = eval(msg.payload.decode())
-        image_id = inference_result["image_id"]
-
-        # Associer les données GPS correspondantes
-        if image_id in gps_buffer:
-            gps_data = gps_buffer.pop(image_id)
-            combined_data = {
-                "image_id": image_id,
-                "gps_data": gps_data,
-                "inference_result": inference_result
-            }
-            print(f"Données combinées : {combined_data}")
-        else:
-            print(f"Résultat reçu mais aucune donnée GPS trouvée pour image_id={image_id}, {inference_result}")
+        # Charger les résultats (un message par image, ou par boîte pour l'ancien format)
+        handle_result(decode_result(msg.payload))
     except Exception as e:
         print(f"Erreur lors de la réception des résultats : {e}")
 
-def haversine(lat1, lon1, lat2, lon2):
-    """
-    Calcule la distance entre deux points GPS en utilisant la formule de Haversine.
-    Les coordonnées sont en degrés décimaux, la distance est en kilomètres.
-    """
-    R = 6371  # Rayon moyen de la Terre en km
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return R * c
-
-def calculate_speed(lat1, lon1, time1, lat2, lon2, time2):
+def handle_result(inference_result):
+    """Associe un résultat d'inférence (du service MQTT ou local) aux données GPS de son image."""
+    image_id = inference_result["image_id"]
+
+    # Associer les données GPS correspondantes
+    spooled = spooled_correlations.pop(image_id) if spooled_correlations is not None else None
+
+    if spooled is not None:
+        # Image envoyée depuis la file après une coupure : sa latence ne concerne pas le contrôle de congestion
+        correlation_store.discard(image_id)
+        gps_data, captured_at = spooled
+        match = gps_data, (time.time() - captured_at) * 1000
+    else:
+        match = correlation_store.pop(image_id)
+
+        if match is not None and controller is not None:
+            controller.on_result(match[1], time.time())
+
+    if match is not None:
+        gps_data, latency = match
+        combined_data = {
+            "image_id": image_id,
+            "gps_data": gps_data,
+            "detections": list(iter_detections(inference_result)),
+            "timings": inference_result["timings"],
+            "latency_ms": round(latency, 1)
+        }
+        print(f"Données combinées : {combined_data}")
+    else:
+        print(f"Résultat reçu mais aucune donnée GPS trouvée pour image_id={image_id}, {inference_result}")
+
+def on_local_result(image_id, detections, timings):
+    """Callback du thread d'inférence local : publie le résultat au format du service MQTT."""
+    try:
+        message = encode_result(
+            image_id,
+            [detection["category_id"] for detection in detections],
+            [detection["score"] for detection in detections],
+            [detection["bbox"] for detection in detections],
+            timings
+        )
+        publisher.publish(mqtt_topic_results, message)
+        handle_result(decode_result(message))
+    except Exception as e:
+        print(f"Erreur lors du traitement du résultat local : {e}")
+
+def request_stats(*_):
     """
-    Calcule la vitesse en km/h entre deux points GPS donnés.
-    - `lat1`, `lon1` : Latitude et longitude du point 1 (en degrés décimaux)
-    - `time1` : Temps UTC du point 1 (au format hhmmss.sss)
-    - `lat2`, `lon2` : Latitude et longitude du point 2 (en degrés décimaux)
-    - `time2` : Temps UTC du point 2 (au format hhmmss.sss)
+    Gestionnaire de SIGUSR1 (kill -USR1 <pid>) : lève seulement un drapeau.
+    Il s'exécute dans le thread principal, peut-être pendant qu'il tient le verrou d'un des objets dont
+    log_stats lit les statistiques : les lire ici bloquerait la capture.
     """
-    # Calcul de la distance entre les deux points en km
-    distance = haversine(lat1, lon1, lat2, lon2)
+    stats_requested.set()
+
+def stats_due(last_stats):
+    """Vrai si les statistiques doivent être affichées (intervalle écoulé ou SIGUSR1 reçu)."""
+    if stats_requested.is_set() or time.monotonic() - last_stats >= stats_interval:
+        stats_requested.clear()
+        return True
+    return False
+
+def log_stats():
+    """Affiche les latences capture → résultat."""
+    print(f"Corrélation images / résultats : {correlation_store.stats()}")
+    if frame_ring is not None:
+        print(f"Capture vidéo : {frame_ring.stats()}")
+    if gps_reader is not None:
+        print(f"GPS : {gps_reader.stats()}")
+    if scheduler is not None:
+        print(f"Cadence adaptative : {scheduler.stats()}")
+    if controller is not None:
+        print(f"Contrôle de congestion : {controller.stats()}")
+    if publisher is not None:
+        print(f"Envoi : {publisher.stats()}")
+    if spooled_correlations is not None:
+        print(f"Positions des images de la file : {spooled_correlations.stats()}")
+    if local_inference is not None:
+        print(f"Inférence locale : {local_inference.stats()}")
+
+def camera_rate():
+    """Images/s produites par la caméra : la cadence maximale, le planificateur choisit celles envoyées."""
+    return max_rate if adaptive_capture else 1 / delay
+
+def setup_scheduler():
+    """Planificateur de la cadence adaptative (None : cadence fixe de 1 / delay images/s)."""
+    if not adaptive_capture:
+        return None
 
-    # Calcul du temps écoulé en secondes
-    time1_seconds = int(time1[:2]) * 3600 + int(time1[2:4]) * 60 + float(time1[4:])
-    time2_seconds = int(time2[:2]) * 3600 + int(time2[2:4]) * 60 + float(time2[4:])
-    time_diff = time2_seconds - time1_seconds
+    return CaptureScheduler(capture_distance, min_rate, max_rate, stationary_speed, fallback_rate=1 / delay)
 
-    if time_diff <= 0:  # Gestion des cas où le temps est invalide ou nul
-        return 0
+def setup_controller():
+    """Contrôle de congestion de l'envoi des images (None en mode local ou s'il est désactivé)."""
+    if not congestion_control or inference_mode != "remote":
+        return None
 
-    # Calcul de la vitesse en km/h
-    speed_kmh = (distance / time_diff) * 3600
-    return speed_kmh
+    return CongestionController(
+        target_latency_ms, (min_quality, camera_quality), (min_image_width, image_width), (min(min_send_rate, camera_rate()), camera_rate())
+    )
 
-def get_gps_data(gps_port):
-    """Lit les données GPS depuis le module."""
-    global last_latitude, last_longitude, last_timestamp
-    try:
-        with serial.Serial(gps_port, gps_baudrate, timeout=1) as ser:
-            line = ser.readline().decode('ascii', errors='ignore')
-            # print(line)
-            if line.startswith("$GPGGA"):
-                data = line.split(',')
-                # print(f"Raw Data: {data}")  # Affiche tout le message analysé
-                if data[6] == "1":  # Fix valide
-                    latitude_value = data[2]
-                    latitude_direction = data[3]
-                    longitude_value = data[4]
-                    longitude_direction = data[5]
-                    # print(f"Latitude: {latitude_value} {latitude_direction}, Longitude: {longitude_value} {longitude_direction}")
-                    latitude = convert_gps_coordinate(latitude_value, latitude_direction)
-                    longitude = convert_gps_coordinate(longitude_value, longitude_direction)
-                    t = datetime.now().strftime("%H%M%S.%f")
-                    speed = 0
-                    if ((last_longitude != None) and (last_latitude != None) and (last_timestamp != None)):
-                        speed = calculate_speed(last_latitude, last_longitude, last_timestamp, latitude, longitude, t)
-
-                    last_latitude = latitude
-                    last_longitude = longitude
-                    last_timestamp = t
-
-                    return speed, (latitude, longitude)
-    except Exception as e:
-        print(f"Erreur GPS: {e}")
-    return None, (None, None)
+def should_send(now, fix):
+    """Cadence des images : limite du contrôle de congestion, puis distance parcourue."""
+    if controller is not None and not controller.allows(now):
+        return False
+
+    return scheduler is None or scheduler.should_capture(fix, now)
+
+def setup_gps():
+    """Démarre la lecture continue du GPS dans un thread."""
+    if gps_replay:
+        reader = GpsReader(lambda: NmeaReplay(gps_replay, loop=True))
+    else:
+        reader = GpsReader(lambda: open_serial(default_gps_port, gps_baudrate))
 
-def convert_gps_coordinate(value, direction):
-    """Convertit les coordonnées GPS NMEA en degrés décimaux."""
-    if not value or not direction:
-        print("Invalid value or direction")  # Log si les valeurs sont absentes
+    reader.start()
+    return reader
+
+def setup_local_inference():
+    """Charge le modèle de l'inférence locale et démarre son thread (None en mode remote)."""
+    if inference_mode != "local":
         return None
 
-    try:
-        # Séparer degrés et minutes
-        if len(value.split('.')[0]) > 4:
-            degrees = float(value[:3])  # Pour longitude (3 chiffres pour les degrés)
-            minutes = float(value[3:])
-        else:
-            degrees = float(value[:2])  # Pour latitude (2 chiffres pour les degrés)
-            minutes = float(value[2:])
+    from local_inference import LocalInference
 
-        # Convertir en degrés décimaux
-        decimal = degrees + (minutes / 60)
-        if direction in ['S', 'W']:  # Sud ou Ouest implique une valeur négative
-            decimal = -decimal
+    worker = LocalInference(on_local_result, local_backend, local_model, image_size=image_width)
+    worker.start()
+    return worker
 
-        return round(decimal, 6)
+def publish_frame(image_data, now, sequence, fix):
+    """Encode et publie une image (ou la confie à l'inférence locale), sa position GPS attend le résultat."""
+    # L'identifiant d'image est celui renvoyé dans les résultats
+    sequence = sequence_offset.apply(sequence)
+    image_id = frame_id(camera_id, sequence) if payload_format == FORMAT_BINARY else now.isoformat()
 
-    except ValueError as e:
-        print(f"Error parsing value: {value}, Error: {e}")
-        return None
+    # Position à l'instant de capture, associée à l'image jusqu'à la réception de son résultat
+    gps_data = fix.to_dict() if fix is not None else None
+    correlation_store.put(image_id, gps_data, now.timestamp())
 
-def main():
-    connect_mqtt()
-    client.subscribe(mqtt_topic_results)  # S'abonner au topic des résultats
-    client.on_message = on_message  # Assigner la callback pour les résultats
-    client.loop_start()  # Démarrer la boucle MQTT
+    if local_inference is not None:
+        # Le tampon de l'image est réutilisé par la capture : copie pour le thread d'inférence
+        submitted = local_inference.submit(image_id, bytes(image_data))
 
-    camera = setup_camera()
-    print("Appareil photo initialisé. Capture et envoi en cours...")
-    gps_port = default_gps_port
+        if not sample_every or (submitted - 1) % sample_every:
+            return
+
+    # Encodage de l'image, avec la qualité et la résolution du contrôle de congestion
+    if controller is not None:
+        image_data, quality, size = controller.encode(image_data, camera_quality, (image_width, image_width))
+        controller.on_sent(now.timestamp())
+    else:
+        quality, size = camera_quality, (image_width, image_width)
+
+    if payload_format == FORMAT_BINARY:
+        payload = encode_frame(image_data, sequence, camera_id, now.timestamp(), quality=quality, size=size)
+    else:
+        payload = encode_legacy_frame(bytes(image_data), now.timestamp())
+
+    # Publier l'image, ou la garder sur disque si le broker est injoignable (avec sa position)
+    if not publisher.publish(mqtt_topic_images if local_inference is None else mqtt_topic_samples, payload) and local_inference is None:
+        spooled_correlations.put(image_id, gps_data, now.timestamp())
+
+def capture_still(camera):
+    """Ancien mode : une capture par le port photo puis une attente (`delay` secondes, ou jusqu'à la prochaine image à envoyer)."""
+    sequence = 0
+    last_stats = time.monotonic()
+
+    while True:
+        if stats_due(last_stats):
+            log_stats()
+            last_stats = time.monotonic()
+
+        now = time.time()
+
+        if not should_send(now, gps_reader.fix_at(now)):
+            time.sleep(1 / camera_rate())
+            continue
+
+        # Capture d'image en mémoire
+        image_stream = io.BytesIO()
+        camera.capture(image_stream, format='jpeg')
+
+        # Instant de capture de l'image
+        now = datetime.now()
+        publish_frame(image_stream.getvalue(), now, sequence, gps_reader.fix_at(now.timestamp()))
+        sequence += 1
+
+        # Attente avant la prochaine capture
+        time.sleep(1 / camera_rate())
+
+def capture_video(camera):
+    """
+    Capture continue par le port vidéo dans un thread dédié, envoi dans ce thread.
+    Un broker lent ne ralentit pas la caméra : les images non envoyées à temps sont remplacées par la suivante.
+    """
+    global frame_ring
+    camera.framerate = camera_rate()
+    frame_ring = FrameRing(ring_size)
+    capture_thread = VideoCaptureThread(camera, frame_ring)
+    capture_thread.start()
+    last_stats = time.monotonic()
 
     try:
         while True:
-            # Capture d'image en mémoire
-            image_stream = io.BytesIO()
-            camera.capture(image_stream, format='jpeg')
-            image_stream.seek(0)
+            frame = frame_ring.acquire_read(timeout=1)
+
+            if frame is None:
+                if not capture_thread.is_alive():
+                    raise RuntimeError(f"Capture vidéo arrêtée : {capture_thread.error}")
+                continue
 
-            image_base64 = base64.b64encode(image_stream.read()).decode('utf-8')
+            try:
+                fix = gps_reader.fix_at(frame.timestamp)
 
-            # Générer un timestamp unique pour l'image
-            timestamp = datetime.now().isoformat()
+                # Le numéro de séquence est celui de la caméra : un trou signale une image non envoyée
+                if should_send(frame.timestamp, fix):
+                    publish_frame(frame.data, datetime.fromtimestamp(frame.timestamp), frame.sequence, fix)
+            finally:
+                frame_ring.release(frame)
 
-            # Capture des données GPS
-            gps_data = get_gps_data(gps_port)
-            gps_buffer[timestamp] = gps_data
+            if stats_due(last_stats):
+                log_stats()
+                last_stats = time.monotonic()
+    finally:
+        capture_thread.stop(timeout=2)
 
-            # Publier l'image et le timestamp
-            payload = {
-                "timestamp": timestamp,
-                "image": image_base64
-            }
-            client.publish(mqtt_topic_images, json.dumps(payload), qos=1, retain=True)
+def main():
+    global publisher, spooled_correlations, sequence_offset
+    publisher = SpoolPublisher(client, Spool(spool_directory, spool_max_size), topic_settings, drain_rate)
+    spooled_correlations = SpooledCorrelations(os.path.join(spool_directory, "correlations.jsonl"))
+    sequence_offset = SequenceOffset(spool_directory)
+    publisher.start()
+
+    client.on_connect = on_connect
+    client.on_disconnect = on_disconnect
+    client.on_message = on_message  # Assigner la callback pour les résultats
+    connect_mqtt()
+    client.loop_start()  # Démarrer la boucle MQTT
 
-            # print(f"Image envoyée avec timestamp={timestamp}. Données GPS stockées.")
+    global gps_reader, scheduler, controller, local_inference
+    gps_reader = setup_gps()
+    scheduler = setup_scheduler()
+    controller = setup_controller()
+    local_inference = setup_local_inference()
 
-            # Attente avant la prochaine capture
-            time.sleep(delay)
+    camera = setup_camera()
+    print("Appareil photo initialisé. Capture et envoi en cours...")
+
+    signal.signal(signal.SIGUSR1, request_stats)
+
+    try:
+        if capture_mode == "video":
+            capture_video(camera)
+        else:
+            capture_still(camera)
     except KeyboardInterrupt:
         print("Arrêt du programme.")
+        log_stats()
     finally:
         camera.close()
+        gps_reader.stop(timeout=2)
+        if local_inference is not None:
+            local_inference.stop(timeout=2)
+        publisher.stop(timeout=2)
+        spooled_correlations.close()
         client.loop_stop()
 
 if __name__ == "__main__":
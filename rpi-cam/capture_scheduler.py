@@ -0,0 +1,74 @@
+from typing import Optional
+
+from gps_reader import GpsFix
+
+# Marge sur les intervalles : une image de la caméra arrive parfois un peu avant sa période (gigue)
+INTERVAL_TOLERANCE = 0.9
+
+
+class CaptureScheduler:
+    """
+    Décide quelles images envoyer selon la distance parcourue et la vitesse du GPS.
+
+    Une image est envoyée tous les `distance` mètres, sans dépasser `max_rate` images/s (autoroute) ni
+    descendre sous `min_rate` images/s tant que la voiture roule. À l'arrêt (vitesse sous `stationary_speed`)
+    aucune image n'est envoyée. Sans position GPS, les images sont envoyées à la cadence fixe `fallback_rate`.
+    """
+
+    def __init__(self, distance: float = 5.0, min_rate: float = 0.5, max_rate: float = 10.0,
+                 stationary_speed: float = 3.0, fallback_rate: float = 5.0):
+        """
+        :param distance : Distance (en m) entre deux images.
+        :param min_rate : Cadence minimale (images/s) quand la voiture roule.
+        :param max_rate : Cadence maximale (images/s).
+        :param stationary_speed : Vitesse (en km/h) sous laquelle la voiture est considérée à l'arrêt.
+        :param fallback_rate : Cadence (images/s) sans position GPS.
+        """
+
+        self.distance = distance
+        self.min_interval = 1 / min_rate
+        self.max_interval = 1 / max_rate
+        self.fallback_interval = 1 / fallback_rate
+        self.stationary_speed = stationary_speed
+        self.last_capture = None  # instant de la dernière image envoyée
+        self.last_time = None  # instant de la dernière décision
+        self.travelled = 0.0  # distance (en m) parcourue depuis la dernière image envoyée
+        self.counts = {"sent": 0, "skipped": 0, "stationary": 0, "no_fix": 0}
+
+    def should_capture(self, fix: Optional[GpsFix], now: float) -> bool:
+        """
+        :param fix : Position GPS à l'instant `now` (None si aucune position récente).
+        :param now : Instant de la décision (time.time(), ou instant de capture de l'image).
+
+        :return: True si l'image doit être envoyée.
+        """
+
+        # Distance parcourue depuis la décision précédente, à la vitesse du GPS
+        if fix is not None and fix.speed_kmh is not None and self.last_time is not None and now > self.last_time:
+            self.travelled += fix.speed_kmh / 3.6 * (now - self.last_time)
+
+        self.last_time = now
+        elapsed = (now - self.last_capture) / INTERVAL_TOLERANCE if self.last_capture is not None else float("inf")
+
+        if fix is None or fix.speed_kmh is None:
+            self.counts["no_fix"] += 1
+            capture = elapsed >= self.fallback_interval
+        elif fix.speed_kmh < self.stationary_speed:
+            self.counts["stationary"] += 1
+            self.travelled = 0.0
+            return False
+        else:
+            capture = elapsed >= self.max_interval and (self.travelled >= self.distance or elapsed >= self.min_interval)
+
+        if capture:
+            # Le reste de la distance est reporté sur l'image suivante (images alignées sur celles de la caméra)
+            self.last_capture = now
+            self.travelled = min(max(self.travelled - self.distance, 0.0), self.distance)
+            self.counts["sent"] += 1
+        else:
+            self.counts["skipped"] += 1
+
+        return capture
+
+    def stats(self) -> dict:
+        return dict(self.counts)
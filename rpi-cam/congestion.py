@@ -0,0 +1,164 @@
+import io
+import threading
+from collections import deque
+from typing import Tuple
+
+from PIL import Image
+
+# Marge sur l'intervalle entre deux images : une image de la caméra arrive parfois un peu avant sa période (gigue)
+INTERVAL_TOLERANCE = 0.9
+
+
+def interpolate(low: float, high: float, level: float, start: float, end: float) -> float:
+    """Valeur entre `low` et `high` quand le niveau passe de `start` à `end` (bornée en dehors)."""
+    ratio = min(1.0, max(0.0, (level - start) / (end - start)))
+    return low + (high - low) * ratio
+
+
+class CongestionController:
+    """
+    Contrôle de congestion AIMD de l'envoi des images, à partir de la latence capture → résultat.
+
+    Un niveau entre 0 et 1 fixe les réglages : en baissant depuis 1, la qualité JPEG diminue d'abord, puis
+    la résolution, puis la cadence. Toutes les `interval` secondes, si une latence dépasse `target_latency_ms`,
+    ou si la plus ancienne image sans résultat attend depuis plus longtemps (file d'envoi ou serveur saturé,
+    sans attendre son résultat), le niveau est multiplié par `decrease` ; sinon il augmente de `increase`.
+    Seules les images capturées après la dernière baisse comptent : une congestion n'entraîne qu'une baisse,
+    puis une autre seulement si les images envoyées avec les nouveaux réglages sont encore en retard.
+
+    `on_result` est appelé depuis le thread réseau de paho, les autres méthodes depuis celui de la capture.
+    """
+
+    def __init__(self, target_latency_ms: float = 800, quality: Tuple[int, int] = (40, 85), size: Tuple[int, int] = (320, 640),
+                 rate: Tuple[float, float] = (1.0, 5.0), decrease: float = 0.5, increase: float = 0.05,
+                 interval: float = 1.0):
+        """
+        :param target_latency_ms : Latence capture → résultat maximale visée (en ms).
+        :param quality : Qualité JPEG minimale et maximale (la maximale est celle de la caméra).
+        :param size : Plus grand côté minimal et maximal de l'image (le maximal est celui de la caméra).
+        :param rate : Cadence minimale et maximale (images/s).
+        :param decrease : Facteur de baisse du niveau en cas de congestion.
+        :param increase : Hausse du niveau sans congestion.
+        :param interval : Intervalle (en s) entre deux ajustements.
+        """
+
+        self.target_latency_ms = target_latency_ms
+        self.quality = quality
+        self.size = size
+        self.rate = rate
+        self.decrease = decrease
+        self.increase = increase
+        self.interval = interval
+        self.level = 1.0
+        self.latencies = []  # latences reçues depuis le dernier ajustement
+        self.last_update = None
+        self.last_decrease = float("-inf")
+        self.last_sent = None
+        self.unanswered = deque(maxlen=256)  # instants de capture des images envoyées sans résultat
+        self.counts = {"decreases": 0, "increases": 0}
+        self.lock = threading.Lock()
+
+    def settings(self) -> Tuple[int, int, float]:
+        """
+        :return: La qualité JPEG, le plus grand côté de l'image (multiple de 32) et la cadence du niveau actuel.
+        """
+
+        quality = round(interpolate(self.quality[0], self.quality[1], self.level, 2 / 3, 1))
+        size = int(interpolate(self.size[0], self.size[1], self.level, 1 / 3, 2 / 3)) // 32 * 32
+        rate = interpolate(self.rate[0], self.rate[1], self.level, 0, 1 / 3)
+
+        return quality, max(size, 32), rate
+
+    def allows(self, now: float) -> bool:
+        """
+        :param now : Instant de capture de l'image.
+
+        :return: True si la cadence actuelle permet d'envoyer l'image.
+        """
+
+        with self.lock:
+            self._update(now)
+
+            return self.last_sent is None or (now - self.last_sent) / INTERVAL_TOLERANCE >= 1 / self.settings()[2]
+
+    def on_sent(self, now: float) -> None:
+        with self.lock:
+            self.last_sent = now
+            self.unanswered.append(now)
+
+    def on_result(self, latency_ms: float, now: float) -> None:
+        """
+        :param latency_ms : Latence capture → résultat d'une image.
+        :param now : Instant de réception du résultat.
+        """
+
+        captured_at = now - latency_ms / 1000
+
+        with self.lock:
+            # Les résultats arrivent dans l'ordre d'envoi : les images plus anciennes sans résultat sont perdues
+            while self.unanswered and self.unanswered[0] <= captured_at + 1e-3:
+                self.unanswered.popleft()
+
+            if captured_at >= self.last_decrease:
+                self.latencies.append(latency_ms)
+
+    def update(self, now: float) -> None:
+        with self.lock:
+            self._update(now)
+
+    def _update(self, now: float) -> None:
+        if self.last_update is None:
+            self.last_update = now
+
+        if now - self.last_update < self.interval:
+            return
+
+        # Plus ancienne image envoyée depuis la dernière baisse et toujours sans résultat
+        waiting = next((sent for sent in self.unanswered if sent >= self.last_decrease), None)
+        late = waiting is not None and (now - waiting) * 1000 > self.target_latency_ms
+
+        if late or (self.latencies and max(self.latencies) > self.target_latency_ms):
+            self.level *= self.decrease
+            self.last_decrease = now
+            self.counts["decreases"] += 1
+        elif self.latencies:
+            self.level = min(1.0, self.level + self.increase)
+            self.counts["increases"] += 1
+
+        self.latencies = []
+        self.last_update = now
+
+    def encode(self, data, source_quality: int, source_size: Tuple[int, int]) -> Tuple[bytes, int, Tuple[int, int]]:
+        """
+        Réencode une image de la caméra avec les réglages actuels (inchangée s'ils sont ceux de la caméra).
+
+        :param data : Image JPEG de la caméra.
+        :param source_quality : Qualité JPEG de la caméra.
+        :param source_size : Taille (largeur, hauteur) des images de la caméra.
+
+        :return: L'image, sa qualité JPEG et sa taille.
+        """
+
+        quality, size, _ = self.settings()
+
+        if quality >= source_quality and size >= max(source_size):
+            return data, source_quality, source_size
+
+        image = Image.open(io.BytesIO(data))
+        # Décodage réduit dans le domaine DCT, puis réduction exacte
+        image.draft("RGB", (size, size))
+        image = image.convert("RGB")
+
+        if max(image.size) > size:
+            image.thumbnail((size, size), Image.BILINEAR)
+
+        stream = io.BytesIO()
+        image.save(stream, format="jpeg", quality=min(quality, source_quality))
+
+        return stream.getvalue(), min(quality, source_quality), image.size
+
+    def stats(self) -> dict:
+        with self.lock:
+            quality, size, rate = self.settings()
+
+            return {"level": round(self.level, 3), "quality": quality, "size": size, "rate": round(rate, 2), **self.counts}
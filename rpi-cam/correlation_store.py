@@ -0,0 +1,320 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Bornes (en ms) de l'histogramme des latences capture → résultat
+LATENCY_BUCKETS_MS = (50, 100, 200, 300, 500, 750, 1000, 2000, 5000)
+
+
+class LatencyHistogram:
+    """
+    Histogramme glissant des `window` dernières latences.
+    """
+
+    def __init__(self, window: int = 500, buckets: tuple = LATENCY_BUCKETS_MS):
+        """
+        :param window : Nombre de latences conservées.
+        :param buckets : Bornes supérieures des intervalles (en ms).
+        """
+
+        self.values = deque(maxlen=window)
+        self.buckets = buckets
+
+    def add(self, latency_ms: float) -> None:
+        self.values.append(latency_ms)
+
+    def snapshot(self) -> dict:
+        """
+        :return: Le nombre de latences, leur moyenne, p50, p90, p99, max (en ms) et le nombre de latences
+                 par intervalle ("<=50", ..., ">5000").
+        """
+
+        values = sorted(self.values)
+
+        if not values:
+            return {"count": 0}
+
+        def percentile(p):
+            return values[min(len(values) - 1, int(p * len(values)))]
+
+        histogram = {f"<={bound}": 0 for bound in self.buckets}
+        histogram[f">{self.buckets[-1]}"] = 0
+        labels = list(histogram)
+
+        for value in values:
+            histogram[labels[bisect.bisect_left(self.buckets, value)]] += 1
+
+        return {
+            "count": len(values),
+            "mean": round(sum(values) / len(values), 1),
+            "p50": round(percentile(0.5), 1),
+            "p90": round(percentile(0.9), 1),
+            "p99": round(percentile(0.99), 1),
+            "max": round(values[-1], 1),
+            "histogram": histogram
+        }
+
+
+class CorrelationStore:
+    """
+    Association des données capturées avec une image (GPS...) et des résultats d'inférence reçus plus tard.
+
+    Les entrées sont indexées par identifiant d'image (numéro de séquence de la caméra) et bornées :
+    au-delà de `capacity` entrées la plus ancienne est évincée, et une entrée sans résultat après
+    `ttl` secondes (image sans détection, résultat perdu) est supprimée. Pour chaque résultat associé,
+    la latence capture → résultat est ajoutée à un histogramme glissant.
+    """
+
+    def __init__(self, capacity: int = 256, ttl: float = 10.0, window: int = 500):
+        """
+        :param capacity : Nombre maximal d'images en attente de résultat.
+        :param ttl : Durée (en s) pendant laquelle une image attend son résultat.
+        :param window : Nombre de latences de l'histogramme glissant.
+        """
+
+        self.capacity = capacity
+        self.ttl = ttl
+        self.entries = OrderedDict()  # image_id -> (instant de capture, données), dans l'ordre de capture
+        self.latencies = LatencyHistogram(window)
+        self.counts = {"stored": 0, "matched": 0, "unmatched": 0, "expired": 0, "evicted": 0}
+        self.lock = threading.Lock()
+
+    def put(self, image_id, data, captured_at: float = None) -> None:
+        """
+        Enregistre les données d'une image capturée.
+
+        :param image_id : Identifiant de l'image (renvoyé dans les résultats).
+        :param data : Données associées à l'image.
+        :param captured_at : Instant de capture (time.time(), maintenant par défaut).
+        """
+
+        captured_at = time.time() if captured_at is None else captured_at
+
+        with self.lock:
+            self._expire(captured_at)
+
+            while len(self.entries) >= self.capacity:
+                self.entries.popitem(last=False)
+                self.counts["evicted"] += 1
+
+            self.entries[image_id] = (captured_at, data)
+            self.counts["stored"] += 1
+
+    def pop(self, image_id, received_at: float = None):
+        """
+        Récupère les données d'une image à la réception de son résultat.
+
+        :param image_id : Identifiant de l'image.
+        :param received_at : Instant de réception du résultat (time.time(), maintenant par défaut).
+
+        :return: Les données de l'image et la latence capture → résultat (en ms), ou None si l'image est inconnue ou expirée.
+        """
+
+        received_at = time.time() if received_at is None else received_at
+
+        with self.lock:
+            self._expire(received_at)
+            entry = self.entries.pop(image_id, None)
+
+            if entry is None:
+                self.counts["unmatched"] += 1
+                return None
+
+            captured_at, data = entry
+            latency = (received_at - captured_at) * 1000
+            self.latencies.add(latency)
+            self.counts["matched"] += 1
+
+            return data, latency
+
+    def discard(self, image_id) -> None:
+        """Oublie une image sans compter de résultat (résultat associé par ailleurs)."""
+        with self.lock:
+            self.entries.pop(image_id, None)
+
+    def _expire(self, now: float) -> None:
+        # Les entrées sont dans l'ordre de capture : seules les premières peuvent avoir expiré
+        while self.entries:
+            captured_at, _ = next(iter(self.entries.values()))
+
+            if now - captured_at <= self.ttl:
+                break
+
+            self.entries.popitem(last=False)
+            self.counts["expired"] += 1
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> dict:
+        """
+        :return: Le nombre d'images en attente, les compteurs et l'histogramme des latences.
+        """
+
+        with self.lock:
+            return {"pending": len(self.entries), **self.counts, "latency_ms": self.latencies.snapshot()}
+
+
+class SpooledCorrelations:
+    """
+    Données des images gardées dans la file sur disque pendant une coupure du broker.
+
+    Leurs résultats n'arrivent qu'après la reconnexion, bien après le `ttl` de CorrelationStore, et
+    éventuellement après un redémarrage : les données sont donc ajoutées à un fichier JSON Lines
+    (synchronisé au plus toutes les `sync_interval` secondes) et relues au démarrage. Le fichier est
+    réécrit sans les images déjà associées ou oubliées quand elles y sont majoritaires.
+
+    Une image capturée depuis plus de `ttl` secondes est oubliée : son résultat ne reviendra plus
+    (image évincée de la file pleine, résultat perdu ou image sans détection).
+    """
+
+    def __init__(self, path: str, capacity: int = 100_000, ttl: float = 24 * 3600, sync_interval: float = 1.0):
+        """
+        :param path : Fichier JSON Lines (dans le dossier de la file).
+        :param capacity : Nombre maximal d'images en attente de résultat, la plus ancienne est oubliée au-delà.
+        :param ttl : Durée (en s) après la capture pendant laquelle une image attend son résultat, coupure comprise.
+        :param sync_interval : Intervalle (en s) entre deux synchronisations (fsync) du fichier.
+        """
+
+        directory = os.path.dirname(path)
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.capacity = capacity
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.entries = OrderedDict()  # image_id -> (instant de capture, données)
+        self.removed = 0  # lignes du fichier d'images déjà associées
+        self.last_sync = time.monotonic()
+        self.counts = {"stored": 0, "matched": 0, "evicted": 0, "expired": 0, "recovered": 0}
+        self.lock = threading.Lock()
+        self._load()
+        self._expire(time.time())
+        self.counts["recovered"] = len(self.entries)
+        self._compact()
+
+    def _load(self) -> None:
+        try:
+            f = open(self.path)
+        except OSError:
+            return
+
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Fin de fichier abîmée par une coupure de courant
+                    break
+
+                if record.get("done"):
+                    self.entries.pop(record["image_id"], None)
+                else:
+                    self.entries[record["image_id"]] = (record["captured_at"], record["data"])
+
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def _compact(self) -> None:
+        with open(self.path + ".tmp", "w") as f:
+            for image_id, (captured_at, data) in self.entries.items():
+                f.write(json.dumps({"image_id": image_id, "captured_at": captured_at, "data": data}) + "\n")
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(self.path + ".tmp", self.path)
+        self.file = open(self.path, "a")
+        self.removed = 0
+
+    def _expire(self, now: float) -> None:
+        # Les entrées sont dans l'ordre de capture : seules les premières peuvent avoir expiré
+        while self.entries:
+            captured_at, _ = next(iter(self.entries.values()))
+
+            if now - captured_at <= self.ttl:
+                break
+
+            self.entries.popitem(last=False)
+            self.removed += 1
+            self.counts["expired"] += 1
+
+    def _write(self, record: dict) -> None:
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+        if time.monotonic() - self.last_sync >= self.sync_interval:
+            os.fsync(self.file.fileno())
+            self.last_sync = time.monotonic()
+
+    def _compact_if_needed(self) -> bool:
+        # Les lignes des images associées ou oubliées sont majoritaires : le fichier est réécrit
+        if self.removed <= max(1000, len(self.entries)):
+            return False
+
+        self.file.close()
+        self._compact()
+
+        return True
+
+    def put(self, image_id, data, captured_at: float) -> None:
+        """
+        Enregistre les données d'une image gardée dans la file.
+
+        :param image_id : Identifiant de l'image.
+        :param data : Données associées à l'image (sérialisables en JSON).
+        :param captured_at : Instant de capture (time.time()).
+        """
+
+        with self.lock:
+            self._expire(captured_at)
+
+            while len(self.entries) >= self.capacity:
+                self.entries.popitem(last=False)
+                self.removed += 1
+                self.counts["evicted"] += 1
+
+            self.entries[image_id] = (captured_at, data)
+            self.counts["stored"] += 1
+
+            if not self._compact_if_needed():
+                self._write({"image_id": image_id, "captured_at": captured_at, "data": data})
+
+    def pop(self, image_id):
+        """
+        :param image_id : Identifiant de l'image.
+
+        :return: Les données de l'image et son instant de capture, ou None si l'image n'a pas été gardée dans la file.
+        """
+
+        with self.lock:
+            self._expire(time.time())
+            entry = self.entries.pop(image_id, None)
+
+            if entry is None:
+                return None
+
+            self.counts["matched"] += 1
+            self.removed += 1
+
+            if not self._compact_if_needed():
+                self._write({"image_id": image_id, "done": True})
+
+            captured_at, data = entry
+
+            return data, captured_at
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"pending": len(self.entries), **self.counts}
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
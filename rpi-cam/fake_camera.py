@@ -0,0 +1,67 @@
+import io
+import time
+import numpy as np
+from PIL import Image
+
+
+class FakeCamera:
+    """
+    Caméra simulée avec l'interface de PiCamera utilisée par capture_img.py, pour tester la capture hors de la raspberry.
+
+    Quelques images JPEG synthétiques sont encodées à l'initialisation puis renvoyées en boucle (comme l'encodeur
+    matériel, l'encodage ne coûte rien au CPU). Le port vidéo produit les images au rythme de `framerate`, le port
+    photo ajoute `still_latency` secondes par image (changement de mode et exposition).
+    """
+
+    def __init__(self, resolution=(640, 640), framerate: float = 5, still_latency: float = 0.15, frames: int = 8):
+        """
+        :param resolution : Taille des images (largeur, hauteur).
+        :param framerate : Images par seconde du port vidéo.
+        :param still_latency : Durée (en s) d'une capture par le port photo.
+        :param frames : Nombre d'images synthétiques différentes.
+        """
+
+        self.resolution = resolution
+        self.framerate = framerate
+        self.still_latency = still_latency
+        self.closed = False
+
+        rng = np.random.default_rng(0)
+        self.images = []
+
+        for _ in range(frames):
+            stream = io.BytesIO()
+            pixels = rng.integers(0, 255, (resolution[1] // 8, resolution[0] // 8, 3), dtype=np.uint8)
+            Image.fromarray(pixels).resize(resolution, Image.BILINEAR).save(stream, format="jpeg")
+            self.images.append(stream.getvalue())
+
+        self.index = 0
+
+    def next_image(self) -> bytes:
+        image = self.images[self.index % len(self.images)]
+        self.index += 1
+
+        return image
+
+    def capture(self, output, format: str = "jpeg", use_video_port: bool = False) -> None:
+        time.sleep(1 / self.framerate if use_video_port else self.still_latency)
+        output.write(self.next_image())
+
+    def capture_sequence(self, outputs, format: str = "jpeg", use_video_port: bool = False) -> None:
+        next_frame = time.perf_counter()
+
+        for output in outputs:
+            if self.closed:
+                break
+
+            # Rythme régulier du capteur, indépendant du temps passé par l'appelant
+            next_frame += 1 / self.framerate if use_video_port else self.still_latency
+            delay = next_frame - time.perf_counter()
+
+            if delay > 0:
+                time.sleep(delay)
+
+            output.write(self.next_image())
+
+    def close(self) -> None:
+        self.closed = True
@@ -0,0 +1,316 @@
+import bisect
+import threading
+import time
+from collections import deque
+from math import atan2, cos, degrees, radians, sin, sqrt
+from typing import NamedTuple, Optional
+
+KNOTS_TO_KMH = 1.852
+
+
+class GpsFix(NamedTuple):
+    timestamp: float  # instant de réception (time.time()), comparable aux instants de capture des images
+    latitude: float
+    longitude: float
+    speed_kmh: Optional[float] = None
+    course: Optional[float] = None  # cap en degrés (0 = nord, sens horaire)
+    altitude: Optional[float] = None
+    utc: Optional[str] = None  # heure UTC de la trame (hhmmss.ss)
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Calcule la distance entre deux points GPS en utilisant la formule de Haversine.
+    Les coordonnées sont en degrés décimaux, la distance est en kilomètres.
+    """
+    R = 6371  # Rayon moyen de la Terre en km
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    return R * c
+
+
+def bearing(lat1, lon1, lat2, lon2):
+    """Cap en degrés du point 1 vers le point 2 (0 = nord, sens horaire)."""
+    dlon = radians(lon2 - lon1)
+    x = sin(dlon) * cos(radians(lat2))
+    y = cos(radians(lat1)) * sin(radians(lat2)) - sin(radians(lat1)) * cos(radians(lat2)) * cos(dlon)
+    return (degrees(atan2(x, y)) + 360) % 360
+
+
+def convert_gps_coordinate(value, direction):
+    """Convertit les coordonnées GPS NMEA (ddmm.mmmm / dddmm.mmmm) en degrés décimaux."""
+    if not value or not direction:
+        return None
+
+    try:
+        # Les minutes commencent deux chiffres avant le point
+        point = value.index('.') if '.' in value else len(value)
+        decimal = float(value[:point - 2]) + float(value[point - 2:]) / 60
+
+        if direction in ('S', 'W'):  # Sud ou Ouest implique une valeur négative
+            decimal = -decimal
+
+        return round(decimal, 7)
+    except ValueError:
+        return None
+
+
+def valid_checksum(sentence: str) -> bool:
+    """Vérifie la somme de contrôle d'une trame NMEA ($...*hh), les trames sans somme sont acceptées."""
+    if '*' not in sentence:
+        return True
+
+    body, checksum = sentence[1:].split('*', 1)
+    computed = 0
+
+    for char in body:
+        computed ^= ord(char)
+
+    try:
+        return computed == int(checksum[:2], 16)
+    except ValueError:
+        return False
+
+
+def parse_nmea(line: str) -> Optional[dict]:
+    """
+    Analyse une trame GGA ou RMC (tous systèmes : $GP, $GN, $GL...).
+
+    :return: Les champs de la position, ou None si la trame est invalide, sans position ou d'un autre type.
+    """
+    line = line.strip()
+
+    if not line.startswith('$') or not valid_checksum(line):
+        return None
+
+    fields = line.split('*')[0].split(',')
+    kind = fields[0][3:]
+
+    try:
+        if kind == "GGA" and len(fields) >= 10:
+            if fields[6] in ("", "0"):  # Pas de position
+                return None
+
+            return {
+                "utc": fields[1],
+                "latitude": convert_gps_coordinate(fields[2], fields[3]),
+                "longitude": convert_gps_coordinate(fields[4], fields[5]),
+                "altitude": float(fields[9]) if fields[9] else None
+            }
+
+        if kind == "RMC" and len(fields) >= 9:
+            if fields[2] != 'A':  # V : position invalide
+                return None
+
+            return {
+                "utc": fields[1],
+                "latitude": convert_gps_coordinate(fields[3], fields[4]),
+                "longitude": convert_gps_coordinate(fields[5], fields[6]),
+                "speed_kmh": float(fields[7]) * KNOTS_TO_KMH if fields[7] else None,
+                "course": float(fields[8]) if fields[8] else None
+            }
+    except ValueError:
+        return None
+
+    return None
+
+
+def interpolate_angle(a, b, ratio):
+    """Interpolation de deux caps par le plus court chemin."""
+    return (a + ((b - a + 180) % 360 - 180) * ratio) % 360
+
+
+class GpsReader(threading.Thread):
+    """
+    Lecture continue du module GPS dans un thread : les trames GGA et RMC d'une même seconde sont
+    fusionnées en une position, gardée dans un anneau indexé par instant de réception.
+
+    `fix_at(t)` interpole la position, la vitesse et le cap à l'instant de capture d'une image.
+    """
+
+    def __init__(self, open_source, capacity: int = 600, max_age: float = 2.0, retry_delay: float = 1.0):
+        """
+        :param open_source : Fonction qui ouvre la source de trames (objet avec readline(), ex. serial.Serial).
+        :param capacity : Nombre de positions conservées.
+        :param max_age : Âge maximal (en s) de la dernière position utilisée après elle.
+        :param retry_delay : Attente (en s) avant de rouvrir la source après une erreur.
+        """
+        super().__init__(name="gps", daemon=True)
+        self.open_source = open_source
+        self.max_age = max_age
+        self.retry_delay = retry_delay
+        self.fixes = deque(maxlen=capacity)
+        self.sentences = 0
+        self.ignored = 0  # trames invalides, sans position ou d'un autre type (GSV, VTG...)
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                source = self.open_source()
+
+                try:
+                    while not self.stopped.is_set():
+                        line = source.readline()
+
+                        if not line:
+                            # Fin d'un fichier rejoué, ou délai de lecture dépassé sur le port série
+                            if getattr(source, "eof", False):
+                                return
+                            continue
+
+                        self.feed(line.decode('ascii', errors='ignore') if isinstance(line, bytes) else line)
+                finally:
+                    source.close()
+            except Exception as e:
+                print(f"Erreur GPS: {e}")
+                self.stopped.wait(self.retry_delay)
+
+    def feed(self, line: str, received_at: float = None) -> None:
+        """Ajoute une trame NMEA (appelé par le thread, ou directement pour rejouer des trames)."""
+        if not line.strip():
+            return
+
+        fields = parse_nmea(line)
+        received_at = time.time() if received_at is None else received_at
+
+        with self.lock:
+            self.sentences += 1
+
+            if fields is None or fields["latitude"] is None or fields["longitude"] is None:
+                self.ignored += 1
+                return
+
+            last = self.fixes[-1] if self.fixes else None
+
+            if last is not None and last.utc == fields["utc"]:
+                # Même seconde : GGA et RMC complètent la même position
+                self.fixes[-1] = last._replace(**{key: value for key, value in fields.items() if value is not None})
+                return
+
+            fix = GpsFix(received_at, **fields)
+
+            if last is not None and fix.timestamp > last.timestamp:
+                # Sans RMC, vitesse et cap sont déduits de la position précédente
+                if fix.speed_kmh is None:
+                    distance = haversine(last.latitude, last.longitude, fix.latitude, fix.longitude)
+                    fix = fix._replace(speed_kmh=distance / (fix.timestamp - last.timestamp) * 3600)
+
+                if fix.course is None and (fix.latitude, fix.longitude) != (last.latitude, last.longitude):
+                    fix = fix._replace(course=bearing(last.latitude, last.longitude, fix.latitude, fix.longitude))
+
+            self.fixes.append(fix)
+
+    def latest(self) -> Optional[GpsFix]:
+        with self.lock:
+            return self.fixes[-1] if self.fixes else None
+
+    def fix_at(self, t: float) -> Optional[GpsFix]:
+        """
+        Position à l'instant t (time.time()), interpolée entre les deux positions qui l'encadrent.
+
+        :return: La position, ou None si aucune position n'est assez proche.
+        """
+        with self.lock:
+            fixes = list(self.fixes)
+
+        if not fixes or t < fixes[0].timestamp:
+            return None
+
+        index = bisect.bisect_right([fix.timestamp for fix in fixes], t)
+
+        if index == len(fixes):
+            last = fixes[-1]
+            return last._replace(timestamp=t) if t - last.timestamp <= self.max_age else None
+
+        before, after = fixes[index - 1], fixes[index]
+        ratio = (t - before.timestamp) / (after.timestamp - before.timestamp)
+
+        def lerp(a, b):
+            return a + (b - a) * ratio if a is not None and b is not None else (a if a is not None else b)
+
+        if before.course is not None and after.course is not None:
+            course = interpolate_angle(before.course, after.course, ratio)
+        else:
+            course = before.course if before.course is not None else after.course
+
+        return GpsFix(
+            t, lerp(before.latitude, after.latitude), lerp(before.longitude, after.longitude),
+            lerp(before.speed_kmh, after.speed_kmh), course, lerp(before.altitude, after.altitude), before.utc
+        )
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"sentences": self.sentences, "ignored": self.ignored, "fixes": len(self.fixes)}
+
+    def stop(self, timeout: float = None):
+        self.stopped.set()
+        self.join(timeout)
+
+
+class NmeaReplay:
+    """
+    Source de trames rejouées depuis un fichier NMEA enregistré, au rythme d'origine (heure UTC des trames).
+    Même interface que serial.Serial (readline, close) pour GpsReader.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False):
+        """
+        :param path : Fichier NMEA (une trame par ligne, ex. `cat /dev/serial0 > trajet.nmea`).
+        :param speed : Vitesse de relecture.
+        :param loop : Recommence au début à la fin du fichier.
+        """
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.file = open(path, 'r', errors='ignore')
+        self.eof = False
+        self.start = None  # (instant local, secondes UTC) de la première trame datée
+
+    def readline(self) -> str:
+        line = self.file.readline()
+
+        if not line:
+            if not self.loop:
+                self.eof = True
+                return ""
+
+            self.file.seek(0)
+            self.start = None
+            line = self.file.readline()
+
+        fields = line.split(',')
+
+        if len(fields) > 1 and fields[0][3:] in ("GGA", "RMC") and len(fields[1]) >= 6:
+            try:
+                utc = int(fields[1][:2]) * 3600 + int(fields[1][2:4]) * 60 + float(fields[1][4:])
+            except ValueError:
+                return line
+
+            if self.start is None:
+                self.start = (time.perf_counter(), utc)
+
+            # Passage de minuit : l'heure UTC repart de 0
+            elapsed = (utc - self.start[1]) % 86400
+            delay = self.start[0] + elapsed / self.speed - time.perf_counter()
+
+            if delay > 0:
+                time.sleep(delay)
+
+        return line
+
+    def close(self):
+        self.file.close()
+
+
+def open_serial(port: str, baudrate: int = 9600):
+    """Ouvre le port série du GPS, ou un pty pour les tests (ex. `socat -d -d pty,raw,echo=0 pty,raw,echo=0`)."""
+    import serial
+
+    return serial.Serial(port, baudrate, timeout=1)
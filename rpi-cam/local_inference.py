@@ -0,0 +1,103 @@
+import os
+import sys
+import threading
+import time
+
+# Ajout des dossiers yolo (moteurs d'inférence) et parent (module common)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "yolo")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from backends import create_backend
+from common.preprocessing import decode_jpeg
+
+
+class LocalInference(threading.Thread):
+    """
+    Inférence sur la raspberry, dans un thread, avec les moteurs du service MQTT (yolo/backends.py).
+
+    Le thread traite toujours l'image la plus récente : si le modèle est plus lent que la caméra, l'image
+    en attente est remplacée par la suivante (et comptée) au lieu d'accumuler du retard. Les détections
+    sont dans le repère de l'image envoyée par la caméra, comme celles du service MQTT.
+    """
+
+    def __init__(self, on_result, backend: str, model_path: str, warmup: int = 3, **kwargs):
+        """
+        :param on_result : Fonction appelée avec (image_id, détections, durées en ms) pour chaque image traitée.
+        :param backend : Moteur d'inférence (onnxruntime, openvino ou ultralytics, qui charge aussi les modèles NCNN).
+        :param model_path : Chemin du modèle (ex. ../yolo/saved/yolo11n_trained.onnx).
+        :param warmup : Nombre d'inférences de préchauffage.
+        :param kwargs : Paramètres du moteur (image_size, conf, iou, cache_dir).
+        """
+
+        super().__init__(name="inference", daemon=True)
+        self.on_result = on_result
+        self.backend = create_backend(backend, model_path, **kwargs)
+        self.backend.load()
+        self.backend.warmup(warmup)
+        self.pending = None  # (image_id, octets JPEG) de la prochaine image
+        self.counts = {"submitted": 0, "processed": 0, "dropped": 0, "errors": 0}
+        self.condition = threading.Condition()
+        self.stopped = False
+
+    def submit(self, image_id, data: bytes) -> int:
+        """
+        Confie une image au thread d'inférence.
+
+        :param image_id : Identifiant de l'image (celui des résultats).
+        :param data : Image JPEG (copiée par l'appelant si le tampon est réutilisé).
+
+        :return: Le nombre d'images confiées depuis le démarrage.
+        """
+
+        with self.condition:
+            if self.pending is not None:
+                # L'image précédente n'a pas été traitée à temps
+                self.counts["dropped"] += 1
+
+            self.pending = (image_id, data)
+            self.counts["submitted"] += 1
+            self.condition.notify()
+
+            return self.counts["submitted"]
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending is not None or self.stopped)
+
+                if self.stopped:
+                    return
+
+                (image_id, data), self.pending = self.pending, None
+
+            try:
+                start = time.perf_counter()
+                # Décodage JPEG réduit (domaine DCT) si l'image est plus grande que l'entrée du modèle
+                image, scale = decode_jpeg(data, self.backend.image_size)
+                timings = {"decode": (time.perf_counter() - start) * 1000}
+                detections, backend_timings = self.backend.predict([image])
+                timings.update(backend_timings)
+                detections = detections[0]
+
+                if scale != 1:
+                    # Retour au repère de l'image envoyée par la caméra
+                    for detection in detections:
+                        detection["bbox"] = [coord / scale for coord in detection["bbox"]]
+            except Exception as e:
+                print(f"Erreur d'inférence ({image_id}) : {e}")
+                self.counts["errors"] += 1
+                continue
+
+            self.counts["processed"] += 1
+            self.on_result(image_id, detections, timings)
+
+    def stats(self) -> dict:
+        with self.condition:
+            return dict(self.counts)
+
+    def stop(self, timeout: float = None) -> None:
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+        if self.is_alive():
+            self.join(timeout)
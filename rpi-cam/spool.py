@@ -0,0 +1,504 @@
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Optional, Tuple
+
+import paho.mqtt.client as mqtt
+
+# En-tête d'un message : crc32 (topic + message), taille du topic, taille du message
+RECORD_HEADER = struct.Struct(">IHI")
+SEGMENT_SUFFIX = ".seg"
+CURSOR_FILE = "cursor"
+SEQUENCE_FILE = "sequence"
+
+
+class Segment:
+    def __init__(self, number: int, path: str, size: int = 0, records: int = 0):
+        self.number = number
+        self.path = path
+        self.size = size
+        self.records = records
+
+
+def read_record(f) -> Optional[Tuple[str, bytes]]:
+    """
+    :param f : Segment ouvert en lecture, positionné au début d'un message.
+
+    :return: Le message (topic, message), ou None s'il est incomplet ou corrompu.
+    """
+
+    header = f.read(RECORD_HEADER.size)
+
+    if len(header) < RECORD_HEADER.size:
+        return None
+
+    crc, topic_size, payload_size = RECORD_HEADER.unpack(header)
+    body = f.read(topic_size + payload_size)
+
+    if len(body) < topic_size + payload_size or zlib.crc32(body) != crc:
+        return None
+
+    try:
+        return body[:topic_size].decode(), body[topic_size:]
+    except UnicodeDecodeError:
+        return None
+
+
+def record_size(topic: str, payload: bytes) -> int:
+    return RECORD_HEADER.size + len(topic.encode()) + len(payload)
+
+
+def scan_segment(path: str) -> Tuple[int, int]:
+    """
+    Parcourt un segment jusqu'au premier message incomplet ou corrompu (coupure de courant pendant l'écriture).
+
+    :param path : Fichier du segment.
+
+    :return: La taille valide du segment et son nombre de messages.
+    """
+
+    offset = records = 0
+
+    with open(path, "rb") as f:
+        while True:
+            record = read_record(f)
+
+            if record is None:
+                break
+
+            offset += record_size(*record)
+            records += 1
+
+    return offset, records
+
+
+class Spool:
+    """
+    File de messages sur disque, en segments ajoutés à la suite et jamais réécrits.
+
+    Un segment plein est synchronisé (fsync) puis fermé : une coupure de courant ne peut abîmer que la fin
+    du dernier segment, tronquée au dernier message valide au redémarrage. Au-delà de `max_size` octets
+    les segments les plus anciens sont supprimés. La position de lecture est enregistrée dans un fichier
+    remplacé atomiquement : après une coupure, au plus `sync_interval` secondes de messages sont renvoyées.
+    """
+
+    def __init__(self, directory: str, max_size: int = 256 * 2 ** 20, segment_size: int = 4 * 2 ** 20, sync_interval: float = 1.0):
+        """
+        :param directory : Dossier des segments (sur la carte SD ou une clé USB).
+        :param max_size : Taille maximale de la file (en octets).
+        :param segment_size : Taille d'un segment (en octets).
+        :param sync_interval : Intervalle (en s) entre deux synchronisations du segment en cours et de la position de lecture.
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_size = max(max_size, 2 * segment_size)
+        self.segment_size = segment_size
+        self.sync_interval = sync_interval
+        self.segments = deque()  # du plus ancien au segment en cours d'écriture
+        self.writer = None
+        self.reader = None  # (numéro du segment, fichier)
+        self.read_offset = 0  # position de lecture dans le plus ancien segment
+        self.read_records = 0
+        self.last_read = None  # (numéro du segment, position, taille) du dernier message lu par `peek`
+        self.next_number = 0  # numéro du prochain segment, toujours croissant (comparé à la position de lecture)
+        self.last_sync = time.monotonic()
+        self.counts = {"appended": 0, "drained": 0, "evicted": 0, "skipped": 0, "recovered": 0, "truncated_bytes": 0}
+        self.lock = threading.Lock()
+        self._recover()
+
+    def _path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{number:010d}{SEGMENT_SUFFIX}")
+
+    def _recover(self) -> None:
+        numbers = sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+        cursor = (0, 0, 0)
+
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE)) as f:
+                cursor = tuple(int(value) for value in f.read().split())
+        except (OSError, ValueError):
+            pass
+
+        if len(cursor) != 3:
+            cursor = (0, 0, 0)
+
+        self.next_number = max(numbers + [cursor[0] - 1]) + 1
+
+        for number in numbers:
+            path = self._path(number)
+
+            if number < cursor[0]:
+                # Segment entièrement envoyé avant la coupure
+                os.remove(path)
+                continue
+
+            size, records = scan_segment(path)
+            truncated = os.path.getsize(path) - size
+
+            if truncated:
+                os.truncate(path, size)
+                self.counts["truncated_bytes"] += truncated
+
+            if records:
+                self.segments.append(Segment(number, path, size, records))
+            else:
+                os.remove(path)
+
+        if self.segments and self.segments[0].number == cursor[0] and cursor[1] <= self.segments[0].size and cursor[2] <= self.segments[0].records:
+            self.read_offset, self.read_records = cursor[1], cursor[2]
+
+        self.counts["recovered"] = len(self)
+
+    def _sync_directory(self) -> None:
+        fd = os.open(self.directory, os.O_RDONLY)
+
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _roll(self) -> None:
+        # Le segment plein est synchronisé avant d'écrire dans le suivant
+        if self.writer is not None:
+            self.writer.flush()
+            os.fsync(self.writer.fileno())
+            self.writer.close()
+
+        number = self.next_number
+        self.next_number += 1
+        self.writer = open(self._path(number), "ab")
+        self.segments.append(Segment(number, self._path(number)))
+        self._sync_directory()
+
+    def _save_cursor(self) -> None:
+        if not self.segments:
+            return
+
+        path = os.path.join(self.directory, CURSOR_FILE)
+
+        with open(path + ".tmp", "w") as f:
+            f.write(f"{self.segments[0].number} {self.read_offset} {self.read_records}")
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(path + ".tmp", path)
+
+    def _sync(self, force: bool = False) -> None:
+        if not force and time.monotonic() - self.last_sync < self.sync_interval:
+            return
+
+        if self.writer is not None:
+            os.fsync(self.writer.fileno())
+
+        self._save_cursor()
+        self.last_sync = time.monotonic()
+
+    def _drop_oldest(self) -> None:
+        segment = self.segments.popleft()
+
+        if self.reader is not None and self.reader[0] == segment.number:
+            self.reader[1].close()
+            self.reader = None
+
+        os.remove(segment.path)
+        self.read_offset = self.read_records = 0
+
+    def append(self, topic: str, payload: bytes) -> None:
+        """
+        Ajoute un message à la fin de la file.
+
+        :param topic : Topic MQTT du message.
+        :param payload : Message.
+        """
+
+        body = topic.encode() + payload
+        record = RECORD_HEADER.pack(zlib.crc32(body), len(topic.encode()), len(payload)) + body
+
+        with self.lock:
+            # Un segment est toujours créé au démarrage : les segments récupérés ne sont jamais réécrits
+            if self.writer is None or (self.segments[-1].size and self.segments[-1].size + len(record) > self.segment_size):
+                self._roll()
+
+            self.writer.write(record)
+            self.writer.flush()
+            self.segments[-1].size += len(record)
+            self.segments[-1].records += 1
+            self.counts["appended"] += 1
+
+            # Les plus anciens messages sont supprimés au-delà de la taille maximale
+            while sum(segment.size for segment in self.segments) > self.max_size and len(self.segments) > 1:
+                self.counts["evicted"] += self.segments[0].records - self.read_records
+                self._drop_oldest()
+
+            self._sync()
+
+    def peek(self) -> Optional[Tuple[str, bytes]]:
+        """
+        Un message illisible (position de lecture erronée, fichier abîmé) est sauté avec le reste de son segment.
+
+        :return: Le plus ancien message (topic, message) sans le retirer de la file, ou None si la file est vide.
+        """
+
+        with self.lock:
+            while self.segments:
+                segment = self.segments[0]
+
+                if self.read_records < segment.records:
+                    if self.reader is None or self.reader[0] != segment.number:
+                        if self.reader is not None:
+                            self.reader[1].close()
+
+                        self.reader = (segment.number, open(segment.path, "rb"))
+
+                    f = self.reader[1]
+                    f.seek(self.read_offset)
+                    record = read_record(f)
+
+                    if record is None:
+                        self.counts["skipped"] += segment.records - self.read_records
+                        self.read_offset, self.read_records = segment.size, segment.records
+                        self._save_cursor()
+                        continue
+
+                    topic, payload = record
+                    self.last_read = (segment.number, self.read_offset, record_size(topic, payload))
+
+                    return topic, payload
+
+                if len(self.segments) == 1:
+                    # Segment en cours d'écriture entièrement lu
+                    return None
+
+                # Segment entièrement envoyé
+                self._drop_oldest()
+                self._save_cursor()
+
+            return None
+
+    def advance(self) -> None:
+        """
+        Retire de la file le message renvoyé par `peek`, une fois envoyé. Rien n'est retiré si ce message
+        a été supprimé entre-temps (segment évincé par `append` au-delà de la taille maximale).
+        """
+
+        with self.lock:
+            last_read, self.last_read = self.last_read, None
+
+            if last_read is None or not self.segments or last_read[:2] != (self.segments[0].number, self.read_offset):
+                return
+
+            self.read_offset += last_read[2]
+            self.read_records += 1
+            self.counts["drained"] += 1
+            self._sync()
+
+    def __len__(self) -> int:
+        return sum(segment.records for segment in self.segments) - self.read_records
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "pending": len(self),
+                "bytes": sum(segment.size for segment in self.segments) - self.read_offset,
+                "segments": len(self.segments),
+                **self.counts
+            }
+
+    def close(self) -> None:
+        with self.lock:
+            self._sync(force=True)
+
+            if self.writer is not None:
+                self.writer.close()
+
+            if self.reader is not None:
+                self.reader[1].close()
+
+
+class SequenceOffset:
+    """
+    Décalage des numéros de séquence de la caméra, qui repartent de 0 à chaque démarrage : les identifiants
+    d'image restent uniques d'un démarrage à l'autre, et le résultat d'une image de la file envoyée après
+    une coupure de courant n'est pas confondu avec celui d'une nouvelle image.
+
+    Les numéros sont réservés par blocs de `block` : le fichier n'est réécrit (atomiquement) qu'une fois
+    par bloc, et au démarrage la numérotation reprend après le dernier bloc réservé.
+    """
+
+    def __init__(self, directory: str, block: int = 10_000):
+        """
+        :param directory : Dossier du fichier de numérotation (celui de la file).
+        :param block : Nombre de numéros réservés à chaque écriture du fichier.
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, SEQUENCE_FILE)
+        self.block = block
+
+        try:
+            with open(self.path) as f:
+                self.base = int(f.read())
+        except (OSError, ValueError):
+            self.base = 0
+
+        self.reserved = self.base
+
+    def apply(self, sequence: int) -> int:
+        """
+        :param sequence : Numéro de séquence de la caméra depuis le démarrage.
+
+        :return: Le numéro de séquence unique (32 bits, comme dans l'en-tête des trames).
+        """
+
+        value = self.base + sequence
+
+        if value >= self.reserved:
+            self.reserved = value + self.block
+
+            with open(self.path + ".tmp", "w") as f:
+                f.write(str(self.reserved))
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(self.path + ".tmp", self.path)
+
+        return value % 2 ** 32
+
+
+class SpoolPublisher:
+    """
+    Envoi MQTT qui passe par la file sur disque quand le broker est injoignable.
+
+    Les images en direct sont publiées immédiatement. Après la reconnexion, un thread vide la file au
+    débit `drain_rate`, un message à la fois et seulement quand aucune image en direct n'est en attente
+    d'envoi : le retard accumulé ne retarde pas les nouvelles images. Un message de la file n'en est
+    retiré qu'une fois son envoi confirmé (QoS 1 : au moins une fois).
+    """
+
+    def __init__(self, client: mqtt.Client, spool: Spool, topic_settings: dict = None, drain_rate: float = 200_000,
+                 retry_delay: float = 1.0):
+        """
+        :param client : Client MQTT (boucle réseau démarrée par loop_start).
+        :param spool : File sur disque.
+        :param topic_settings : QoS et retain par topic ({topic: {"qos": 1, "retain": False}}).
+        :param drain_rate : Débit maximal (en octets/s) du vidage de la file.
+        :param retry_delay : Attente (en s) après une erreur du vidage de la file.
+        """
+
+        self.client = client
+        self.spool = spool
+        self.topic_settings = topic_settings or {}
+        self.drain_rate = drain_rate
+        self.retry_delay = retry_delay
+        self.connected = threading.Event()
+        self.live = deque()  # envois en direct non confirmés
+        self.counts = {"live": 0, "spooled": 0}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.drain, name="spool", daemon=True)
+
+    def settings(self, topic: str) -> dict:
+        return {"qos": 1, "retain": False, **self.topic_settings.get(topic, {})}
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            self.connected.set()
+
+    def on_disconnect(self, client, userdata, rc):
+        self.connected.clear()
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def publish(self, topic: str, payload: bytes) -> bool:
+        """
+        Publie un message, ou l'ajoute à la file sur disque si le broker est injoignable.
+
+        :param topic : Topic MQTT.
+        :param payload : Message.
+
+        :return: True si le message est publié en direct, False s'il est gardé dans la file.
+        """
+
+        if self.connected.is_set():
+            info = self.client.publish(topic, payload, **self.settings(topic))
+
+            if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                with self.lock:
+                    self.live.append(info)
+                    self.counts["live"] += 1
+                return True
+
+        self.spool.append(topic, payload.encode() if isinstance(payload, str) else bytes(payload))
+
+        with self.lock:
+            self.counts["spooled"] += 1
+
+        return False
+
+    def live_pending(self) -> bool:
+        with self.lock:
+            while self.live and self.live[0].is_published():
+                self.live.popleft()
+
+            return bool(self.live)
+
+    def drain(self) -> None:
+        while not self.stopped.is_set():
+            try:
+                self.drain_one()
+            except Exception as e:
+                # Le thread continue : sans lui la file ne serait plus jamais vidée
+                print(f"Erreur lors du vidage de la file : {e}")
+                self.stopped.wait(self.retry_delay)
+
+    def drain_one(self) -> None:
+        """Envoie le plus ancien message de la file, si le broker est joignable et qu'aucune image en direct n'attend."""
+        if not self.connected.is_set() or self.live_pending():
+            self.stopped.wait(0.05)
+            return
+
+        record = self.spool.peek()
+
+        if record is None:
+            self.stopped.wait(0.2)
+            return
+
+        topic, payload = record
+        started = time.monotonic()
+
+        try:
+            info = self.client.publish(topic, payload, **self.settings(topic))
+        except ValueError as e:
+            # Message refusé par paho (topic invalide, message trop grand) : il ne sera jamais envoyé
+            print(f"Message de la file ignoré ({topic}) : {e}")
+            self.spool.advance()
+            return
+
+        # Attente de la confirmation du broker (déconnexion : le message reste dans la file)
+        while info.rc == mqtt.MQTT_ERR_SUCCESS and not info.is_published() and self.connected.is_set() and not self.stopped.is_set():
+            self.stopped.wait(0.01)
+
+        if info.rc == mqtt.MQTT_ERR_SUCCESS and info.is_published():
+            self.spool.advance()
+
+        # Limitation du débit
+        self.stopped.wait(max(0.0, len(payload) / self.drain_rate - (time.monotonic() - started)))
+
+    def stats(self) -> dict:
+        with self.lock:
+            counts = dict(self.counts)
+
+        return {**counts, "connected": self.connected.is_set(), "spool": self.spool.stats()}
+
+    def stop(self, timeout: float = None) -> None:
+        self.stopped.set()
+
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+
+        self.spool.close()
@@ -0,0 +1,155 @@
+import io
+import threading
+import time
+from typing import NamedTuple, Optional
+
+
+class CapturedFrame(NamedTuple):
+    slot: int
+    sequence: int
+    timestamp: float
+    data: memoryview
+
+
+class FrameRing:
+    """
+    Anneau de quelques tampons JPEG réutilisés entre le thread de capture et le thread d'envoi.
+
+    Le lecteur prend toujours l'image la plus récente : si l'envoi est plus lent que la caméra, les images
+    intermédiaires sont écrasées (et comptées) au lieu de ralentir la capture. Un tampon en cours de lecture
+    n'est jamais réécrit.
+    """
+
+    def __init__(self, size: int = 4):
+        """
+        :param size : Nombre de tampons (au moins 3 : un en écriture, un en lecture et la dernière image).
+        """
+
+        self.buffers = [io.BytesIO() for _ in range(max(3, size))]
+        self.sequences = [None] * len(self.buffers)  # numéro de l'image de chaque tampon (None : vide)
+        self.timestamps = [0.0] * len(self.buffers)
+        self.reading = None
+        self.latest = None  # tampon de l'image la plus récente non lue
+        self.captured = 0
+        self.dropped = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def acquire_write(self) -> io.BytesIO:
+        """
+        :return: Le tampon de la prochaine image, vidé (le plus ancien qui n'est pas en cours de lecture).
+        """
+
+        with self.condition:
+            slot = min(
+                (index for index in range(len(self.buffers)) if index != self.reading and index != self.latest),
+                key=lambda index: -1 if self.sequences[index] is None else self.sequences[index]
+            )
+            self.sequences[slot] = None
+
+        buffer = self.buffers[slot]
+        buffer.seek(0)
+        buffer.truncate()
+
+        return buffer
+
+    def commit(self, buffer: io.BytesIO, timestamp: float) -> None:
+        """
+        Publie une image écrite dans un tampon de `acquire_write`.
+
+        :param buffer : Le tampon.
+        :param timestamp : Instant de capture (time.time()).
+        """
+
+        slot = self.buffers.index(buffer)
+
+        with self.condition:
+            if self.latest is not None:
+                # L'image précédente n'a pas été lue à temps
+                self.dropped += 1
+
+            self.sequences[slot] = self.captured
+            self.timestamps[slot] = timestamp
+            self.latest = slot
+            self.captured += 1
+            self.condition.notify()
+
+    def acquire_read(self, timeout: Optional[float] = None) -> Optional[CapturedFrame]:
+        """
+        Attend l'image la plus récente. Elle doit être rendue avec `release` une fois envoyée.
+
+        :param timeout : Attente maximale (en s).
+
+        :return: L'image (memoryview sur le tampon, sans copie), ou None si l'anneau est fermé ou après `timeout`.
+        """
+
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.latest is not None or self.closed, timeout) or self.latest is None:
+                return None
+
+            slot, self.latest = self.latest, None
+            self.reading = slot
+
+            return CapturedFrame(slot, self.sequences[slot], self.timestamps[slot], self.buffers[slot].getbuffer())
+
+    def release(self, frame: CapturedFrame) -> None:
+        frame.data.release()
+
+        with self.condition:
+            self.reading = None
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {"captured": self.captured, "dropped": self.dropped}
+
+
+class VideoCaptureThread(threading.Thread):
+    """
+    Capture JPEG continue par le port vidéo de la caméra dans un thread dédié.
+
+    Contrairement à `camera.capture` (port photo) suivi d'un `sleep`, la caméra reste en mode vidéo et
+    produit les images au rythme de `camera.framerate`, sans changement de mode entre deux images.
+    """
+
+    def __init__(self, camera, ring: FrameRing):
+        """
+        :param camera : Caméra (PiCamera ou FakeCamera).
+        :param ring : Anneau des tampons partagé avec le thread d'envoi.
+        """
+
+        super().__init__(name="capture", daemon=True)
+        self.camera = camera
+        self.ring = ring
+        self.stopped = threading.Event()
+        self.error = None
+
+    def outputs(self):
+        # capture_sequence demande le tampon suivant une fois l'image précédente entièrement écrite
+        previous = None
+
+        while not self.stopped.is_set():
+            if previous is not None:
+                self.ring.commit(previous, time.time())
+
+            previous = self.ring.acquire_write()
+            yield previous
+
+        if previous is not None and previous.tell():
+            self.ring.commit(previous, time.time())
+
+    def run(self) -> None:
+        try:
+            self.camera.capture_sequence(self.outputs(), format="jpeg", use_video_port=True)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.ring.close()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self.stopped.set()
+        self.join(timeout)
@@ -0,0 +1,399 @@
+import hashlib
+import logging
+import os
+import platform
+import sys
+import time
+from typing import List, Tuple
+import numpy as np
+from PIL import Image
+from boxes import nms, xyxy_to_xywh
+
+# Ajout du dossier parent pour accéder au module common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.preprocessing import letterbox_into, unletterbox_boxes
+
+
+class InferenceBackend:
+    """
+    Interface commune des moteurs d'inférence du service MQTT.
+
+    Chaque moteur charge son modèle, le préchauffe puis enchaîne prétraitement, inférence et
+    post-traitement. Les détections sont toujours renvoyées sous forme de dictionnaires
+    {"category_id", "bbox" (COCO [x, y, largeur, hauteur] dans le repère de l'image d'origine), "score"}.
+    """
+
+    def __init__(self, model_path: str, device="cpu", image_size: int = 640, conf: float = 0.25, iou: float = 0.7, cache_dir: str = None,
+                 threads: int = None):
+        """
+        :param model_path : Chemin du modèle.
+        :param device : Périphérique d'inférence (cpu, 0 pour le GPU...).
+        :param image_size : Taille de l'image d'entrée du modèle.
+        :param conf : Score minimal d'une détection.
+        :param iou : Seuil d'IoU de la suppression des non-maxima.
+        :param cache_dir : Dossier des modèles optimisés / compilés (pas de cache si None).
+        :param threads : Nombre de threads de calcul sur CPU (choix du moteur, en général un par cœur, si None).
+        """
+
+        self.model_path = model_path
+        self.device = device
+        self.image_size = image_size
+        self.conf = conf
+        self.iou = iou
+        self.cache_dir = cache_dir
+        self.threads = threads
+
+    def model_key(self) -> str:
+        """
+        Clé du modèle dans le cache : empreinte du fichier (ou du dossier) du modèle, du périphérique
+        et de l'architecture de la machine.
+
+        :return: La clé.
+        """
+
+        digest = hashlib.sha256(f"{self.device}:{platform.machine()}".encode())
+
+        if os.path.isdir(self.model_path):
+            paths = [os.path.join(root, name) for root, _, names in os.walk(self.model_path) for name in names]
+        else:
+            paths = [self.model_path]
+
+        for path in sorted(paths):
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+
+        return digest.hexdigest()[:16]
+
+    def cache_path(self, kind: str, suffix: str) -> str:
+        """
+        Chemin d'un fichier du cache pour ce modèle.
+
+        :param kind : Type d'artefact (nom du moteur).
+        :param suffix : Extension du fichier.
+
+        :return: Le chemin, ou None si le cache est désactivé.
+        """
+
+        if self.cache_dir is None:
+            return None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        name = os.path.splitext(os.path.basename(os.path.normpath(self.model_path)))[0]
+
+        return os.path.join(self.cache_dir, f"{name}-{kind}-{self.model_key()}{suffix}")
+
+    def load(self) -> None:
+        """
+        Charge le modèle (les dépendances du moteur ne sont importées qu'ici).
+        """
+
+        raise NotImplementedError
+
+    def warmup(self, iterations: int = 1, batch_size: int = 1) -> None:
+        """
+        Préchauffe le modèle sur des images synthétiques.
+
+        :param iterations : Nombre d'inférences de préchauffage.
+        :param batch_size : Taille des lots de préchauffage.
+        """
+
+        image = Image.new("RGB", (self.image_size, self.image_size), (114, 114, 114))
+
+        for _ in range(iterations):
+            self.predict([image] * batch_size)
+
+    def preprocess(self, images: List[Image.Image]) -> Tuple[object, list]:
+        """
+        Prépare un lot d'images pour le modèle.
+
+        :param images : Images RGB.
+
+        :return: Le lot prêt pour `infer` et les informations nécessaires au post-traitement.
+        """
+
+        raise NotImplementedError
+
+    def infer(self, batch):
+        """
+        Lance l'inférence sur un lot préparé.
+
+        :param batch : Lot renvoyé par `preprocess`.
+
+        :return: Les sorties brutes du modèle.
+        """
+
+        raise NotImplementedError
+
+    def postprocess(self, outputs, metas: list) -> List[List[dict]]:
+        """
+        Convertit les sorties brutes du modèle en détections.
+
+        :param outputs : Sorties renvoyées par `infer`.
+        :param metas : Informations renvoyées par `preprocess`.
+
+        :return: Les détections de chaque image.
+        """
+
+        raise NotImplementedError
+
+    def predict(self, images: List[Image.Image]) -> Tuple[List[List[dict]], dict]:
+        """
+        Prédit un lot d'images.
+
+        :param images : Images RGB.
+
+        :return: Les détections de chaque image et le temps moyen par image (en ms) de chaque étape.
+        """
+
+        start = time.perf_counter()
+        batch, metas = self.preprocess(images)
+        preprocessed = time.perf_counter()
+        outputs = self.infer(batch)
+        inferred = time.perf_counter()
+        detections = self.postprocess(outputs, metas)
+        end = time.perf_counter()
+
+        count = max(1, len(images))
+        timings = {
+            "preprocess": (preprocessed - start) * 1000 / count,
+            "inference": (inferred - preprocessed) * 1000 / count,
+            "postprocess": (end - inferred) * 1000 / count
+        }
+
+        return detections, timings
+
+
+class UltralyticsBackend(InferenceBackend):
+    """
+    Moteur Ultralytics : modèles .pt et exports lus par `YOLO` (dossiers OpenVINO et NCNN, .tflite, .onnx).
+    """
+
+    def load(self) -> None:
+        from ultralytics import YOLO
+
+        if self.threads:
+            import torch
+
+            torch.set_num_threads(self.threads)
+
+        self.model = YOLO(self.model_path, task="detect")
+
+    def preprocess(self, images: List[Image.Image]) -> Tuple[object, list]:
+        # Ultralytics fait son propre prétraitement
+        return images, None
+
+    def infer(self, batch):
+        return self.model.predict(batch, device=self.device, imgsz=self.image_size, conf=self.conf, iou=self.iou, verbose=False)
+
+    def postprocess(self, outputs, metas: list) -> List[List[dict]]:
+        detections = []
+
+        for result in outputs:
+            image_detections = []
+
+            if result.boxes:
+                for cls, conf, xyxy in zip(result.boxes.cls.tolist(), result.boxes.conf.tolist(), result.boxes.xyxy.tolist()):
+                    image_detections.append({
+                        "category_id": int(cls),
+                        "bbox": xyxy_to_xywh(xyxy),
+                        "score": conf
+                    })
+
+            detections.append(image_detections)
+
+        return detections
+
+    def predict(self, images: List[Image.Image]) -> Tuple[List[List[dict]], dict]:
+        results = self.infer(images)
+
+        return self.postprocess(results, None), dict(results[0].speed)
+
+
+class RawYoloBackend(InferenceBackend):
+    """
+    Base des moteurs qui exécutent directement un export YOLOv8 / YOLO11 (sortie (N, 4 + classes, ancres)) :
+    le letterbox, le décodage des sorties et la suppression des non-maxima sont faits ici.
+    """
+
+    padded = None
+    input = None
+    input_dtype = np.float32
+    fixed_batch = None
+
+    def preprocess(self, images: List[Image.Image]) -> Tuple[object, list]:
+        count = len(images)
+
+        # Tampons réutilisés d'un lot à l'autre (agrandis si le lot est plus grand)
+        if self.padded is None or len(self.padded) < count:
+            self.padded = np.empty((count, self.image_size, self.image_size, 3), dtype=np.uint8)
+            self.input = np.empty((count, 3, self.image_size, self.image_size), dtype=self.input_dtype)
+
+        metas = [letterbox_into(image, self.padded[i]) for i, image in enumerate(images)]
+        np.divide(self.padded[:count].transpose(0, 3, 1, 2), 255, out=self.input[:count], casting="unsafe")
+
+        return self.input[:count], metas
+
+    def infer(self, batch):
+        # Un export à taille de lot fixe (souvent 1) impose d'inférer les images une par une
+        if self.fixed_batch is not None and self.fixed_batch != len(batch):
+            return np.concatenate([self.run(batch[i:i + 1]) for i in range(len(batch))])
+
+        return self.run(batch)
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Exécute le modèle sur un lot de la taille attendue.
+
+        :param batch : Lot (N, 3, H, W).
+
+        :return: La sortie (N, 4 + classes, ancres).
+        """
+
+        raise NotImplementedError
+
+    def postprocess(self, outputs, metas: list) -> List[List[dict]]:
+        detections = []
+
+        for output, meta in zip(outputs.astype(np.float32), metas):
+            predictions = output.T
+            class_scores = predictions[:, 4:]
+            classes = class_scores.argmax(axis=1)
+            scores = class_scores[np.arange(len(classes)), classes]
+
+            mask = scores > self.conf
+            predictions, classes, scores = predictions[mask], classes[mask], scores[mask]
+
+            # (cx, cy, w, h) -> (x1, y1, x2, y2)
+            boxes = np.empty((len(predictions), 4), dtype=np.float32)
+            boxes[:, :2] = predictions[:, :2] - predictions[:, 2:4] / 2
+            boxes[:, 2:] = predictions[:, :2] + predictions[:, 2:4] / 2
+
+            keep = nms(boxes, scores, classes, self.iou)
+            boxes, classes, scores = boxes[keep], classes[keep], scores[keep]
+
+            # Retour dans le repère de l'image d'origine
+            unletterbox_boxes(boxes, meta)
+
+            detections.append([
+                {"category_id": int(cls), "bbox": xyxy_to_xywh(box), "score": float(score)}
+                for box, cls, score in zip(boxes, classes, scores)
+            ])
+
+        return detections
+
+
+class OnnxRuntimeBackend(RawYoloBackend):
+    """
+    Moteur ONNX Runtime sur CPU. Avec `cache_dir`, le graphe optimisé est enregistré au premier
+    lancement puis rechargé sans refaire les optimisations.
+    """
+
+    def load(self) -> None:
+        import onnxruntime as ort
+
+        optimized_path = self.cache_path("onnxruntime", ".onnx")
+        session = None
+
+        if optimized_path is not None and os.path.exists(optimized_path):
+            options = self.session_options(ort)
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+
+            try:
+                session = ort.InferenceSession(optimized_path, options, providers=["CPUExecutionProvider"])
+            except Exception as e:
+                logging.warning(f"Modèle optimisé en cache illisible, il est recréé : {e}")
+                os.remove(optimized_path)
+
+        if session is None:
+            options = self.session_options(ort)
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+            if optimized_path is not None:
+                options.optimized_model_filepath = optimized_path
+
+            session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+
+        self.session = session
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_dtype = np.float16 if model_input.type == "tensor(float16)" else np.float32
+        self.fixed_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+
+        if isinstance(model_input.shape[2], int):
+            self.image_size = model_input.shape[2]
+
+    def session_options(self, ort):
+        options = ort.SessionOptions()
+
+        if self.threads:
+            # Pool de threads propre à ONNX Runtime (OMP_NUM_THREADS n'a pas d'effet sans OpenMP)
+            options.intra_op_num_threads = self.threads
+
+        return options
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoBackend(RawYoloBackend):
+    """
+    Moteur OpenVINO (dossier d'export Ultralytics ou fichier .xml). Avec `cache_dir`, le modèle
+    compilé pour le périphérique est mis en cache par OpenVINO.
+    """
+
+    def load(self) -> None:
+        import openvino as ov
+
+        core = ov.Core()
+
+        if self.cache_dir is not None:
+            core.set_property({"CACHE_DIR": os.path.join(self.cache_dir, "openvino")})
+
+        model_path = self.model_path
+
+        if os.path.isdir(model_path):
+            model_path = next(os.path.join(model_path, name) for name in sorted(os.listdir(model_path)) if name.endswith(".xml"))
+
+        model = core.read_model(model_path)
+        device = "CPU" if str(self.device).lower() == "cpu" else str(self.device).upper()
+        config = {"INFERENCE_NUM_THREADS": self.threads} if self.threads and device == "CPU" else {}
+        self.compiled = core.compile_model(model, device, config)
+        self.request = self.compiled.create_infer_request()
+        self.output = self.compiled.output(0)
+
+        model_input = model.inputs[0]
+        shape = model_input.get_partial_shape()
+        self.input_dtype = np.float16 if model_input.get_element_type() == ov.Type.f16 else np.float32
+        self.fixed_batch = shape[0].get_length() if shape[0].is_static else None
+
+        if shape[2].is_static:
+            self.image_size = shape[2].get_length()
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        return self.request.infer({0: batch})[self.output]
+
+
+BACKENDS = {
+    "ultralytics": UltralyticsBackend,
+    "onnxruntime": OnnxRuntimeBackend,
+    "openvino": OpenVinoBackend
+}
+
+
+def create_backend(name: str, model_path: str, **kwargs) -> InferenceBackend:
+    """
+    Crée un moteur d'inférence à partir de son nom.
+
+    :param name : Nom du moteur (ultralytics, onnxruntime ou openvino).
+    :param model_path : Chemin du modèle.
+    :param kwargs : Paramètres du moteur (device, image_size, conf, iou, cache_dir, threads).
+
+    :return: Le moteur, non chargé.
+    """
+
+    if name not in BACKENDS:
+        raise ValueError(f"Moteur inconnu : {name}, valeurs possibles : {', '.join(BACKENDS)}")
+
+    return BACKENDS[name](model_path, **kwargs)
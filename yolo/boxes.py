@@ -0,0 +1,117 @@
+import numpy as np
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Calcule l'IoU entre deux ensembles de boîtes.
+
+    :param boxes_a : Boîtes (N, 4) au format [x1, y1, x2, y2].
+    :param boxes_b : Boîtes (M, 4) au format [x1, y1, x2, y2].
+
+    :return: La matrice (N, M) des IoU.
+    """
+
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, iou_threshold: float = 0.7, max_det: int = 300) -> np.ndarray:
+    """
+    Suppression des non-maxima par classe (une boîte ne supprime que les boîtes de sa classe).
+
+    :param boxes : Boîtes (N, 4) au format [x1, y1, x2, y2].
+    :param scores : Scores (N,).
+    :param classes : Classes (N,).
+    :param iou_threshold : IoU au-delà duquel la boîte de plus faible score est supprimée.
+    :param max_det : Nombre maximal de boîtes conservées.
+
+    :return: Les indices des boîtes conservées, par score décroissant.
+    """
+
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Décalage des boîtes par classe pour qu'elles ne se chevauchent jamais entre classes
+    offset = classes[:, None].astype(np.float32) * (boxes.max() + 1)
+    shifted = boxes + offset
+
+    order = np.argsort(-scores)
+    keep = []
+
+    while order.size and len(keep) < max_det:
+        best = order[0]
+        keep.append(best)
+
+        if order.size == 1:
+            break
+
+        ious = iou_matrix(shifted[best:best + 1], shifted[order[1:]])[0]
+        order = order[1:][ious <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+
+def xyxy_to_xywh(box) -> list:
+    """
+    Convertit une boîte [x1, y1, x2, y2] au format COCO [x, y, largeur, hauteur].
+
+    :param box : La boîte à convertir.
+
+    :return: La boîte au format COCO.
+    """
+
+    return [float(box[0]), float(box[1]), float(box[2] - box[0]), float(box[3] - box[1])]
+
+
+def weighted_boxes_fusion(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, iou_threshold: float = 0.55) -> tuple:
+    """
+    Fusion pondérée des boîtes (WBF) par classe : les boîtes qui se chevauchent sont moyennées
+    (pondérées par leur score) au lieu d'être supprimées.
+
+    :param boxes : Boîtes (N, 4) au format [x1, y1, x2, y2].
+    :param scores : Scores (N,).
+    :param classes : Classes (N,).
+    :param iou_threshold : IoU au-delà duquel une boîte rejoint un groupe.
+
+    :return: Les boîtes, scores et classes fusionnés, par score décroissant.
+    """
+
+    fused_boxes, fused_scores, fused_classes = [], [], []
+
+    for cls in np.unique(classes):
+        indices = np.flatnonzero(classes == cls)
+        indices = indices[np.argsort(-scores[indices])]
+        groups = []  # (boîte fusionnée, indices du groupe)
+
+        for index in indices:
+            if groups:
+                ious = iou_matrix(boxes[index:index + 1], np.array([box for box, _ in groups]))[0]
+                best = int(np.argmax(ious))
+
+                if ious[best] > iou_threshold:
+                    members = groups[best][1] + [index]
+                    weights = scores[members]
+                    groups[best] = ((boxes[members] * weights[:, None]).sum(axis=0) / weights.sum(), members)
+                    continue
+
+            groups.append((boxes[index].astype(np.float32), [index]))
+
+        for box, members in groups:
+            fused_boxes.append(box)
+            fused_scores.append(scores[members].mean())
+            fused_classes.append(cls)
+
+    if not fused_boxes:
+        return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32), np.empty(0, dtype=classes.dtype)
+
+    order = np.argsort(-np.array(fused_scores))
+
+    return np.array(fused_boxes)[order], np.array(fused_scores)[order], np.array(fused_classes)[order]
@@ -0,0 +1,131 @@
+import copy
+import os
+import sys
+import threading
+import numpy as np
+from PIL import Image
+
+# Ajout du dossier parent pour accéder au module common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.preprocessing import decode_jpeg
+
+
+class FrameDeduplicator:
+    """
+    Détection des images quasi identiques (voiture à l'arrêt) pour réutiliser les détections
+    de l'image précédente au lieu de relancer le modèle.
+
+    La signature d'une image est une vignette en niveaux de gris décodée à 1/8 dans le domaine DCT,
+    sans décoder l'image complète. Une image est comparée à la dernière image réellement prédite de
+    la même caméra, ou envoyée au modèle dans le même lot (différence absolue moyenne), et ses
+    détections ne sont réutilisées que pendant `max_reuse_age_ms` après la capture de cette image.
+    """
+
+    def __init__(self, threshold: float = 4.0, max_reuse_age_ms: float = 1000, thumbnail_size: int = 16):
+        """
+        :param threshold : Différence absolue moyenne maximale (niveaux de gris 0-255) entre deux images identiques.
+        :param max_reuse_age_ms : Durée maximale (en ms) de réutilisation des détections d'une image.
+        :param thumbnail_size : Côté de la vignette de signature.
+        """
+
+        self.threshold = threshold
+        self.max_reuse_age = max_reuse_age_ms / 1000
+        self.thumbnail_size = thumbnail_size
+        self.references = {}  # camera_id -> (signature, timestamp, détections)
+        self.frames = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def signature(self, data) -> np.ndarray:
+        """
+        Calcule la signature d'une image.
+
+        :param data : Octets de l'image encodée.
+
+        :return: La vignette en niveaux de gris.
+        """
+
+        image, _ = decode_jpeg(data, self.thumbnail_size * 4)
+        thumbnail = image.convert("L").resize((self.thumbnail_size, self.thumbnail_size), Image.BILINEAR)
+
+        return np.asarray(thumbnail, dtype=np.int16)
+
+    def lookup(self, camera_id: int, signature: np.ndarray, timestamp: float):
+        """
+        Cherche des détections réutilisables pour une image.
+
+        :param camera_id : Identifiant de la caméra.
+        :param signature : Signature de l'image.
+        :param timestamp : Instant de capture de l'image (s).
+
+        :return: Une copie des détections de l'image de référence, ou None s'il faut prédire l'image.
+        """
+
+        with self.lock:
+            self.frames += 1
+            reference = self.references.get(camera_id)
+
+            if reference is None:
+                return None
+
+            reference_signature, reference_timestamp, detections = reference
+
+            if not self.matches(signature, timestamp, reference_signature, reference_timestamp):
+                return None
+
+            self.skipped += 1
+
+            return copy.deepcopy(detections)
+
+    def lookup_pending(self, signature: np.ndarray, timestamp: float, reference_signature: np.ndarray, reference_timestamp: float) -> bool:
+        """
+        Compare une image à une image plus ancienne de la même caméra, dans le même lot et pas encore prédite.
+
+        :param signature : Signature de l'image.
+        :param timestamp : Instant de capture de l'image (s).
+        :param reference_signature : Signature de l'image du lot.
+        :param reference_timestamp : Instant de capture de l'image du lot (s).
+
+        :return: True si l'image réutilisera les détections de l'image du lot.
+        """
+
+        with self.lock:
+            self.frames += 1
+
+            if not self.matches(signature, timestamp, reference_signature, reference_timestamp):
+                return False
+
+            self.skipped += 1
+
+            return True
+
+    def matches(self, signature: np.ndarray, timestamp: float, reference_signature: np.ndarray, reference_timestamp: float) -> bool:
+        return (
+            0 <= timestamp - reference_timestamp <= self.max_reuse_age
+            and np.abs(signature - reference_signature).mean() <= self.threshold
+        )
+
+    def store(self, camera_id: int, signature: np.ndarray, timestamp: float, detections: list) -> None:
+        """
+        Enregistre une image prédite comme nouvelle référence de sa caméra.
+
+        :param camera_id : Identifiant de la caméra.
+        :param signature : Signature de l'image.
+        :param timestamp : Instant de capture de l'image (s).
+        :param detections : Détections de l'image.
+        """
+
+        with self.lock:
+            self.references[camera_id] = (signature, timestamp, copy.deepcopy(detections))
+
+    def stats(self) -> dict:
+        """
+        :return: Le nombre d'images vues, d'inférences évitées et le taux d'inférences évitées.
+        """
+
+        with self.lock:
+            return {
+                "frames": self.frames,
+                "skipped": self.skipped,
+                "skip_ratio": self.skipped / self.frames if self.frames else 0.0
+            }
@@ -0,0 +1,87 @@
+import logging
+import queue
+import threading
+import time
+
+
+class InferenceWorker(threading.Thread):
+    """
+    Thread d'inférence alimenté par une file.
+
+    Les messages sont regroupés en lots (micro-batching) : un lot est envoyé au modèle
+    dès qu'il contient `batch_size` messages ou que `max_delay_ms` millisecondes se sont
+    écoulées depuis la réception du premier message du lot.
+    """
+
+    def __init__(self, frames: queue.Queue, process_batch, batch_size: int = 4, max_delay_ms: float = 20):
+        """
+        :param frames : File des messages à traiter (None arrête le thread).
+        :param process_batch : Fonction appelée avec la liste des messages d'un lot.
+        :param batch_size : Nombre maximal de messages par lot.
+        :param max_delay_ms : Attente maximale (en ms) pour compléter un lot.
+        """
+
+        super().__init__(name="inference-worker", daemon=True)
+
+        self.frames = frames
+        self.process_batch = process_batch
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay_ms / 1000
+        self.stopped = False
+
+    def step(self) -> bool:
+        """
+        Attend puis traite un lot de messages.
+
+        :return: False si la file a été fermée et qu'il n'y a plus rien à traiter.
+        """
+
+        if self.stopped:
+            return False
+
+        item = self.frames.get()
+
+        if item is None:
+            self.stopped = True
+            return False
+
+        batch = [item]
+        deadline = time.monotonic() + self.max_delay
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                break
+
+            try:
+                item = self.frames.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            if item is None:
+                self.stopped = True
+                break
+
+            batch.append(item)
+
+        try:
+            self.process_batch(batch)
+        except Exception:
+            logging.exception(f"Erreur lors du traitement d'un lot de {len(batch)} images")
+
+        return True
+
+    def run(self):
+        while self.step():
+            pass
+
+    def stop(self, timeout: float = None):
+        """
+        Arrête le thread après le traitement des messages déjà en file.
+
+        :param timeout : Temps d'attente maximal (en secondes) de la fin du thread.
+        """
+
+        self.frames.put(None)
+        self.join(timeout)
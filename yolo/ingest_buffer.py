@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+# Politiques de rejet lorsque l'inférence est plus lente que la capture
+POLICY_DROP_OLDEST = "drop-oldest"
+POLICY_LATEST_ONLY = "latest-only"
+POLICY_MAX_AGE = "max-age"
+POLICIES = (POLICY_DROP_OLDEST, POLICY_LATEST_ONLY, POLICY_MAX_AGE)
+
+# Raisons de rejet d'une image
+DROP_OVERFLOW = "overflow"
+DROP_SUPERSEDED = "superseded"
+DROP_STALE = "stale"
+DROP_REASONS = (DROP_OVERFLOW, DROP_SUPERSEDED, DROP_STALE)
+
+
+class IngestBuffer:
+    """
+    File bornée des images en attente d'inférence, utilisable à la place d'une `queue.Queue`.
+
+    - drop-oldest : au-delà de `capacity` images, la plus ancienne est rejetée.
+    - latest-only : seule la dernière image de chaque caméra est conservée.
+    - max-age : comme drop-oldest, et les images plus vieilles que `max_age_ms` (d'après le
+      timestamp de capture, les horloges doivent être synchronisées) sont rejetées.
+
+    Les images rejetées sont comptées par raison (overflow, superseded, stale).
+    """
+
+    def __init__(self, policy: str = POLICY_DROP_OLDEST, capacity: int = 16, max_age_ms: float = None):
+        """
+        :param policy : Politique de rejet (drop-oldest, latest-only ou max-age).
+        :param capacity : Nombre maximal d'images en attente.
+        :param max_age_ms : Âge maximal (en ms) d'une image, 500 par défaut avec la politique max-age.
+        """
+
+        if policy not in POLICIES:
+            raise ValueError(f"Politique inconnue : {policy}, valeurs possibles : {', '.join(POLICIES)}")
+
+        if policy == POLICY_MAX_AGE and max_age_ms is None:
+            max_age_ms = 500
+
+        self.policy = policy
+        self.capacity = max(1, capacity)
+        self.max_age = max_age_ms / 1000 if max_age_ms is not None else None
+        self.frames = OrderedDict() if policy == POLICY_LATEST_ONLY else deque()
+        self.closed = False
+        self.received = 0
+        self.delivered = 0
+        self.dropped = Counter()
+        self.condition = threading.Condition()
+
+    def put(self, frame) -> None:
+        """
+        Ajoute une image (`common.frame_protocol.Frame`), None ferme la file.
+
+        :param frame : L'image à ajouter.
+        """
+
+        with self.condition:
+            if frame is None:
+                self.closed = True
+                self.condition.notify_all()
+                return
+
+            self.received += 1
+
+            if self._is_stale(frame):
+                self.dropped[DROP_STALE] += 1
+                return
+
+            if self.policy == POLICY_LATEST_ONLY:
+                if self.frames.pop(frame.camera_id, None) is not None:
+                    self.dropped[DROP_SUPERSEDED] += 1
+
+                self.frames[frame.camera_id] = frame
+
+                if len(self.frames) > self.capacity:
+                    self.frames.popitem(last=False)
+                    self.dropped[DROP_OVERFLOW] += 1
+            else:
+                if len(self.frames) >= self.capacity:
+                    self.frames.popleft()
+                    self.dropped[DROP_OVERFLOW] += 1
+
+                self.frames.append(frame)
+
+            self.condition.notify()
+
+    def get(self, block: bool = True, timeout: float = None):
+        """
+        Récupère la plus ancienne image encore valide.
+
+        :param block : Attendre qu'une image soit disponible.
+        :param timeout : Temps d'attente maximal (en secondes).
+
+        :return: L'image, ou None si la file est fermée et vide.
+
+        :raises queue.Empty: Si aucune image n'est disponible à temps.
+        """
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        with self.condition:
+            while True:
+                while self.frames:
+                    if self.policy == POLICY_LATEST_ONLY:
+                        _, frame = self.frames.popitem(last=False)
+                    else:
+                        frame = self.frames.popleft()
+
+                    if self._is_stale(frame):
+                        self.dropped[DROP_STALE] += 1
+                        continue
+
+                    self.delivered += 1
+
+                    return frame
+
+                if self.closed:
+                    return None
+
+                if not block:
+                    raise queue.Empty
+
+                remaining = deadline - time.monotonic() if deadline is not None else None
+
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+
+                self.condition.wait(remaining)
+
+    def _is_stale(self, frame) -> bool:
+        return self.max_age is not None and time.time() - frame.timestamp > self.max_age
+
+    def stats(self) -> dict:
+        """
+        Compteurs de la file, pour dimensionner le matériel.
+
+        :return: Le nombre d'images reçues, transmises à l'inférence, en attente et rejetées par raison.
+        """
+
+        with self.condition:
+            return {
+                "policy": self.policy,
+                "received": self.received,
+                "delivered": self.delivered,
+                "pending": len(self.frames),
+                "dropped": {reason: self.dropped[reason] for reason in (DROP_OVERFLOW, DROP_SUPERSEDED, DROP_STALE)}
+            }
@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import copy
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import paho.mqtt.client as mqtt
+from service import InferenceService, add_arguments
+
+
+def parse_args() -> argparse.Namespace:
+    """
+    Lecture des arguments de la ligne de commande.
+
+    :return: Les arguments.
+    """
+
+    parser = argparse.ArgumentParser(description="Lance plusieurs workers d'inférence MQTT")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Nombre de processus d'inférence")
+    parser.add_argument("-g", "--group", default="inference", help="Groupe de l'abonnement partagé")
+    parser.add_argument("--dispatcher", action="store_true", help="Répartition par un processus dédié (broker sans abonnements partagés)")
+    add_arguments(parser)
+
+    return parser.parse_args()
+
+
+def wait_for_termination() -> None:
+    """
+    Bloque jusqu'à la réception de SIGTERM ou SIGINT.
+    """
+
+    stop = threading.Event()
+
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    stop.wait()
+
+
+def run_worker(args: argparse.Namespace, index: int, topic: str, threads: int) -> None:
+    """
+    Processus d'inférence abonné à `topic`.
+
+    :param args : Arguments du lanceur.
+    :param index : Numéro du worker.
+    :param topic : Topic des images (abonnement partagé ou topic propre au worker).
+    :param threads : Nombre de threads de calcul du moteur d'inférence.
+    """
+
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s [{multiprocessing.current_process().name}] %(message)s")
+
+    config = copy.copy(args)
+    config.subscrib = topic
+
+    if config.threads is None:
+        # Évite que chaque worker utilise tous les cœurs
+        config.threads = threads
+
+    if config.client_id:
+        config.client_id = f"{config.client_id}-{index}"
+
+    if config.health_port:
+        config.health_port += index
+
+    asyncio.run(InferenceService(config).run())
+
+
+def run_dispatcher(args: argparse.Namespace, topics: list) -> None:
+    """
+    Répartiteur pour les brokers sans abonnements partagés : republie chaque image reçue sur
+    `args.subscrib` vers le topic d'un worker, à tour de rôle. Le message n'est pas modifié,
+    l'identifiant d'image est donc conservé.
+
+    :param args : Arguments du lanceur.
+    :param topics : Topics des workers.
+    """
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [dispatcher] %(message)s")
+
+    targets = itertools.cycle(topics)
+    client = mqtt.Client()
+
+    def on_connect(client, userdata, flags, rc):
+        logging.info(f"Connected with result code {rc}")
+        client.subscribe(args.subscrib, qos=1)
+
+    def on_message(client, userdata, msg):
+        client.publish(next(targets), msg.payload, qos=1)
+
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(args.broker, args.port, 60)
+    client.loop_start()
+
+    wait_for_termination()
+
+    client.loop_stop()
+    client.disconnect()
+
+
+def main() -> None:
+    args = parse_args()
+    workers = max(1, args.workers)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    if args.dispatcher:
+        topics = [f"{args.subscrib}/worker/{i}" for i in range(workers)]
+    else:
+        # Le broker répartit les messages entre les membres du groupe
+        topics = [f"$share/{args.group}/{args.subscrib}"] * workers
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(args, i, topic, threads), name=f"worker-{i}")
+        for i, topic in enumerate(topics)
+    ]
+
+    if args.dispatcher:
+        processes.append(multiprocessing.Process(target=run_dispatcher, args=(args, topics), name="dispatcher"))
+
+    for process in processes:
+        process.start()
+
+    try:
+        wait_for_termination()
+    finally:
+        for process in processes:
+            process.terminate()
+
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
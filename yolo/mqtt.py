@@ -1,83 +1,274 @@
-import base64
-import json
+import copy
 import logging
+import os
+import sys
+import time
 import paho.mqtt.client as mqtt
-from PIL import Image
-import io
-from ultralytics import YOLO
+from backends import create_backend
+from dedup import FrameDeduplicator
+from tiling import MERGE_NMS, TiledPredictor
+from tracking import FrameTracker
+from inference_worker import InferenceWorker
+from ingest_buffer import DROP_REASONS, POLICY_DROP_OLDEST, IngestBuffer
+
+# Ajout du dossier parent pour accéder au module common
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.frame_protocol import decode_frame
+from common.metrics import MetricsRegistry
+from common.preprocessing import decode_jpeg
+from common.result_protocol import RESULT_FORMAT_BOX, RESULT_FORMAT_FRAME, encode_box_result, encode_result
 
 
 class MQTTClient:
-    def __init__(self, broker, port, subscrib, publish, model_name):
+    def __init__(self, broker, port, subscrib, publish, model_name, batch_size=4, max_delay_ms=20, result_format=RESULT_FORMAT_FRAME,
+                 buffer_policy=POLICY_DROP_OLDEST, buffer_size=16, max_age_ms=None,
+                 backend="ultralytics", device="cpu", client_id=None, qos=0, cache_dir=None,
+                 dedup_threshold=None, dedup_max_age_ms=1000,
+                 tile_size=None, tile_overlap=0.2, tile_full_frame=True, tile_merge=MERGE_NMS,
+                 track_every=None, track_min_confidence=0.3, threads=None):
         self.broker = broker
         self.port = port
         self.subscrib_topic = subscrib
         self.publish_topic = publish
-        self.model = YOLO(f"./saved/{model_name}")
-        self.client = mqtt.Client()
+        self.result_format = result_format
+        self.qos = qos
+        self.backend = create_backend(backend, f"./saved/{model_name}", device=device, cache_dir=cache_dir, threads=threads)
+        self.backend.load()
+        # Mode tuilé pour les petits objets (désactivé si tile_size est None)
+        self.tiler = TiledPredictor(self.backend, tile_size, tile_overlap, tile_full_frame, tile_merge) if tile_size else None
+        self.batch_size = batch_size
+        self.frames = IngestBuffer(buffer_policy, buffer_size, max_age_ms)
+        # Réutilisation des détections pour les images quasi identiques (désactivée si dedup_threshold est None)
+        self.deduplicator = FrameDeduplicator(dedup_threshold, dedup_max_age_ms) if dedup_threshold is not None else None
+        # Détecteur toutes les track_every images et suivi entre deux (désactivé si track_every est None)
+        self.tracker = FrameTracker(track_every, track_min_confidence) if track_every else None
+        self.worker = InferenceWorker(self.frames, self.process_batch, batch_size, max_delay_ms)
+        self.init_metrics()
+        # Avec un client_id fixe la session est persistante : le broker garde les images pendant un redémarrage
+        self.client = mqtt.Client(client_id=client_id or "", clean_session=client_id is None)
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
 
+    def init_metrics(self):
+        self.metrics = MetricsRegistry("inference_")
+        self.stage_durations = {}
+        self.received = self.metrics.counter("frames_received", "Images reçues")
+        self.published = self.metrics.counter("results_published", "Résultats publiés")
+        self.batch_sizes = self.metrics.histogram("batch_size", "Taille des lots envoyés au modèle", buckets=(1, 2, 4, 8, 16, 32))
+        self.latency = self.metrics.histogram("frame_latency_ms", "Temps entre la capture et la publication du résultat (ms)")
+        # Lues au moment de l'export : aucun coût par image
+        self.metrics.gauge("ingest_queue_depth", "Images en attente du modèle", function=lambda: self.frames.stats()["pending"])
+
+        for reason in DROP_REASONS:
+            self.metrics.counter(
+                "frames_dropped", "Images rejetées par le tampon d'entrée", {"reason": reason},
+                function=lambda reason=reason: self.frames.stats()["dropped"][reason]
+            )
+
+    def observe_timings(self, timings):
+        for stage, duration in timings.items():
+            if stage in ("batch_size", "tiles"):
+                continue
+
+            if stage not in self.stage_durations:
+                self.stage_durations[stage] = self.metrics.histogram("stage_duration_ms", "Durée de chaque étape par image (ms)", {"stage": stage})
+
+            self.stage_durations[stage].observe(duration)
+
     def connect(self):
+        self.worker.start()
         self.client.connect(self.broker, self.port, 60)
         self.client.loop_start()
 
+    def disconnect(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+        self.worker.stop()
+
+    def warmup(self, iterations=1):
+        # Préchauffage avec des lots de la taille utilisée en service
+        self.backend.warmup(iterations, self.batch_size)
+
     def on_connect(self, client, userdata, flags, rc):
         logging.info(f"Connected with result code {rc}")
 
-        self.client.subscribe(self.subscrib_topic)
+        self.client.subscribe(self.subscrib_topic, qos=self.qos)
 
     def on_message(self, client, userdata, msg):
         logging.info(f"Message received: {msg.topic}")
 
-        payload = json.loads(msg.payload)
-        image_id = payload["timestamp"]
-        image_data = base64.b64decode(payload["image"])
+        try:
+            # Format binaire ou ancien format JSON (détection automatique)
+            frame = decode_frame(msg.payload)
+        except Exception as e:
+            logging.error(f"Message invalide ignoré: {e}")
+            return
+
+        # Le décodage de l'image et l'inférence sont faits par le worker pour ne pas bloquer la boucle réseau
+        self.received.inc()
+        self.frames.put(frame)
+
+    def decode(self, frame):
+        if self.tiler is not None:
+            # Les tuiles sont découpées dans l'image en pleine résolution
+            return decode_jpeg(frame.data)
+
+        # Décodage JPEG réduit (domaine DCT) si l'image est plus grande que l'entrée du modèle
+        return decode_jpeg(frame.data, self.backend.image_size)
+
+    def process_batch(self, frames):
+        # Les résultats sont publiés dans l'ordre des images, après l'inférence du lot : les images propagées ou
+        # réutilisées partent des détections des images du même lot qui les précèdent
+        plan = []  # (image, action, valeur, temps)
+        pending = []
+        batch_references = {}  # camera_id -> indice dans pending de la dernière image de la caméra envoyée au modèle
+
+        for frame in frames:
+            start = time.perf_counter()
+            signature = None
+
+            try:
+                if self.deduplicator is not None:
+                    signature = self.deduplicator.signature(frame.data)
+                    reference = batch_references.get(frame.camera_id)
+
+                    if reference is not None:
+                        # Une image plus ancienne de la caméra attend le modèle dans ce lot : c'est elle la référence
+                        reference_frame, _, _, reference_signature, _ = pending[reference]
+
+                        if self.deduplicator.lookup_pending(signature, frame.timestamp, reference_signature, reference_frame.timestamp):
+                            plan.append((frame, "reuse", reference, {"signature": (time.perf_counter() - start) * 1000}))
+                            continue
+                    else:
+                        detections = self.deduplicator.lookup(frame.camera_id, signature, frame.timestamp)
+
+                        if detections is not None:
+                            # Image quasi identique à la précédente : ses détections sont réutilisées
+                            plan.append((frame, "known", detections, {"signature": (time.perf_counter() - start) * 1000}))
+                            continue
+
+                if self.tracker is not None and not self.tracker.should_detect(frame.camera_id):
+                    # Entre deux passages du détecteur, les objets suivis sont propagés (après les détections du lot)
+                    plan.append((frame, "propagate", None, {}))
+                    continue
+
+                image, scale = self.decode(frame)
+            except Exception as e:
+                logging.error(f"Image invalide ignorée ({frame.image_id}): {e}")
+                continue
+
+            if signature is not None:
+                batch_references[frame.camera_id] = len(pending)
+
+            plan.append((frame, "infer", len(pending), {"decode": (time.perf_counter() - start) * 1000}))
+            pending.append((frame, image, scale, signature, plan[-1][3]))
 
-        image = Image.open(io.BytesIO(image_data))
+        if pending:
+            batch_frames, images, scales, _, _ = zip(*pending)
+            detections, backend_timings = self.infer_batch([frame.image_id for frame in batch_frames], images, scales)
+            self.batch_sizes.observe(len(images))
 
-        self.predict(image_id, image)
+        for frame, action, value, timing in plan:
+            if action == "infer":
+                _, _, _, signature, _ = pending[value]
+                image_detections = detections[value]
+                timing.update(backend_timings)
+                timing["batch_size"] = len(pending)
+
+                if self.tracker is not None:
+                    self.tracker.update(frame.camera_id, image_detections, frame.timestamp)
+
+                if signature is not None:
+                    self.deduplicator.store(frame.camera_id, signature, frame.timestamp, image_detections)
+
+                self.publish_frame(frame, image_detections, timing)
+            elif action == "propagate":
+                start = time.perf_counter()
+                propagated = self.tracker.propagate(frame.camera_id, frame.timestamp)
+                self.publish_frame(frame, propagated, {"track": (time.perf_counter() - start) * 1000}, tracked=True)
+            elif action == "reuse":
+                self.publish_frame(frame, copy.deepcopy(detections[value]), timing, reused=True)
+            else:
+                self.publish_frame(frame, value, timing, reused=True)
+
+    def publish_frame(self, frame, detections, timings, **extra):
+        self.publish_result(frame.image_id, detections, timings, **extra)
+        self.latency.observe((time.time() - frame.timestamp) * 1000)
 
     def predict(self, image_id, image):
-        logging.info(f"Predict: {image_id}")
-        
-        results = self.model.predict(image, device=0)
-
-        logging.info(f"Prédiction finie: {image_id}")
-
-        inference_time = results[0].speed["inference"]
-    
-        for result in results:
-            if result.boxes:
-                for box in result.boxes:
-                    cls = box.cls.item()
-                    conf = box.conf.item()
-                    boxes = box.xyxy.tolist()[0]
-                    prediction = {
-                        "image_id": image_id,
-                        "category_id": int(cls),
-                        "bbox": [boxes[0], boxes[1], boxes[2] - boxes[0], boxes[3] - boxes[1]],
-                        "score": conf,
-                        "inference_time": inference_time
-                    }
-
-                    self.send_message(json.dumps(prediction))
+        self.predict_batch([image_id], [image])
+
+    def predict_batch(self, images_id, images, timings=None, scales=None):
+        detections, backend_timings = self.infer_batch(images_id, images, scales)
+
+        if timings is None:
+            timings = [{} for _ in images_id]
+
+        for image_id, image_detections, timing in zip(images_id, detections, timings):
+            timing.update(backend_timings)
+            timing["batch_size"] = len(images)
+
+            self.publish_result(image_id, image_detections, timing)
+
+    def infer_batch(self, images_id, images, scales=None):
+        logging.info(f"Predict: {images_id}")
+
+        detections, backend_timings = (self.tiler or self.backend).predict(list(images))
+
+        logging.info(f"Prédiction finie: {images_id}")
+
+        for image_detections, scale in zip(detections, scales or [1] * len(images)):
+            if scale != 1:
+                # Retour au repère de l'image envoyée par la caméra
+                for detection in image_detections:
+                    detection["bbox"] = [coord / scale for coord in detection["bbox"]]
+
+        return detections, backend_timings
+
+    def publish_result(self, image_id, detections, timings, **extra):
+        start = time.perf_counter()
+
+        if self.result_format == RESULT_FORMAT_BOX:
+            # Mode de compatibilité : un message par boîte
+            for detection in detections:
+                if "track_id" in detection:
+                    extra["track_id"] = detection["track_id"]
+
+                self.send_message(encode_box_result(
+                    image_id, detection["category_id"], detection["bbox"], detection["score"], timings.get("inference"), **extra
+                ))
+        else:
+            self.send_message(encode_result(
+                image_id,
+                [detection["category_id"] for detection in detections],
+                [detection["score"] for detection in detections],
+                [detection["bbox"] for detection in detections],
+                timings,
+                track_ids=[detection["track_id"] for detection in detections] if detections and "track_id" in detections[0] else None,
+                **extra
+            ))
+
+        self.published.inc()
+        self.observe_timings(timings)
+        self.observe_timings({"publish": (time.perf_counter() - start) * 1000})
 
     def send_message(self, message):
-        self.client.publish(self.publish_topic, message)
+        self.client.publish(self.publish_topic, message, qos=self.qos)
 
+    def stats(self):
+        stats = self.frames.stats()
 
-if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
+        if self.deduplicator is not None:
+            stats["dedup"] = self.deduplicator.stats()
+
+        if self.tracker is not None:
+            stats["tracking"] = self.tracker.stats()
 
-    broker = "192.168.137.58"
-    port = 1883
-    subscrib = "inference/images"
-    publish = "inference/results"
-    model_name = "yolo11n_trained.pt"
+        return stats
 
-    client = MQTTClient(broker, port, subscrib, publish, model_name)
-    client.connect()
 
-    while True:
-        pass
\ No newline at end of file
+if __name__ == "__main__":
+    # Le service est configuré par la ligne de commande ou les variables d'environnement (voir service.py)
+    from service import main
+
+    main()
@@ -0,0 +1,385 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+import paho.mqtt.client as mqtt
+from ingest_buffer import POLICIES, POLICY_DROP_OLDEST
+from mqtt import MQTTClient
+from tiling import MERGE_NMS, MERGES
+
+# Le dossier parent est ajouté au sys.path par l'import de mqtt
+from common.metrics import CONTENT_TYPE
+from common.result_protocol import RESULT_FORMAT_BOX, RESULT_FORMAT_FRAME
+
+
+def env(name: str, default=None):
+    """
+    Valeur par défaut d'une option lue dans une variable d'environnement.
+
+    :param name : Nom de la variable d'environnement.
+    :param default : Valeur si la variable n'est pas définie.
+
+    :return: La valeur.
+    """
+
+    return os.environ.get(name, default)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Ajoute les options du service d'inférence (chacune a une variable d'environnement équivalente).
+
+    :param parser : Le parseur à compléter.
+    """
+
+    parser.add_argument("--broker", default=env("MQTT_BROKER", "localhost"))
+    parser.add_argument("--port", type=int, default=int(env("MQTT_PORT", 1883)))
+    parser.add_argument("--subscrib", default=env("MQTT_SUBSCRIB", "inference/images"))
+    parser.add_argument("--publish", default=env("MQTT_PUBLISH", "inference/results"))
+    parser.add_argument("--client-id", default=env("MQTT_CLIENT_ID"), help="Identifiant fixe = session persistante")
+    parser.add_argument("--qos", type=int, default=int(env("MQTT_QOS", 1)))
+    parser.add_argument("--model", default=env("MODEL_NAME", "yolo11n_trained.pt"), help="Nom du modèle dans ./saved")
+    parser.add_argument("--backend", default=env("BACKEND", "ultralytics"), help="ultralytics, onnxruntime ou openvino")
+    parser.add_argument("--device", default=env("DEVICE", "cpu"), help="cpu, ou 0 pour le GPU")
+    parser.add_argument("--threads", type=int, default=env("THREADS"), help="Threads de calcul du moteur (par défaut : un par cœur, ou cœurs / workers avec launcher.py)")
+    parser.add_argument("--batch-size", type=int, default=int(env("BATCH_SIZE", 4)))
+    parser.add_argument("--max-delay-ms", type=float, default=float(env("MAX_DELAY_MS", 20)))
+    parser.add_argument("--result-format", choices=(RESULT_FORMAT_FRAME, RESULT_FORMAT_BOX), default=env("RESULT_FORMAT", RESULT_FORMAT_FRAME))
+    parser.add_argument("--buffer-policy", choices=POLICIES, default=env("BUFFER_POLICY", POLICY_DROP_OLDEST))
+    parser.add_argument("--buffer-size", type=int, default=int(env("BUFFER_SIZE", 16)))
+    parser.add_argument("--max-age-ms", type=float, default=env("MAX_AGE_MS"))
+    parser.add_argument("--dedup-threshold", type=float, default=env("DEDUP_THRESHOLD"), help="Réutilise les détections des images quasi identiques (ex. 4)")
+    parser.add_argument("--dedup-max-age-ms", type=float, default=float(env("DEDUP_MAX_AGE_MS", 1000)))
+    parser.add_argument("--tile-size", type=int, default=env("TILE_SIZE"), help="Mode tuilé pour les petits objets (ex. 640)")
+    parser.add_argument("--tile-overlap", type=float, default=float(env("TILE_OVERLAP", 0.2)))
+    parser.add_argument("--tile-merge", choices=MERGES, default=env("TILE_MERGE", MERGE_NMS))
+    parser.add_argument("--no-full-frame", dest="tile_full_frame", action="store_false", help="Ne prédit que les tuiles, sans l'image entière")
+    parser.add_argument("--track-every", type=int, default=env("TRACK_EVERY"), help="Détecteur toutes les k images, suivi entre deux (ex. 5)")
+    parser.add_argument("--track-min-confidence", type=float, default=float(env("TRACK_MIN_CONFIDENCE", 0.3)))
+    parser.add_argument("--cache-dir", default=env("MODEL_CACHE_DIR", "./cache"), help="Modèles optimisés / compilés (vide pour désactiver)")
+    parser.add_argument("--warmup", type=int, default=int(env("WARMUP", 2)), help="Inférences de préchauffage avant l'abonnement")
+    parser.add_argument("--health-port", type=int, default=int(env("HEALTH_PORT", 8081)), help="0 pour désactiver")
+
+
+def process_uptime() -> float:
+    """
+    Temps écoulé depuis le lancement du processus (imports compris).
+
+    :return: Le temps en secondes.
+    """
+
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        # Hors Linux : depuis l'import de ce module
+        return time.monotonic() - IMPORTED_AT
+
+
+IMPORTED_AT = time.monotonic()
+
+
+def parse_config(argv: list = None) -> argparse.Namespace:
+    """
+    Lecture de la configuration du service.
+
+    :param argv : Arguments de la ligne de commande (sys.argv par défaut).
+
+    :return: La configuration.
+    """
+
+    parser = argparse.ArgumentParser(description="Service d'inférence MQTT")
+    add_arguments(parser)
+
+    return parser.parse_args(argv)
+
+
+class AsyncioHelper:
+    """
+    Fait tourner la boucle réseau d'un client paho dans la boucle asyncio (pas de thread, pas d'attente active).
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, client: mqtt.Client):
+        self.loop = loop
+        self.client = client
+        self.socket = None
+        self.misc = None
+
+        client.on_socket_open = self.on_socket_open
+        client.on_socket_close = self.on_socket_close
+        client.on_socket_register_write = self.on_socket_register_write
+        client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def on_socket_open(self, client, userdata, sock):
+        self.socket = sock
+        self.loop.add_reader(sock, client.loop_read)
+        self.misc = self.loop.create_task(self.misc_loop())
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        self.loop.remove_writer(sock)
+        self.socket = None
+
+        if self.misc is not None:
+            self.misc.cancel()
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    def pause_reading(self):
+        # Les messages non lus restent chez le broker (et sont renvoyés avec une session persistante)
+        if self.socket is not None:
+            self.loop.remove_reader(self.socket)
+
+    async def misc_loop(self):
+        # Keepalive et renvois, une fois par seconde
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1)
+
+
+class AsyncMQTTClient(MQTTClient):
+    """
+    MQTTClient piloté par une boucle asyncio : les publications faites depuis l'exécuteur du modèle
+    sont renvoyées dans la boucle.
+    """
+
+    loop = None
+    connected = False
+    on_first_result = None
+
+    def publish_result(self, image_id, detections, timings, **extra):
+        super().publish_result(image_id, detections, timings, **extra)
+
+        if self.on_first_result is not None:
+            self.on_first_result()
+            self.on_first_result = None
+
+    def on_connect(self, client, userdata, flags, rc):
+        super().on_connect(client, userdata, flags, rc)
+
+        self.connected = rc == 0
+
+    def send_message(self, message):
+        self.loop.call_soon_threadsafe(super().send_message, message)
+
+
+class InferenceService:
+    """
+    Service d'inférence asyncio : client MQTT asynchrone, exécuteur dédié aux appels du modèle,
+    arrêt propre sur SIGTERM (les images reçues sont traitées avant la déconnexion) et
+    points de santé HTTP (/health, /ready).
+    """
+
+    def __init__(self, config: argparse.Namespace):
+        """
+        :param config : Configuration du service (voir `parse_config`).
+        """
+
+        self.config = config
+        self.engine = None
+        self.helper = None
+        self.draining = False
+        self.stopping = None  # asyncio.Event, levé par SIGTERM / SIGINT
+        self.consumer = None
+        # Étapes du démarrage (s depuis le lancement du processus), dont le temps jusqu'au premier résultat
+        self.startup = {}
+        # Un seul thread : le modèle n'est jamais appelé en parallèle
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")
+
+    @property
+    def ready(self) -> bool:
+        return self.engine is not None and self.engine.connected and not self.draining
+
+    @property
+    def healthy(self) -> bool:
+        return self.consumer is None or not self.consumer.done() or self.draining
+
+    def create_engine(self) -> AsyncMQTTClient:
+        config = self.config
+
+        return AsyncMQTTClient(
+            config.broker, config.port, config.subscrib, config.publish, config.model,
+            batch_size=config.batch_size, max_delay_ms=config.max_delay_ms, result_format=config.result_format,
+            buffer_policy=config.buffer_policy, buffer_size=config.buffer_size,
+            max_age_ms=float(config.max_age_ms) if config.max_age_ms is not None else None,
+            backend=config.backend, device=int(config.device) if str(config.device).isdigit() else config.device,
+            client_id=config.client_id, qos=config.qos, cache_dir=config.cache_dir or None,
+            dedup_threshold=float(config.dedup_threshold) if config.dedup_threshold is not None else None,
+            dedup_max_age_ms=config.dedup_max_age_ms,
+            tile_size=int(config.tile_size) if config.tile_size is not None else None, tile_overlap=config.tile_overlap,
+            tile_full_frame=config.tile_full_frame, tile_merge=config.tile_merge,
+            track_every=int(config.track_every) if config.track_every is not None else None,
+            track_min_confidence=config.track_min_confidence,
+            threads=int(config.threads) if config.threads is not None else None
+        )
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stopping.set)
+
+        health = None
+
+        if self.config.health_port:
+            health = await asyncio.start_server(self.handle_health, "0.0.0.0", self.config.health_port)
+
+        self.mark_startup("imported")
+
+        # Le chargement du modèle est bloquant
+        self.engine = await loop.run_in_executor(self.executor, self.create_engine)
+        self.mark_startup("model_loaded")
+
+        # Préchauffage avant l'abonnement : la première vraie image ne paie pas l'initialisation du modèle
+        if self.config.warmup:
+            await loop.run_in_executor(self.executor, self.engine.warmup, self.config.warmup)
+            self.mark_startup("warmed_up")
+
+        self.engine.loop = loop
+        self.engine.on_first_result = lambda: self.mark_startup("first_result")
+        self.engine.client.on_disconnect = self.on_disconnect
+        self.helper = AsyncioHelper(loop, self.engine.client)
+
+        await self.connect()
+
+        if self.stopping.is_set():
+            # Arrêt demandé avant la connexion au broker : aucune image reçue à traiter
+            logging.info("Arrêt demandé pendant la connexion au broker")
+            self.executor.shutdown()
+        else:
+            self.mark_startup("connected")
+            self.consumer = loop.create_task(self.consume())
+
+            await self.stopping.wait()
+            await self.drain()
+
+        if health is not None:
+            health.close()
+            await health.wait_closed()
+
+    def mark_startup(self, stage: str) -> None:
+        self.startup[stage] = round(process_uptime(), 3)
+
+        logging.info(f"Démarrage : {stage} après {self.startup[stage]} s")
+
+    async def connect(self) -> None:
+        delay = 1
+
+        while not self.draining and not self.stopping.is_set():
+            try:
+                self.engine.client.connect(self.config.broker, self.config.port, 60)
+                return
+            except OSError as e:
+                logging.error(f"Connexion au broker impossible ({e}), nouvel essai dans {delay} s")
+
+                # Attente interrompue par SIGTERM : un broker injoignable n'empêche pas l'arrêt
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+                delay = min(delay * 2, 30)
+
+    def on_disconnect(self, client, userdata, rc):
+        self.engine.connected = False
+
+        if not self.draining:
+            logging.warning(f"Déconnecté du broker (code {rc}), reconnexion")
+            asyncio.get_running_loop().create_task(self.connect())
+
+    async def consume(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while await loop.run_in_executor(self.executor, self.engine.worker.step):
+            pass
+
+    async def drain(self) -> None:
+        logging.info("Arrêt demandé, traitement des images reçues avant déconnexion")
+
+        self.draining = True
+        client = self.engine.client
+
+        if self.config.client_id:
+            # Session persistante : le broker garde les images suivantes jusqu'au redémarrage
+            self.helper.pause_reading()
+        else:
+            # Les images suivantes vont aux autres membres du groupe (abonnement partagé)
+            unsubscribed = asyncio.Event()
+            client.on_unsubscribe = lambda *_: unsubscribed.set()
+            client.unsubscribe(self.engine.subscrib_topic)
+
+            try:
+                await asyncio.wait_for(unsubscribed.wait(), 5)
+            except asyncio.TimeoutError:
+                logging.warning("Pas de confirmation du désabonnement")
+
+        self.engine.frames.put(None)
+        await self.consumer
+
+        # Envoi des derniers résultats
+        await asyncio.sleep(0)
+
+        while client.want_write():
+            await asyncio.sleep(0.01)
+
+        client.disconnect()
+        self.executor.shutdown()
+
+        logging.info(f"Service arrêté : {self.engine.stats()}")
+
+    async def handle_health(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        request = (await reader.readline()).split()
+        path = request[1].decode() if len(request) > 1 else "/"
+
+        # Les en-têtes de la requête sont ignorés
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        if path == "/metrics":
+            status, content_type = "200 OK", CONTENT_TYPE
+            body = self.engine.metrics.render().encode() if self.engine is not None else b""
+        else:
+            if path == "/health":
+                ok = self.healthy
+            elif path == "/ready":
+                ok = self.ready
+            else:
+                ok = None
+
+            status = "404 Not Found" if ok is None else "200 OK" if ok else "503 Service Unavailable"
+            content_type = "application/json"
+            body = json.dumps({
+                "healthy": self.healthy,
+                "ready": self.ready,
+                "startup": self.startup,
+                "stats": self.engine.stats() if self.engine is not None else None
+            }).encode()
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        writer.close()
+
+
+def main(argv: list = None) -> None:
+    logging.basicConfig(level=logging.INFO)
+
+    asyncio.run(InferenceService(parse_config(argv)).run())
+
+
+if __name__ == "__main__":
+    main()
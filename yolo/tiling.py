@@ -0,0 +1,139 @@
+import math
+import time
+from typing import List, Tuple
+import numpy as np
+from PIL import Image
+from boxes import nms, weighted_boxes_fusion, xyxy_to_xywh
+
+MERGE_NMS = "nms"
+MERGE_WBF = "wbf"
+MERGES = (MERGE_NMS, MERGE_WBF)
+
+
+def tile_grid(width: int, height: int, tile_size: int, overlap: float) -> List[Tuple[int, int, int, int]]:
+    """
+    Découpe une image en tuiles qui se chevauchent. Les dernières tuiles sont collées au bord de l'image.
+
+    :param width : Largeur de l'image.
+    :param height : Hauteur de l'image.
+    :param tile_size : Côté d'une tuile.
+    :param overlap : Chevauchement entre deux tuiles voisines (fraction de tile_size).
+
+    :return: Les tuiles (x1, y1, x2, y2).
+    """
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+
+        count = math.ceil((length - tile_size) / (tile_size * (1 - overlap))) + 1
+        step = (length - tile_size) / (count - 1)
+
+        return [round(i * step) for i in range(count)]
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height) for x in starts(width)
+    ]
+
+
+class TiledPredictor:
+    """
+    Mode tuilé pour les petits objets (panneaux au loin) : chaque image est découpée en tuiles qui se
+    chevauchent, toutes les tuiles du lot (et les images entières si `full_frame`) sont prédites en un
+    seul lot, puis les boîtes sont ramenées dans le repère de l'image et fusionnées par classe.
+
+    Même interface que `InferenceBackend.predict`.
+    """
+
+    def __init__(self, backend, tile_size: int = 640, overlap: float = 0.2, full_frame: bool = True, merge: str = MERGE_NMS, iou: float = 0.5):
+        """
+        :param backend : Moteur d'inférence (InferenceBackend).
+        :param tile_size : Côté d'une tuile (en pixels de l'image d'origine).
+        :param overlap : Chevauchement entre deux tuiles voisines (fraction de tile_size).
+        :param full_frame : Prédit aussi l'image entière (objets plus grands qu'une tuile).
+        :param merge : Fusion des boîtes des tuiles, MERGE_NMS ou MERGE_WBF.
+        :param iou : Seuil d'IoU de la fusion.
+        """
+
+        if merge not in MERGES:
+            raise ValueError(f"Fusion inconnue: {merge} (choix: {', '.join(MERGES)})")
+
+        self.backend = backend
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.full_frame = full_frame
+        self.merge = merge
+        self.iou = iou
+
+    def predict(self, images: List[Image.Image]) -> Tuple[List[List[dict]], dict]:
+        """
+        Prédit un lot d'images en mode tuilé.
+
+        :param images : Images RGB en pleine résolution.
+
+        :return: Les détections de chaque image et le temps moyen par image (en ms) de chaque étape.
+        """
+
+        crops = []
+        origins = []  # (indice de l'image, x, y) de chaque entrée du lot
+
+        for index, image in enumerate(images):
+            tiles = tile_grid(image.width, image.height, self.tile_size, self.overlap)
+
+            for tile in tiles:
+                crops.append(image.crop(tile))
+                origins.append((index, tile[0], tile[1]))
+
+            if self.full_frame and len(tiles) > 1:
+                crops.append(image)
+                origins.append((index, 0, 0))
+
+        detections, timings = self.backend.predict(crops)
+
+        start = time.perf_counter()
+        per_image = [[] for _ in images]
+
+        for (index, x, y), crop_detections in zip(origins, detections):
+            per_image[index].extend((detection, x, y) for detection in crop_detections)
+
+        merged = [self.merge_detections(image_detections) for image_detections in per_image]
+
+        # Temps du moteur rapportés par image et non par tuile
+        count = max(1, len(images))
+        timings = {stage: value * len(crops) / count for stage, value in timings.items()}
+        timings["merge"] = (time.perf_counter() - start) * 1000 / count
+        timings["tiles"] = len(crops) / count
+
+        return merged, timings
+
+    def merge_detections(self, detections: List[Tuple[dict, int, int]]) -> List[dict]:
+        """
+        Ramène les détections des tuiles dans le repère de l'image et les fusionne.
+
+        :param detections : Détections (dictionnaire, x, y de la tuile).
+
+        :return: Les détections fusionnées.
+        """
+
+        if not detections:
+            return []
+
+        boxes = np.array([
+            [detection["bbox"][0] + x, detection["bbox"][1] + y,
+             detection["bbox"][0] + detection["bbox"][2] + x, detection["bbox"][1] + detection["bbox"][3] + y]
+            for detection, x, y in detections
+        ], dtype=np.float32)
+        scores = np.array([detection["score"] for detection, _, _ in detections], dtype=np.float32)
+        classes = np.array([detection["category_id"] for detection, _, _ in detections], dtype=np.int64)
+
+        if self.merge == MERGE_WBF:
+            boxes, scores, classes = weighted_boxes_fusion(boxes, scores, classes, self.iou)
+        else:
+            keep = nms(boxes, scores, classes, self.iou)
+            boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+
+        return [
+            {"category_id": int(cls), "bbox": xyxy_to_xywh(box), "score": float(score)}
+            for box, score, cls in zip(boxes, scores, classes)
+        ]
@@ -0,0 +1,177 @@
+import threading
+from typing import List
+import numpy as np
+from boxes import iou_matrix, xyxy_to_xywh
+
+
+class Track:
+    """
+    Objet suivi : dernière boîte détectée, vitesse estimée et confiance.
+    """
+
+    def __init__(self, track_id: int, detection: dict, box: np.ndarray, timestamp: float):
+        self.track_id = track_id
+        self.category_id = detection["category_id"]
+        self.score = detection["score"]
+        self.box = box
+        self.velocity = np.zeros(4, dtype=np.float32)  # pixels par seconde pour x1, y1, x2, y2
+        self.timestamp = timestamp
+        self.propagated = 0  # images propagées depuis la dernière détection
+
+    def update(self, detection: dict, box: np.ndarray, timestamp: float, smoothing: float) -> None:
+        elapsed = timestamp - self.timestamp
+
+        if elapsed > 0:
+            self.velocity = smoothing * (box - self.box) / elapsed + (1 - smoothing) * self.velocity
+
+        self.score = detection["score"]
+        self.box = box
+        self.timestamp = timestamp
+        self.propagated = 0
+
+    def predict(self, timestamp: float) -> np.ndarray:
+        return self.box + self.velocity * max(0.0, timestamp - self.timestamp)
+
+
+class FrameTracker:
+    """
+    Suivi multi-objets par IoU avec un modèle à vitesse constante : le détecteur ne tourne que toutes
+    les `detect_every` images d'une caméra, ou plus tôt si la confiance d'un objet suivi tombe sous
+    `min_confidence`. Entre deux détections, les boîtes sont propagées avec la vitesse de chaque objet.
+
+    Chaque détection reçoit un `track_id` stable tant que l'objet est associé d'une détection à l'autre.
+    """
+
+    def __init__(self, detect_every: int = 5, min_confidence: float = 0.3, confidence_decay: float = 0.9,
+                 iou_threshold: float = 0.3, smoothing: float = 0.5):
+        """
+        :param detect_every : Nombre d'images entre deux passages du détecteur (k).
+        :param min_confidence : Confiance sous laquelle un objet suivi force une détection.
+        :param confidence_decay : Facteur appliqué à la confiance à chaque image propagée.
+        :param iou_threshold : IoU minimal entre une détection et la position prédite d'un objet suivi.
+        :param smoothing : Poids de la nouvelle mesure dans l'estimation de la vitesse.
+        """
+
+        self.detect_every = detect_every
+        self.min_confidence = min_confidence
+        self.confidence_decay = confidence_decay
+        self.iou_threshold = iou_threshold
+        self.smoothing = smoothing
+        self.tracks = {}  # camera_id -> liste des objets suivis
+        self.since_detection = {}  # camera_id -> images depuis la dernière détection
+        self.next_id = 1
+        self.frames = 0
+        self.detections = 0
+        self.lock = threading.Lock()
+
+    def should_detect(self, camera_id: int) -> bool:
+        """
+        Indique si le détecteur doit tourner sur la prochaine image d'une caméra.
+
+        :param camera_id : Identifiant de la caméra.
+
+        :return: True s'il faut lancer le détecteur, False si les boîtes peuvent être propagées.
+        """
+
+        with self.lock:
+            self.frames += 1
+            since = self.since_detection.get(camera_id)
+            tracks = self.tracks.get(camera_id, [])
+
+            detect = (
+                since is None
+                or since + 1 >= self.detect_every
+                or any(track.score * self.confidence_decay ** (track.propagated + 1) < self.min_confidence for track in tracks)
+            )
+
+            if detect:
+                self.since_detection[camera_id] = 0
+                self.detections += 1
+            else:
+                self.since_detection[camera_id] = since + 1
+
+            return detect
+
+    def update(self, camera_id: int, detections: List[dict], timestamp: float) -> List[dict]:
+        """
+        Associe les détections d'une image aux objets suivis (les objets non retrouvés sont abandonnés).
+
+        :param camera_id : Identifiant de la caméra.
+        :param detections : Détections du modèle.
+        :param timestamp : Instant de capture de l'image (s).
+
+        :return: Les détections complétées de leur `track_id`.
+        """
+
+        with self.lock:
+            tracks = self.tracks.get(camera_id, [])
+            boxes = np.array([
+                [d["bbox"][0], d["bbox"][1], d["bbox"][0] + d["bbox"][2], d["bbox"][1] + d["bbox"][3]] for d in detections
+            ], dtype=np.float32).reshape(-1, 4)
+            matches = {}
+
+            if tracks and detections:
+                ious = iou_matrix(boxes, np.array([track.predict(timestamp) for track in tracks]))
+                same_class = np.array([[d["category_id"] == track.category_id for track in tracks] for d in detections])
+                ious[~same_class] = 0
+
+                # Association gloutonne par IoU décroissant
+                for i, j in zip(*np.unravel_index(np.argsort(-ious, axis=None), ious.shape)):
+                    if ious[i, j] < self.iou_threshold:
+                        break
+
+                    if i not in matches and j not in matches.values():
+                        matches[i] = j
+
+            updated = []
+
+            for i, (detection, box) in enumerate(zip(detections, boxes)):
+                if i in matches:
+                    track = tracks[matches[i]]
+                    track.update(detection, box, timestamp, self.smoothing)
+                else:
+                    track = Track(self.next_id, detection, box, timestamp)
+                    self.next_id += 1
+
+                updated.append(track)
+                detection["track_id"] = track.track_id
+
+            self.tracks[camera_id] = updated
+
+            return detections
+
+    def propagate(self, camera_id: int, timestamp: float) -> List[dict]:
+        """
+        Propage les objets suivis d'une caméra à l'instant d'une image non détectée.
+
+        :param camera_id : Identifiant de la caméra.
+        :param timestamp : Instant de capture de l'image (s).
+
+        :return: Les détections propagées, avec leur `track_id` et leur confiance atténuée comme score.
+        """
+
+        with self.lock:
+            detections = []
+
+            for track in self.tracks.get(camera_id, []):
+                track.propagated += 1
+                detections.append({
+                    "category_id": track.category_id,
+                    "bbox": xyxy_to_xywh(track.predict(timestamp)),
+                    "score": float(track.score * self.confidence_decay ** track.propagated),
+                    "track_id": track.track_id
+                })
+
+            return detections
+
+    def stats(self) -> dict:
+        """
+        :return: Le nombre d'images vues, de passages du détecteur et le taux de détections évitées.
+        """
+
+        with self.lock:
+            return {
+                "frames": self.frames,
+                "detections": self.detections,
+                "skip_ratio": 1 - self.detections / self.frames if self.frames else 0.0
+            }